@@ -0,0 +1,65 @@
+from logging.config import fileConfig
+
+from sqlalchemy import create_engine, inspect, pool
+from sqlmodel import SQLModel
+
+import app.models.models  # noqa: F401  registra las tablas en SQLModel.metadata
+from alembic import context
+from app.core.config import settings
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = SQLModel.metadata
+
+# Permite apuntar a otra base sin tocar el .env (`alembic -x url=...`, o sqlalchemy.url en los tests)
+url = (
+    context.get_x_argument(as_dictionary=True).get("url")
+    or config.get_main_option("sqlalchemy.url")
+    or settings.DATABASE_URL
+)
+
+
+def run_migrations_offline() -> None:
+    """Genera el SQL sin conectarse (`alembic upgrade head --sql`)"""
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _marcar_base_existente(connection) -> None:
+    """
+    Una base creada con `create_all` antes de Alembic ya tiene el esquema de 0001 pero no
+    `alembic_version`: se marca con 0001 en lugar de intentar crear las tablas de nuevo.
+    """
+    migracion = context.get_context()
+    if migracion.get_current_revision() is None and inspect(connection).has_table("usuarios"):
+        migracion.stamp(context.script, "0001")
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(url, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite no soporta ALTER de columnas: Alembic recrea la tabla
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            _marcar_base_existente(connection)
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
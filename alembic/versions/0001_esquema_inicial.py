@@ -0,0 +1,223 @@
+"""Esquema inicial
+
+Tablas tal como las creaba `SQLModel.metadata.create_all` antes de usar Alembic.
+Una base existente sin `alembic_version` se marca sola con 0001 (ver alembic/env.py).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table('usuarios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('password_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('es_premium', sa.Boolean(), nullable=False),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_usuarios_email'), 'usuarios', ['email'], unique=True)
+    op.create_table('negocios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('descripcion', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('slug', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('logo_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('banner_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('color_primario', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('color_secundario', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('metodos_pago', sa.JSON(), nullable=True),
+    sa.Column('tipos_entrega', sa.JSON(), nullable=True),
+    sa.Column('codigo_pais', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('telefono', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('direccion', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('horario', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('acepta_pedidos', sa.Boolean(), nullable=True),
+    sa.Column('pedido_minimo', sa.Integer(), nullable=False),
+    sa.Column('tipo_negocio', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('anuncio_web', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_negocios_slug'), 'negocios', ['slug'], unique=True)
+    op.create_table('subscriptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('mp_subscription_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('mp_plan_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('status', sa.Enum('AUTHORIZED', 'ACTIVE', 'PAUSED', 'CANCELLED', 'EXPIRED', 'REJECTED', name='subscriptionstatus'), nullable=False),
+    sa.Column('start_date', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.Column('next_payment_date', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=True),
+    sa.Column('end_date', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('currency', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.Column('frequency_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.Column('updated_at', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_subscriptions_mp_plan_id'), 'subscriptions', ['mp_plan_id'], unique=False)
+    op.create_index(op.f('ix_subscriptions_mp_subscription_id'), 'subscriptions', ['mp_subscription_id'], unique=True)
+    op.create_index(op.f('ix_subscriptions_status'), 'subscriptions', ['status'], unique=False)
+    op.create_index(op.f('ix_subscriptions_usuario_id'), 'subscriptions', ['usuario_id'], unique=False)
+    op.create_table('categorias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('imagen_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('grupos_topping',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('promociones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('codigo', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('descripcion', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('tipo', sa.Enum('PORCENTAJE', 'MONTO_FIJO', 'DOS_POR_UNO', 'ENVIO_GRATIS', name='promociontipo'), nullable=False),
+    sa.Column('valor', sa.Float(), nullable=False),
+    sa.Column('reglas', sa.JSON(), nullable=True),
+    sa.Column('fecha_inicio', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.Column('fecha_fin', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=True),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('limite_usos_total', sa.Integer(), nullable=True),
+    sa.Column('limite_usos_por_usuario', sa.Integer(), nullable=True),
+    sa.Column('usos_actuales', sa.Integer(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_promociones_codigo'), 'promociones', ['codigo'], unique=False)
+    op.create_table('pedidos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('codigo', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('estado', sa.Enum('PENDIENTE', 'ACEPTADO', 'RECHAZADO', 'EN_PROGRESO', 'FINALIZADO', name='pedidoestado'), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('metodo_pago', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('tipo_entrega', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('nombre_cliente', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('telefono_cliente', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('direccion_entrega', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('notas', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.Column('promocion_id', sa.Integer(), nullable=True),
+    sa.Column('descuento_aplicado', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.ForeignKeyConstraint(['promocion_id'], ['promociones.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('productos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('descripcion', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('precio', sa.Integer(), nullable=False),
+    sa.Column('unidad', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('sku', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('codigo_barras', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('precio_mayorista', sa.Integer(), nullable=True),
+    sa.Column('cantidad_mayorista', sa.Integer(), nullable=True),
+    sa.Column('cantidad_minima', sa.Integer(), nullable=False),
+    sa.Column('imagen_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('categoria_id', sa.Integer(), nullable=True),
+    sa.Column('stock', sa.Boolean(), nullable=True),
+    sa.Column('destacado', sa.Boolean(), nullable=False),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['categoria_id'], ['categorias.id'], ),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_productos_codigo_barras'), 'productos', ['codigo_barras'], unique=False)
+    op.create_index(op.f('ix_productos_sku'), 'productos', ['sku'], unique=False)
+    op.create_table('toppings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('grupo_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('precio_extra', sa.Integer(), nullable=False),
+    sa.Column('disponible', sa.Boolean(), nullable=False),
+    sa.Column('activo', sa.Boolean(), nullable=False),
+    sa.Column('creado_en', sqlmodel.sql.sqltypes.UTCDateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['grupo_id'], ['grupos_topping.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('pedido_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pedido_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=True),
+    sa.Column('nombre_producto', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('precio_unitario', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('subtotal', sa.Integer(), nullable=False),
+    sa.Column('toppings_seleccionados', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['pedido_id'], ['pedidos.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('producto_grupo_topping',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('grupo_id', sa.Integer(), nullable=False),
+    sa.Column('min_selecciones', sa.Integer(), nullable=False),
+    sa.Column('max_selecciones', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['grupo_id'], ['grupos_topping.id'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('producto_grupo_topping')
+    op.drop_table('pedido_items')
+    op.drop_table('toppings')
+    op.drop_index(op.f('ix_productos_sku'), table_name='productos')
+    op.drop_index(op.f('ix_productos_codigo_barras'), table_name='productos')
+    op.drop_table('productos')
+    op.drop_table('pedidos')
+    op.drop_index(op.f('ix_promociones_codigo'), table_name='promociones')
+    op.drop_table('promociones')
+    op.drop_table('grupos_topping')
+    op.drop_table('categorias')
+    op.drop_index(op.f('ix_subscriptions_usuario_id'), table_name='subscriptions')
+    op.drop_index(op.f('ix_subscriptions_status'), table_name='subscriptions')
+    op.drop_index(op.f('ix_subscriptions_mp_subscription_id'), table_name='subscriptions')
+    op.drop_index(op.f('ix_subscriptions_mp_plan_id'), table_name='subscriptions')
+    op.drop_table('subscriptions')
+    op.drop_index(op.f('ix_negocios_slug'), table_name='negocios')
+    op.drop_table('negocios')
+    op.drop_index(op.f('ix_usuarios_email'), table_name='usuarios')
+    op.drop_table('usuarios')
+    # En Postgres los enums son tipos aparte y drop_table no los borra
+    for nombre in ("pedidoestado", "promociontipo", "subscriptionstatus"):
+        sa.Enum(name=nombre).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,58 @@
+"""Contadores de pedidos y versión de catálogo en negocios
+
+Reemplaza a scripts/backfill_contadores_pedidos.py y scripts/migrate_catalogo_version.py:
+si esos scripts ya agregaron alguna columna, se saltea. Los contadores se llenan solo acá;
+para recalcularlos más adelante está `python -m scripts.recalcular_contadores`.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNAS = ("total_pedidos", "pedidos_finalizados", "catalogo_version")
+
+
+def _columnas_existentes() -> set[str]:
+    if context.is_offline_mode():
+        # Generando SQL (--sql) no hay conexión para inspeccionar
+        return set()
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns("negocios")}
+
+
+def upgrade() -> None:
+    existentes = _columnas_existentes()
+    faltantes = [c for c in COLUMNAS if c not in existentes]
+    if not faltantes:
+        return
+
+    with op.batch_alter_table("negocios") as batch_op:
+        for columna in faltantes:
+            batch_op.add_column(sa.Column(columna, sa.Integer(), nullable=False, server_default="0"))
+
+    if "total_pedidos" in faltantes or "pedidos_finalizados" in faltantes:
+        op.execute(
+            """
+            UPDATE negocios SET
+                total_pedidos = (SELECT count(*) FROM pedidos WHERE pedidos.negocio_id = negocios.id),
+                pedidos_finalizados = (
+                    SELECT count(*) FROM pedidos
+                    WHERE pedidos.negocio_id = negocios.id AND pedidos.estado = 'FINALIZADO'
+                )
+            """
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("negocios") as batch_op:
+        for columna in reversed(COLUMNAS):
+            batch_op.drop_column(columna)
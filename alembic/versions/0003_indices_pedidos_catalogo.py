@@ -0,0 +1,45 @@
+"""Índices de las consultas calientes
+
+Todas las lecturas de pedidos, productos, categorías y cupones filtran por negocio_id,
+que no tenía índice (Postgres no indexa las foreign keys solo). Los de productos y
+categorías son parciales en Postgres: solo se consultan las filas activas.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDICES = [
+    ("ix_pedidos_negocio_id_creado_en", "pedidos", ["negocio_id", "creado_en"], None),
+    ("ix_pedidos_negocio_id_estado", "pedidos", ["negocio_id", "estado"], None),
+    ("ix_pedidos_negocio_id_codigo", "pedidos", ["negocio_id", "codigo"], None),
+    ("ix_pedido_items_pedido_id", "pedido_items", ["pedido_id"], None),
+    ("ix_productos_negocio_id_activo", "productos", ["negocio_id", "activo"], "activo"),
+    ("ix_categorias_negocio_id_activo", "categorias", ["negocio_id", "activo"], "activo"),
+    ("ix_promociones_negocio_id_codigo", "promociones", ["negocio_id", "codigo"], None),
+]
+
+
+def upgrade() -> None:
+    for nombre, tabla, columnas, parcial in INDICES:
+        op.create_index(
+            nombre,
+            tabla,
+            columnas,
+            postgresql_where=sa.text(parcial) if parcial else None,
+        )
+
+
+def downgrade() -> None:
+    for nombre, tabla, _, _ in reversed(INDICES):
+        op.drop_index(nombre, table_name=tabla)
@@ -0,0 +1,34 @@
+"""Cantidad de items desnormalizada en pedidos
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("pedidos") as batch_op:
+        batch_op.add_column(sa.Column("cantidad_items", sa.Integer(), nullable=False, server_default="0"))
+
+    op.execute(
+        """
+        UPDATE pedidos SET cantidad_items = (
+            SELECT count(*) FROM pedido_items WHERE pedido_items.pedido_id = pedidos.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("pedidos") as batch_op:
+        batch_op.drop_column("cantidad_items")
@@ -0,0 +1,32 @@
+"""Id de la entrada de la cola de ingreso en pedidos
+
+El volcado de la cola reconoce con él los pedidos ya insertados (reintentos) y asocia
+los items a su pedido; el código de 6 caracteres puede repetirse.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("pedidos") as batch_op:
+        batch_op.add_column(sa.Column("ingreso_id", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.create_index("ix_pedidos_ingreso_id", "pedidos", ["ingreso_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pedidos_ingreso_id", table_name="pedidos")
+    with op.batch_alter_table("pedidos") as batch_op:
+        batch_op.drop_column("ingreso_id")
@@ -1,20 +1,51 @@
+import base64
+import json
+
 from fastapi import Depends, HTTPException, Query
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import async_engine, engine
 from app.models.models import Negocio, Usuario
 
+
 class PaginationParams:
     def __init__(
         self,
         skip: int = Query(0, ge=0, description="Número de registros a saltar"),
         limit: int = Query(100, ge=1, le=100, description="Cantidad máxima de registros a retornar"),
+        cursor: str | None = Query(
+            None,
+            description="Cursor opaco de la página siguiente (header X-Next-Cursor). Si se envía, se ignora skip",
+        ),
     ):
         self.skip = skip
         self.limit = limit
+        self.cursor = cursor
+
+
+def codificar_cursor(*valores) -> str:
+    """Cursor opaco para paginación keyset a partir de los valores de la última fila"""
+    crudo = json.dumps(valores, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, *conversores) -> list:
+    """
+    Decodifica un cursor de `codificar_cursor` aplicando un conversor por valor
+    (ej: `decodificar_cursor(cursor, datetime.fromisoformat, int)`).
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(conversores):
+            raise ValueError("Cantidad de valores incorrecta")
+        return [convertir(valor) for convertir, valor in zip(conversores, valores, strict=True)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido") from None
 
 security = HTTPBearer()
 
@@ -24,11 +55,13 @@ def get_session():
         yield session
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session),
-):
-    token = credentials.credentials
+async def get_async_session():
+    # La lógica de servicios es sync: se ejecuta con `await session.run_sync(...)`
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
+def usuario_id_desde_token(token: str) -> int:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id = payload.get("user_id")
@@ -36,6 +69,14 @@ def get_current_user(
             raise HTTPException(status_code=401, detail="Token inválido")
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
+    return user_id
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: Session = Depends(get_session),
+):
+    user_id = usuario_id_desde_token(credentials.credentials)
 
     usuario = session.get(Usuario, user_id)
     if not usuario:
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select
 
-from app.api.deps import get_current_user, get_negocio_del_usuario, get_session, PaginationParams
+from app.api.deps import PaginationParams, get_current_user, get_negocio_del_usuario, get_session
 from app.models.models import Categoria
 from app.schemas.categoria import CategoriaCreate, CategoriaRead, CategoriaUpdate
 from app.services import categoria_service
+from app.services.negocio_service import incrementar_version_catalogo
 
 router = APIRouter(prefix="/api/categorias", tags=["Categorías"])
 
@@ -54,6 +55,7 @@ def actualizar_categoria(
         setattr(categoria, campo, valor)
 
     session.add(categoria)
+    incrementar_version_catalogo(session, negocio.id)
     session.commit()
     session.refresh(categoria)
     return CategoriaRead.model_validate(categoria)
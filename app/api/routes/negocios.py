@@ -4,6 +4,7 @@ from sqlmodel import Session, select
 from app.api.deps import get_current_user, get_session
 from app.models.models import Negocio
 from app.schemas.negocio import NegocioCreate, NegocioRead, NegocioUpdate
+from app.services import negocio_service
 from app.utils.utils import generar_slug
 
 router = APIRouter(prefix="/api/negocios", tags=["Negocios"])
@@ -76,6 +77,8 @@ def actualizar_negocio(
         setattr(negocio, campo, valor)
 
     session.add(negocio)
+    # El commit invalida el snapshot cacheado del negocio (ver negocio_service)
+    negocio_service.incrementar_version_catalogo(session, negocio.id)
     session.commit()
     session.refresh(negocio)
     return negocio
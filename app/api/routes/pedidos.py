@@ -1,33 +1,86 @@
+import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, status
+from pydantic import TypeAdapter
+from sqlalchemy import tuple_
 from sqlalchemy.orm import selectinload
-from sqlmodel import Session, select, desc, col
-
-from app.api.deps import get_current_user, get_negocio_del_usuario, get_session, PaginationParams
-from app.models.models import Pedido, PedidoEstado
-from app.schemas.pedido import PedidoRead
+from sqlmodel import Session, col, desc, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.deps import (
+    PaginationParams,
+    codificar_cursor,
+    decodificar_cursor,
+    get_async_session,
+    get_current_user,
+    get_negocio_del_usuario,
+    get_session,
+    usuario_id_desde_token,
+)
+from app.core.eventos import Suscripcion, bus_eventos
+from app.models.models import Negocio, Pedido, PedidoEstado
+from app.schemas.pedido import (
+    PedidoLoteCreate,
+    PedidoLoteResultado,
+    PedidoRead,
+    PedidoResumen,
+    PedidosEstadoResultado,
+    PedidosEstadoUpdate,
+)
+from app.services.negocio_service import NegocioSnapshot
+from app.services.pedido_service import (
+    cambiar_estado_pedido,
+    cambiar_estado_pedidos,
+    canal_negocio,
+    crear_pedidos_en_lote,
+)
 
 router = APIRouter(prefix="/api/pedidos", tags=["Pedidos"])
 
 
-@router.get("/", response_model=list[PedidoRead])
+# Columnas del listado resumido: sin items
+COLUMNAS_RESUMEN = (
+    Pedido.id,
+    Pedido.codigo,
+    Pedido.estado,
+    Pedido.total,
+    Pedido.descuento_aplicado,
+    Pedido.metodo_pago,
+    Pedido.tipo_entrega,
+    Pedido.nombre_cliente,
+    Pedido.telefono_cliente,
+    Pedido.cantidad_items,
+    Pedido.creado_en,
+)
+_resumenes = TypeAdapter(list[PedidoResumen])
+
+
+@router.get(
+    "/",
+    response_model=list[PedidoRead],
+    responses={200: {"description": "Con `vista=resumen`, una lista de PedidoResumen (sin items)"}},
+)
 def listar_pedidos(
+    response: Response,
     estado: PedidoEstado | None = None,
     buscar: str | None = Query(None, description="Buscar por código o nombre de cliente"),
     fecha_desde: datetime | None = Query(None, description="Filtrar desde fecha (ISO 8601)"),
     fecha_hasta: datetime | None = Query(None, description="Filtrar hasta fecha (ISO 8601)"),
+    vista: Literal["completa", "resumen"] = Query(
+        "completa", description="resumen: sin items, con cantidad_items (los items se ven en GET /{id})"
+    ),
     session: Session = Depends(get_session),
     usuario=Depends(get_current_user),
     pagination: PaginationParams = Depends(),
 ):
     negocio = get_negocio_del_usuario(session, usuario)
-    query = (
-        select(Pedido)
-        .where(Pedido.negocio_id == negocio.id)
-        .options(selectinload(Pedido.items))
-    )
+    if vista == "resumen":
+        query = select(*COLUMNAS_RESUMEN)
+    else:
+        query = select(Pedido).options(selectinload(Pedido.items))
+    query = query.where(Pedido.negocio_id == negocio.id)
 
     if estado is not None:
         query = query.where(Pedido.estado == estado)
@@ -45,30 +98,128 @@ def listar_pedidos(
     if fecha_hasta is not None:
         query = query.where(Pedido.creado_en <= fecha_hasta)
 
-    query = query.order_by(desc(Pedido.creado_en)).offset(pagination.skip).limit(pagination.limit)
+    if pagination.cursor:
+        # Keyset sobre (creado_en, id): el costo no depende de qué tan profunda es la página
+        creado_en, pedido_id = decodificar_cursor(pagination.cursor, datetime.fromisoformat, int)
+        query = query.where(tuple_(Pedido.creado_en, Pedido.id) < tuple_(creado_en, pedido_id))
+    else:
+        query = query.offset(pagination.skip)
+
+    query = query.order_by(desc(Pedido.creado_en), desc(Pedido.id)).limit(pagination.limit)
 
     pedidos = session.exec(query).all()
-    return pedidos
+    if vista == "resumen":
+        # Las filas ya tienen solo las columnas del resumen: se serializan directo,
+        # sin pasar por response_model
+        response = Response(
+            _resumenes.dump_json([PedidoResumen(**fila._mapping) for fila in pedidos]),
+            media_type="application/json",
+        )
+    if len(pedidos) == pagination.limit:
+        ultimo = pedidos[-1]
+        response.headers["X-Next-Cursor"] = codificar_cursor(ultimo.creado_en.isoformat(), ultimo.id)
+    return response if vista == "resumen" else pedidos
+
+
+@router.get("/{pedido_id}", response_model=PedidoRead)
+def obtener_pedido(
+    pedido_id: int, session: Session = Depends(get_session), usuario=Depends(get_current_user)
+):
+    """Un pedido con sus items (el listado resumido no los trae)"""
+    negocio = get_negocio_del_usuario(session, usuario)
+    pedido = session.exec(
+        select(Pedido)
+        .where(Pedido.id == pedido_id, Pedido.negocio_id == negocio.id)
+        .options(selectinload(Pedido.items))
+    ).first()
+    if not pedido:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return pedido
+
+
+@router.post("/lote", response_model=PedidoLoteResultado)
+def crear_pedidos_lote(
+    data: PedidoLoteCreate, session: Session = Depends(get_session), usuario=Depends(get_current_user)
+):
+    """Carga de pedidos tomados offline (solo distribuidoras); los errores se informan por pedido"""
+    negocio = get_negocio_del_usuario(session, usuario)
+    return crear_pedidos_en_lote(session, NegocioSnapshot.desde_modelo(negocio), data.pedidos)
+
 
+@router.patch("/estado", response_model=PedidosEstadoResultado)
+def cambiar_estado_lote(
+    data: PedidosEstadoUpdate, session: Session = Depends(get_session), usuario=Depends(get_current_user)
+):
+    """Cambio de estado de varios pedidos a la vez (pantallas de cocina y despacho)"""
+    negocio = get_negocio_del_usuario(session, usuario)
+    return cambiar_estado_pedidos(session, negocio.id, data.ids, data.estado)
 
 
+async def _enviar_eventos(websocket: WebSocket, suscripcion: Suscripcion) -> None:
+    async for evento in suscripcion:
+        await websocket.send_json(evento)
+    # Suscripción desbordada: el cliente no consume al ritmo de los eventos
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+
+async def _esperar_desconexion(websocket: WebSocket) -> None:
+    # El cliente no manda nada: solo interesa enterarse de que cerró
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.websocket("/feed")
+async def feed_pedidos(
+    websocket: WebSocket,
+    token: str = Query(...),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Feed en vivo del comercio: pedidos nuevos (`pedidos_nuevos`) y cambios de estado
+    (`estado`) del negocio, en lugar de consultar el listado cada pocos segundos.
+    El token va como query param (el navegador no manda headers en un WebSocket).
+    Cada conexión tiene una cola acotada: si no consume y se llena, se la cierra con 1013
+    y el cliente reconecta (y recarga el listado).
+    """
+    try:
+        usuario_id = usuario_id_desde_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    negocio_id = (
+        await session.exec(select(Negocio.id).where(Negocio.usuario_id == usuario_id, Negocio.activo))
+    ).first()
+    # La conexión vuelve al pool: el feed puede quedar abierto mucho tiempo
+    await session.close()
+    if negocio_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    suscripcion = bus_eventos.suscribir(canal_negocio(negocio_id))
+    tareas = []
+    try:
+        await websocket.accept()
+        tareas = [
+            asyncio.create_task(_enviar_eventos(websocket, suscripcion)),
+            asyncio.create_task(_esperar_desconexion(websocket)),
+        ]
+        hechas, _ = await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+        for tarea in hechas:
+            # Un envío que falla porque el cliente ya cortó no es un error
+            tarea.exception()
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        suscripcion.cerrar()
+
 
 @router.patch("/{pedido_id}/aceptar")
 def aceptar_pedido(
     pedido_id: int, session: Session = Depends(get_session), usuario=Depends(get_current_user)
 ):
     negocio = get_negocio_del_usuario(session, usuario)
-    pedido = session.get(Pedido, pedido_id)
-
-    if not pedido or pedido.negocio_id != negocio.id:
-        raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    if pedido.estado != PedidoEstado.PENDIENTE:
-        raise HTTPException(status_code=400, detail="Solo pedidos pendientes pueden aceptarse")
-
-    pedido.estado = PedidoEstado.ACEPTADO
-    session.add(pedido)
-    session.commit()
-    return {"status": "ok", "estado": pedido.estado}
+    cambiar_estado_pedido(session, negocio.id, pedido_id, PedidoEstado.ACEPTADO)
+    return {"status": "ok", "estado": PedidoEstado.ACEPTADO}
 
 
 @router.patch("/{pedido_id}/rechazar")
@@ -76,17 +227,8 @@ def rechazar_pedido(
     pedido_id: int, session: Session = Depends(get_session), usuario=Depends(get_current_user)
 ):
     negocio = get_negocio_del_usuario(session, usuario)
-    pedido = session.get(Pedido, pedido_id)
-
-    if not pedido or pedido.negocio_id != negocio.id:
-        raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    if pedido.estado != PedidoEstado.PENDIENTE:
-        raise HTTPException(status_code=400, detail="Solo pedidos pendientes pueden rechazarse")
-
-    pedido.estado = PedidoEstado.RECHAZADO
-    session.add(pedido)
-    session.commit()
-    return {"status": "ok", "estado": pedido.estado}
+    cambiar_estado_pedido(session, negocio.id, pedido_id, PedidoEstado.RECHAZADO)
+    return {"status": "ok", "estado": PedidoEstado.RECHAZADO}
 
 
 @router.patch("/{pedido_id}/progreso")
@@ -94,19 +236,8 @@ def marcar_en_progreso(
     pedido_id: int, session: Session = Depends(get_session), usuario=Depends(get_current_user)
 ):
     negocio = get_negocio_del_usuario(session, usuario)
-    pedido = session.get(Pedido, pedido_id)
-
-    if not pedido or pedido.negocio_id != negocio.id:
-        raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    if pedido.estado != PedidoEstado.ACEPTADO:
-        raise HTTPException(
-            status_code=400, detail="Solo pedidos aceptados pueden pasar a progreso"
-        )
-
-    pedido.estado = PedidoEstado.EN_PROGRESO
-    session.add(pedido)
-    session.commit()
-    return {"status": "ok", "estado": pedido.estado}
+    cambiar_estado_pedido(session, negocio.id, pedido_id, PedidoEstado.EN_PROGRESO)
+    return {"status": "ok", "estado": PedidoEstado.EN_PROGRESO}
 
 
 @router.patch("/{pedido_id}/finalizar")
@@ -114,14 +245,5 @@ def finalizar_pedido(
     pedido_id: int, session: Session = Depends(get_session), usuario=Depends(get_current_user)
 ):
     negocio = get_negocio_del_usuario(session, usuario)
-    pedido = session.get(Pedido, pedido_id)
-
-    if not pedido or pedido.negocio_id != negocio.id:
-        raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    if pedido.estado != PedidoEstado.EN_PROGRESO:
-        raise HTTPException(status_code=400, detail="Solo pedidos en progreso pueden finalizarse")
-
-    pedido.estado = PedidoEstado.FINALIZADO
-    session.add(pedido)
-    session.commit()
-    return {"status": "ok", "estado": pedido.estado}
+    cambiar_estado_pedido(session, negocio.id, pedido_id, PedidoEstado.FINALIZADO)
+    return {"status": "ok", "estado": PedidoEstado.FINALIZADO}
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, File, Response, UploadFile
 from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
 
-from app.api.deps import get_current_user, get_negocio_del_usuario, get_session, PaginationParams
+from app.api.deps import (
+    PaginationParams,
+    codificar_cursor,
+    decodificar_cursor,
+    get_current_user,
+    get_negocio_del_usuario,
+    get_session,
+)
 from app.models.models import Producto
 from app.schemas.producto import ProductoCreate, ProductoRead, ProductoUpdate
 from app.schemas.topping import ProductoGrupoToppingConfig
-from app.services import producto_service, topping_service, import_service
-from fastapi import UploadFile, File
+from app.services import import_service, producto_service, topping_service
 
 router = APIRouter(prefix="/api/productos", tags=["Productos"])
 
@@ -42,19 +48,27 @@ def crear_producto(
 
 @router.get("/", response_model=list[ProductoRead])
 def listar_productos(
+    response: Response,
     session: Session = Depends(get_session),
     usuario=Depends(get_current_user),
     pagination: PaginationParams = Depends(),
 ):
     negocio = get_negocio_del_usuario(session, usuario)
 
-    productos = session.exec(
+    query = (
         select(Producto)
         .where(Producto.negocio_id == negocio.id, Producto.activo)
         .options(selectinload(Producto.categorias))
-        .offset(pagination.skip)
-        .limit(pagination.limit)
-    ).all()
+    )
+    if pagination.cursor:
+        (ultimo_id,) = decodificar_cursor(pagination.cursor, int)
+        query = query.where(Producto.id > ultimo_id)
+    else:
+        query = query.offset(pagination.skip)
+
+    productos = session.exec(query.order_by(Producto.id).limit(pagination.limit)).all()
+    if len(productos) == pagination.limit:
+        response.headers["X-Next-Cursor"] = codificar_cursor(productos[-1].id)
     return [ProductoRead.model_validate(p) for p in productos]
 
 
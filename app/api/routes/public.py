@@ -1,134 +1,279 @@
-from sqlalchemy.orm import joinedload
-from sqlalchemy import func
+import asyncio
+import json
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
-from app.core.rate_limit import limiter
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.deps import get_session, PaginationParams
-from app.models.models import Negocio, Pedido, Producto, Categoria, TipoNegocio
-from app.schemas.pedido import PedidoCreate, PedidoRead, PedidoItemCreate
-from app.schemas.producto import ProductoRead
-from app.schemas.negocio import NegocioRead, NegocioPublicDetail
+from app.api.deps import (
+    PaginationParams,
+    codificar_cursor,
+    decodificar_cursor,
+    get_async_session,
+    get_session,
+)
+from app.core.config import settings
+from app.core.eventos import Suscripcion, bus_eventos
+from app.core.rate_limit import limiter
+from app.models.models import Pedido, PedidoEstado
+from app.schemas.catalogo import CatalogoPublico
 from app.schemas.categoria import CategoriaRead
+from app.schemas.negocio import NegocioPublicDetail, NegocioRead
+from app.schemas.pedido import PedidoCreate, PedidoItemCreate, PedidoRead
+from app.schemas.producto import ProductoRead
 from app.schemas.promocion import PromocionRead
-from app.services.pedido_service import crear_nuevo_pedido
-from app.services import topping_service
-from app.models.models import PedidoEstado
+from app.services import (
+    busqueda_service,
+    catalogo_service,
+    cola_pedidos_service,
+    idempotencia_service,
+    negocio_service,
+    precios_service,
+)
+from app.services.pedido_service import ESTADOS_FINALES, canal_pedido, crear_nuevo_pedido_async
+from app.utils.compresion import CuerpoPrecomprimido, elegir_codificacion
 
 router = APIRouter(prefix="/public", tags=["Públicos"])
 
 
-@router.get("/{slug}", response_model=NegocioPublicDetail)
-@limiter.limit("60/minute")
-def get_negocio(request: Request, slug: str, session: Session = Depends(get_session)):
-    negocio = session.exec(select(Negocio).where(Negocio.slug == slug)).first()
+def _etag_catalogo(negocio: negocio_service.NegocioSnapshot, *extra) -> str:
+    """ETag fuerte derivado de la versión de catálogo del negocio"""
+    partes = [negocio.id, negocio.catalogo_version, *extra]
+    return '"' + "-".join(str(p) for p in partes) + '"'
 
-    if not negocio:
+
+def _cabeceras_cache(etag: str, **extra: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "no-cache", **extra}
+
+
+def _revalidar(request: Request, response: Response, etag: str, **extra: str) -> Response | None:
+    """
+    Agrega el ETag a la respuesta. Si el cliente ya tiene esa versión (If-None-Match),
+    devuelve un 304 listo para retornar sin tocar las tablas del catálogo.
+    """
+    headers = _cabeceras_cache(etag, **extra)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etags_cliente = {e.strip() for e in if_none_match.split(",")}
+        if etag in etags_cliente or "*" in etags_cliente:
+            return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+def _negociar_codificacion(request: Request, cuerpo: CuerpoPrecomprimido) -> str | None:
+    """
+    Codificación que va a recibir el cliente, entre las que se generaron para este cuerpo
+    (los cuerpos chicos solo existen sin comprimir). Es la que va en el ETag.
+    """
+    return elegir_codificacion(request.headers.get("accept-encoding"), cuerpo.codificaciones())
+
+
+def _respuesta_precomprimida(
+    cuerpo: CuerpoPrecomprimido, codificacion: str | None, headers: dict[str, str]
+) -> Response:
+    """Envía el cuerpo en la codificación ya negociada, sin comprimir nada en el request"""
+    if codificacion:
+        headers["Content-Encoding"] = codificacion
+    return Response(content=cuerpo.cuerpo(codificacion), media_type="application/json", headers=headers)
+
+
+async def _negocio_o_404(
+    session: AsyncSession, slug: str, solo_activos: bool = True
+) -> negocio_service.NegocioSnapshot:
+    # En un hit del cache no se abre ninguna conexión
+    negocio = await session.run_sync(negocio_service.obtener_negocio_por_slug, slug)
+    if not negocio or (solo_activos and not negocio.activo):
         raise HTTPException(status_code=404, detail="Negocio no encontrado")
+    return negocio
 
-    # Calculo de insignias (On-the-fly)
-    insignias = []
-    
-    # Badge: TOP_SELLER_100
-    total_pedidos = session.exec(
-        select(func.count(Pedido.id)).where(Pedido.negocio_id == negocio.id)
-    ).one()
-    
-    if total_pedidos > 100:
-        insignias.append("TOP_SELLER_100")
-
-    # Badge: VERIFICADO_50
-    pedidos_entregados = session.exec(
-        select(func.count(Pedido.id)).where(
-            Pedido.negocio_id == negocio.id,
-            Pedido.estado == PedidoEstado.FINALIZADO
-        )
-    ).one()
 
-    if pedidos_entregados > 50:
-        insignias.append("VERIFICADO_50")
+@router.get("/{slug}", response_model=NegocioPublicDetail)
+@limiter.limit("60/minute")
+async def get_negocio(
+    request: Request,
+    response: Response,
+    slug: str,
+    session: AsyncSession = Depends(get_async_session),
+):
+    negocio = await _negocio_o_404(session, slug, solo_activos=False)
 
-    # Badge: ENTREGA_FLASH (Opcional - placeholder logic)
-    # Aquí podríamos calcular el promedio de tiempo si tuviéramos esa data
-    # Por ahora, dejámoslo pendiente o con una lógica simple si aplica
-    
-    negocio_dict = negocio.model_dump()
-    negocio_dict["insignias"] = insignias
+    # Las insignias cambian sin tocar el catálogo: forman parte del ETag
+    no_modificado = _revalidar(request, response, _etag_catalogo(negocio, *negocio.insignias))
+    if no_modificado:
+        return no_modificado
+
+    negocio_dict = negocio.a_dict()
+    # Insignias desde los contadores denormalizados (sin COUNT sobre pedidos)
+    negocio_dict["insignias"] = negocio.insignias
     
     return NegocioPublicDetail(**negocio_dict)
 
+@router.get("/{slug}/catalog", response_model=CatalogoPublico)
+@limiter.limit("60/minute")
+async def obtener_catalogo(
+    request: Request,
+    response: Response,
+    slug: str,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Negocio, categorías, productos activos y toppings de cada producto en un solo documento.
+    Se construye una vez por versión de catálogo y se sirve desde cache.
+    """
+    negocio = await _negocio_o_404(session, slug)
+
+    # Sale del cache salvo la primera vez por versión: hace falta para saber qué
+    # codificaciones existen antes de armar el ETag
+    cuerpo = await session.run_sync(catalogo_service.obtener_catalogo_json, negocio)
+
+    # Las insignias van en el documento y cambian sin tocar el catálogo; la codificación
+    # también es parte del ETag: cada representación tiene el suyo
+    codificacion = _negociar_codificacion(request, cuerpo)
+    extra = [*negocio.insignias, codificacion] if codificacion else negocio.insignias
+    etag = _etag_catalogo(negocio, *extra)
+    no_modificado = _revalidar(request, response, etag, Vary="Accept-Encoding")
+    if no_modificado:
+        return no_modificado
+
+    return _respuesta_precomprimida(cuerpo, codificacion, _cabeceras_cache(etag, Vary="Accept-Encoding"))
+
 @router.get("/{slug}/productos", response_model=list[ProductoRead])
 @limiter.limit("60/minute")
-def listar_productos_por_slug(
+async def listar_productos_por_slug(
     request: Request,
+    response: Response,
     slug: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     pagination: PaginationParams = Depends(),
 ):
-    negocio = session.exec(
-        select(Negocio).where(Negocio.slug == slug, Negocio.activo)
-    ).first()
-    if not negocio:
-        raise HTTPException(status_code=404, detail="Negocio no encontrado")
-    
-    productos = session.exec(
-        select(Producto)
-        .where(Producto.negocio_id == negocio.id, Producto.activo)
-        .options(joinedload(Producto.categorias))
-        .offset(pagination.skip)
-        .limit(pagination.limit)
-    ).all()
-
-    result = []
-    for p in productos:
-        p_read = ProductoRead.model_validate(p)
-        p_read.categoria = p.categoria_nombre
-        result.append(p_read)
-        
-    return result
+    negocio = await _negocio_o_404(session, slug)
+
+    despues_de_id = None
+    if pagination.cursor:
+        (despues_de_id,) = decodificar_cursor(pagination.cursor, int)
+
+    # Cacheado por versión de catálogo; se lee antes del ETag porque la página puede
+    # ser demasiado chica para comprimirse
+    cuerpo, ultimo_id = await session.run_sync(
+        catalogo_service.listar_productos_json,
+        negocio,
+        pagination.skip,
+        pagination.limit,
+        despues_de_id,
+    )
+
+    codificacion = _negociar_codificacion(request, cuerpo)
+    etag = _etag_catalogo(negocio, codificacion) if codificacion else _etag_catalogo(negocio)
+    no_modificado = _revalidar(request, response, etag, Vary="Accept-Encoding")
+    if no_modificado:
+        return no_modificado
+
+    headers = _cabeceras_cache(etag, Vary="Accept-Encoding")
+    if ultimo_id is not None:
+        headers["X-Next-Cursor"] = codificar_cursor(ultimo_id)
+    # Bytes ya serializados y comprimidos: se evita la segunda validación contra response_model
+    return _respuesta_precomprimida(cuerpo, codificacion, headers)
+
+@router.get("/{slug}/search", response_model=list[ProductoRead])
+@limiter.limit("120/minute")
+async def buscar_productos(
+    request: Request,
+    slug: str,
+    q: str = Query(..., min_length=1, max_length=100, description="Texto a buscar"),
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Busca productos activos por nombre, descripción, SKU y categoría.
+    Ignora acentos y mayúsculas; cada palabra puede ser el comienzo de una palabra.
+    """
+    negocio = await _negocio_o_404(session, slug)
+    return await session.run_sync(busqueda_service.buscar_productos, negocio, q, limit)
 
 @router.get("/{slug}/categorias", response_model=list[CategoriaRead])
 @limiter.limit("60/minute")
-def listar_categorias_por_slug(
+async def listar_categorias_por_slug(
     request: Request,
+    response: Response,
     slug: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     pagination: PaginationParams = Depends(),
 ):
-    negocio = session.exec(
-        select(Negocio).where(Negocio.slug == slug, Negocio.activo)
-    ).first()
-    if not negocio:
-        raise HTTPException(status_code=404, detail="Negocio no encontrado")
+    negocio = await _negocio_o_404(session, slug)
+
+    no_modificado = _revalidar(request, response, _etag_catalogo(negocio))
+    if no_modificado:
+        return no_modificado
 
-    categorias = session.exec(
-        select(Categoria)
-        .where(Categoria.negocio_id == negocio.id, Categoria.activo)
-        .offset(pagination.skip)
-        .limit(pagination.limit)
-    ).all()
-    return [CategoriaRead.model_validate(c) for c in categorias]
+    # Desde el catálogo cacheado: no depende de la base mientras la versión no cambie
+    catalogo = await session.run_sync(catalogo_service.obtener_catalogo, negocio)
+    return catalogo.categorias[pagination.skip:pagination.skip + pagination.limit]
 
 
 @router.post("/{slug}/pedidos", response_model=PedidoRead)
 @limiter.limit("10/minute")
-def crear_pedido(request: Request, slug: str, data: PedidoCreate, session: Session = Depends(get_session)):
-    return crear_nuevo_pedido(session, slug, data)
+async def crear_pedido(
+    request: Request,
+    slug: str,
+    data: PedidoCreate,
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: str | None = Header(None, max_length=255),
+):
+    """
+    Con el header `Idempotency-Key`, los reintentos del mismo pedido devuelven
+    exactamente la respuesta del primero en lugar de crear otro.
+    """
+    if not idempotency_key:
+        return await crear_nuevo_pedido_async(session, slug, data)
+
+    negocio = await _negocio_o_404(session, slug)
+
+    async def crear() -> bytes:
+        pedido = await crear_nuevo_pedido_async(session, slug, data)
+        return pedido.model_dump_json().encode()
+
+    contenido, repetido = await idempotencia_service.ejecutar_idempotente(
+        (negocio.id, idempotency_key),
+        idempotencia_service.huella_cuerpo(await request.body()),
+        crear,
+    )
+    headers = {"Idempotent-Replayed": "true"} if repetido else None
+    return Response(content=contenido, media_type="application/json", headers=headers)
+
+
+async def _pedido_en_cola(negocio_id: int, codigo: str) -> PedidoRead | None:
+    """Pedido aceptado pero todavía en la cola de ingreso (solo con PEDIDOS_MODO="cola")"""
+    if settings.PEDIDOS_MODO != "cola":
+        return None
+    return await asyncio.to_thread(cola_pedidos_service.buscar_en_cola, negocio_id, codigo)
 
 
 @router.get("/{slug}/pedidos/{codigo}", response_model=PedidoRead)
 @limiter.limit("60/minute")
-def ver_pedido(request: Request, slug: str, codigo: str, session: Session = Depends(get_session)):
-    negocio = session.exec(
-        select(Negocio).where(Negocio.slug == slug, Negocio.activo)
-    ).first()
-    if not negocio:
-        raise HTTPException(status_code=404, detail="Negocio no encontrado")
+async def ver_pedido(
+    request: Request,
+    slug: str,
+    codigo: str,
+    session: AsyncSession = Depends(get_async_session),
+):
+    negocio = await _negocio_o_404(session, slug)
+
+    # Antes que la base: el worker borra de la cola recién después de insertar
+    en_cola = await _pedido_en_cola(negocio.id, codigo)
+    if en_cola:
+        return en_cola
 
-    pedido = session.exec(
-        select(Pedido).where(Pedido.negocio_id == negocio.id, Pedido.codigo == codigo)
+    pedido = (
+        await session.exec(
+            select(Pedido)
+            .where(Pedido.negocio_id == negocio.id, Pedido.codigo == codigo)
+            .options(selectinload(Pedido.items))
+        )
     ).first()
 
     if not pedido:
@@ -136,28 +281,112 @@ def ver_pedido(request: Request, slug: str, codigo: str, session: Session = Depe
 
     return pedido
 
+def _evento_sse(nombre: str, datos: dict) -> str:
+    return f"event: {nombre}\ndata: {json.dumps(datos)}\n\n"
+
+
+async def _stream_estado_pedido(suscripcion: Suscripcion, codigo: str, estado: PedidoEstado):
+    try:
+        yield _evento_sse("estado", {"codigo": codigo, "estado": estado.value})
+        while estado not in ESTADOS_FINALES:
+            try:
+                evento = await suscripcion.recibir(timeout=settings.SSE_KEEPALIVE)
+            except TimeoutError:
+                # Mantiene viva la conexión a través de proxies
+                yield ": keep-alive\n\n"
+                continue
+            if evento is None:
+                # Suscripción cerrada (cliente lento): EventSource reconecta solo
+                break
+            estado = PedidoEstado(evento["estado"])
+            yield _evento_sse("estado", evento)
+    finally:
+        suscripcion.cerrar()
+
+
+@router.get("/{slug}/pedidos/{codigo}/stream")
+@limiter.limit("20/minute")
+async def seguir_pedido(
+    request: Request,
+    slug: str,
+    codigo: str,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Server-Sent Events con el estado del pedido: envía el estado actual y después
+    cada cambio a medida que ocurre. El stream termina cuando el pedido llega a un
+    estado final (rechazado o finalizado).
+    """
+    negocio = await _negocio_o_404(session, slug)
+
+    # Suscribirse antes de leer el estado: así no se pierde un cambio entre medio
+    suscripcion = bus_eventos.suscribir(canal_pedido(negocio.id, codigo))
+    try:
+        en_cola = await _pedido_en_cola(negocio.id, codigo)
+        estado = en_cola.estado if en_cola else (
+            await session.exec(
+                select(Pedido.estado).where(Pedido.negocio_id == negocio.id, Pedido.codigo == codigo)
+            )
+        ).first()
+        # La conexión vuelve al pool: el stream puede quedar abierto mucho tiempo
+        await session.close()
+    except BaseException:
+        suscripcion.cerrar()
+        raise
+
+    if estado is None:
+        suscripcion.cerrar()
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+
+    return StreamingResponse(
+        _stream_estado_pedido(suscripcion, codigo, PedidoEstado(estado)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{slug}/productos/{producto_id}/toppings")
 @limiter.limit("60/minute")
-def obtener_toppings_producto_publico(
+async def obtener_toppings_producto_publico(
     request: Request,
+    response: Response,
     slug: str,
     producto_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Obtiene los grupos de toppings disponibles para un producto (API pública)"""
-    negocio = session.exec(
-        select(Negocio).where(Negocio.slug == slug, Negocio.activo)
-    ).first()
-    if not negocio:
-        raise HTTPException(status_code=404, detail="Negocio no encontrado")
+    negocio = await _negocio_o_404(session, slug)
+
+    no_modificado = _revalidar(request, response, _etag_catalogo(negocio))
+    if no_modificado:
+        return no_modificado
 
-    producto = session.get(Producto, producto_id)
-    if not producto or producto.negocio_id != negocio.id or not producto.activo:
+    # El catálogo cacheado tiene una entrada de toppings por cada producto activo
+    catalogo = await session.run_sync(catalogo_service.obtener_catalogo, negocio)
+    if producto_id not in catalogo.toppings:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
-    return topping_service.obtener_toppings_producto(session, producto_id)
+    return catalogo.toppings[producto_id]
+
+@router.get("/{slug}/toppings")
+@limiter.limit("60/minute")
+async def obtener_toppings_negocio_publico(
+    request: Request,
+    response: Response,
+    slug: str,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Grupos de toppings de todos los productos activos: {producto_id: [grupos...]}"""
+    negocio = await _negocio_o_404(session, slug)
+
+    no_modificado = _revalidar(request, response, _etag_catalogo(negocio))
+    if no_modificado:
+        return no_modificado
+
+    return await session.run_sync(catalogo_service.obtener_toppings_negocio, negocio)
 
 from pydantic import BaseModel
+
+
 class CouponValidationRequest(BaseModel):
     codigo: str
     items: list[PedidoItemCreate]
@@ -170,64 +399,13 @@ def validar_cupon_endpoint(
     data: CouponValidationRequest,
     session: Session = Depends(get_session)
 ):
-    negocio = session.exec(select(Negocio).where(Negocio.slug == slug)).first()
+    negocio = negocio_service.obtener_negocio_por_slug(session, slug)
     if not negocio:
         raise HTTPException(status_code=404, detail="Negocio no encontrado")
 
-    # Optimization: Prefetch all products and toppings to avoid N+1 queries
-    product_ids = {item.producto_id for item in data.items}
-    
-    topping_ids = set()
-    for item in data.items:
-        if item.toppings:
-            for t in item.toppings:
-                topping_ids.add(t.topping_id)
-    
-    # Fetch products
-    productos = session.exec(select(Producto).where(Producto.id.in_(product_ids))).all()
-    productos_map = {p.id: p for p in productos}
-    
-    # Fetch toppings
-    from app.models.models import Topping
-    toppings_map = {}
-    if topping_ids:
-        toppings = session.exec(select(Topping).where(Topping.id.in_(topping_ids))).all()
-        toppings_map = {t.id: t for t in toppings}
-
-    # Recalcular total y preparar items para validación
-    total_carrito = 0
-    items_para_reglas = []
-    
-    for item in data.items:
-        producto = productos_map.get(item.producto_id)
-        
-        if producto and producto.negocio_id == negocio.id:
-            # Calcular precio toppings
-            precio_toppings = 0
-            if item.toppings:
-                for t in item.toppings:
-                    top_db = toppings_map.get(t.topping_id)
-                    if top_db:
-                        precio_toppings += top_db.precio_extra
-
-            # Calcular precio base: considerar mayorista si aplica
-            precio_base = producto.precio
-            if (
-                negocio.tipo_negocio == TipoNegocio.DISTRIBUIDORA
-                and producto.precio_mayorista is not None
-                and producto.cantidad_mayorista is not None
-                and item.cantidad >= producto.cantidad_mayorista
-            ):
-                precio_base = producto.precio_mayorista
-
-            total_carrito += (precio_base + precio_toppings) * item.cantidad
-            
-            items_para_reglas.append({
-                "producto_id": producto.id,
-                "categoria_id": producto.categoria_id,
-                "cantidad": item.cantidad,
-                "precio_unitario": precio_base + precio_toppings
-            })
+    # Mismos precios que el checkout, desde la tabla compilada del catálogo
+    tabla = precios_service.obtener_tabla_precios(session, negocio)
+    total_carrito, items_para_reglas = tabla.cotizar(data.items)
 
     from app.services.promocion_service import PromocionService
     service = PromocionService(session)
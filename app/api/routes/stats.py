@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta, timezone
+
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, func, desc, col
-from sqlalchemy import cast, Date, text
+from sqlalchemy import Date, cast, text
+from sqlmodel import Session, col, desc, func, select
 
-from app.api.deps import get_session, get_current_user_negocio
-from app.models.models import Negocio, Pedido, PedidoItem, Producto, Usuario, Categoria
+from app.api.deps import get_current_user_negocio, get_session
+from app.core.cache import stats_caches
+from app.models.models import Categoria, Negocio, Pedido, PedidoItem, Producto, Usuario
+from app.services import cola_pedidos_service
 
 router = APIRouter(prefix="/api/stats", tags=["Estadísticas"])
 
@@ -227,3 +230,22 @@ def get_hourly_sales(
             continue
 
     return [{"hour": h, "volume": v} for h, v in hourly_dict.items()]
+
+
+@router.get("/cache")
+def get_cache_stats(current_user_negocio: Negocio = Depends(get_current_user_negocio)):
+    """
+    Hits y misses de los caches en memoria de este proceso.
+    Sirve para medir el efecto del cache sobre la latencia del storefront.
+    """
+    return stats_caches()
+
+
+@router.get("/cola")
+def get_cola_stats(current_user_negocio: Negocio = Depends(get_current_user_negocio)):
+    """
+    Estado de la cola de ingreso de pedidos de este proceso. `descartados_negocio` son
+    pedidos del negocio que la base rechazó aun de a uno: el cliente tiene el código pero
+    el pedido no está en la base, hay que revisarlos a mano.
+    """
+    return cola_pedidos_service.estado_cola(current_user_negocio.id)
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+logger = logging.getLogger("pedilo-api")
+
+_MISSING = object()
+
+# Recargas en segundo plano del modo stale-while-revalidate
+_executor_revalidacion = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-swr")
+
+# Registro de todos los caches del proceso (para métricas y para limpiarlos en tests)
+_caches: dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    Cache en memoria del proceso con expiración por TTL y desalojo LRU.
+    Es thread-safe: los handlers sync corren en el threadpool de Starlette.
+
+    `ttl_fresco` (opcional, menor que `ttl`) habilita stale-while-revalidate en
+    `get_or_revalidate`: pasado ese tiempo la entrada se sigue sirviendo mientras
+    se recarga en segundo plano; `ttl` pasa a ser el límite duro.
+    """
+
+    def __init__(self, nombre: str, maxsize: int = 1024, ttl: float = 60.0, ttl_fresco: float | None = None):
+        self.nombre = nombre
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttl_fresco = ttl_fresco
+        self.hits = 0
+        self.misses = 0
+        self.revalidaciones = 0
+        # (vence el TTL fresco, vence el TTL duro, valor)
+        self._data: OrderedDict[Hashable, tuple[float, float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._revalidando: set[Hashable] = set()
+        # Cambia con cada invalidación: una recarga que empezó antes no pisa el dato nuevo
+        self._generacion = 0
+        _caches[nombre] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            _, expira, valor = entry
+            if expira < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._set(key, valor)
+
+    def _set(self, key: Hashable, valor: Any) -> None:
+        ahora = time.monotonic()
+        ttl_fresco = self.ttl if self.ttl_fresco is None else min(self.ttl_fresco, self.ttl)
+        self._data[key] = (ahora + ttl_fresco, ahora + self.ttl, valor)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            generacion = self._generacion
+        valor = self.get(key, _MISSING)
+        if valor is _MISSING:
+            valor = loader()
+            self._set_si_generacion(key, valor, generacion)
+        return valor
+
+    def _set_si_generacion(self, key: Hashable, valor: Any, generacion: int) -> None:
+        # Si hubo una invalidación mientras se cargaba, el valor puede ser viejo: no se guarda
+        with self._lock:
+            if generacion == self._generacion:
+                self._set(key, valor)
+
+    def get_or_revalidate(
+        self, key: Hashable, loader: Callable[[], Any], recargar: Callable[[], Any]
+    ) -> Any:
+        """
+        Stale-while-revalidate. Con la entrada vigente la devuelve; si ya pasó el TTL
+        fresco, además programa `recargar()` en segundo plano (una sola vez por key).
+        Sin entrada, o pasado el TTL duro, carga sincrónicamente con `loader()`.
+        `recargar` corre en otro thread: no puede usar la sesión del request.
+        Los valores None no se cachean.
+        """
+        programar = False
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            ahora = time.monotonic()
+            if entry is not _MISSING and entry[1] >= ahora:
+                fresco_hasta, _, valor = entry
+                self._data.move_to_end(key)
+                self.hits += 1
+                if fresco_hasta < ahora and key not in self._revalidando:
+                    self._revalidando.add(key)
+                    self.revalidaciones += 1
+                    programar = True
+            else:
+                valor = _MISSING
+                self.misses += 1
+            generacion = self._generacion
+
+        if valor is not _MISSING:
+            if programar:
+                _executor_revalidacion.submit(self._revalidar, key, recargar, generacion)
+            return valor
+
+        valor = loader()
+        if valor is not None:
+            self._set_si_generacion(key, valor, generacion)
+        return valor
+
+    def _revalidar(self, key: Hashable, recargar: Callable[[], Any], generacion: int) -> None:
+        try:
+            valor = recargar()
+        except Exception:
+            # Se sigue sirviendo el valor anterior hasta el TTL duro
+            logger.exception("Error recargando %s[%r] en segundo plano", self.nombre, key)
+            with self._lock:
+                self._revalidando.discard(key)
+            return
+
+        with self._lock:
+            self._revalidando.discard(key)
+            if generacion != self._generacion:
+                return
+            if valor is None:
+                self._data.pop(key, None)
+            else:
+                self._set(key, valor)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._generacion += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generacion += 1
+            self.hits = 0
+            self.misses = 0
+            self.revalidaciones = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "nombre": self.nombre,
+                "entradas": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidaciones": self.revalidaciones,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def stats_caches() -> list[dict[str, Any]]:
+    """Estado de todos los caches registrados en el proceso"""
+    return [cache.stats() for cache in _caches.values()]
+
+
+def limpiar_caches() -> None:
+    """Vacía todos los caches registrados (útil en tests)"""
+    for cache in _caches.values():
+        cache.clear()
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 
+
 class Settings(BaseSettings):
     # Environment
     ENVIRONMENT: str = "development"  # "development" | "production"
@@ -20,6 +21,37 @@ class Settings(BaseSettings):
     MP_PLAN_ID: str | None = None
     MP_WEBHOOK_SECRET: str | None = None  # For HMAC signature verification (luego lo implemento bien)
 
+    # Cache de negocios por slug (storefront público)
+    NEGOCIO_CACHE_TTL: int = 60  # segundos
+    NEGOCIO_CACHE_MAX: int = 1024
+
+    # "estricto": vencido el TTL se recarga en el request
+    # "swr": stale-while-revalidate; vencido el TTL se sirve el snapshot anterior y se
+    # recarga en segundo plano, hasta el TTL duro (recién ahí el request espera a la base)
+    CACHE_MODO: str = "estricto"  # "estricto" | "swr"
+    NEGOCIO_CACHE_TTL_DURO: int = 3600  # segundos, solo en modo "swr"
+
+    # Cache del catálogo público (keyed por versión de catálogo)
+    CATALOGO_CACHE_TTL: int = 300  # segundos
+    CATALOGO_CACHE_MAX: int = 256
+
+    # Seguimiento de pedidos en vivo (SSE)
+    SSE_KEEPALIVE: int = 15  # segundos entre comentarios keep-alive
+
+    # Idempotency-Key en la creación de pedidos
+    IDEMPOTENCIA_TTL: int = 86400  # segundos que se recuerda una key
+    IDEMPOTENCIA_MAX: int = 10000
+
+    # "directo": cada pedido se guarda en la base dentro del request
+    # "cola": se valida contra el catálogo cacheado, se guarda en una cola local durable
+    # (SQLite en modo WAL) y un worker lo pasa a la base en lotes.
+    # Con varios procesos, cada uno necesita su propio PEDIDOS_COLA_PATH
+    PEDIDOS_MODO: str = "directo"  # "directo" | "cola"
+    PEDIDOS_COLA_PATH: str = "./pedidos_cola.db"
+    PEDIDOS_COLA_LOTE: int = 200  # pedidos por commit
+    PEDIDOS_COLA_INTERVALO: float = 0.5  # segundos entre lotes
+    PEDIDOS_COLA_MAX_INTENTOS: int = 5  # después se vuelca de a uno y se apartan los que fallan
+
     class Config:
         env_file = ".env"
 
@@ -1,4 +1,9 @@
-from sqlmodel import SQLModel, create_engine
+from collections.abc import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+
 from app.core.config import settings
 
 engine = create_engine(
@@ -9,5 +14,50 @@ engine = create_engine(
 )
 
 
+def url_async(url: str) -> str:
+    """Traduce la URL sync al driver async equivalente (asyncpg / aiosqlite)"""
+    if url.startswith(("postgresql://", "postgres://", "postgresql+psycopg2://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+# Engine async para el router público: no ocupa hilos del threadpool mientras espera a la DB
+async_engine = create_async_engine(
+    url_async(settings.DATABASE_URL),
+    echo=True,
+    pool_pre_ping=True,
+)
+
+
+_CLAVE_AL_CONFIRMAR = "al_confirmar"
+
+
+def al_confirmar(session: Session, callback: Callable[[], None]) -> None:
+    """
+    Ejecuta `callback` cuando la transacción actual de la sesión hace commit
+    (se descarta si hace rollback). Sirve para actualizar caches en memoria
+    recién cuando los cambios son visibles para las demás conexiones.
+    """
+    session.info.setdefault(_CLAVE_AL_CONFIRMAR, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _ejecutar_al_confirmar(session) -> None:
+    for callback in session.info.pop(_CLAVE_AL_CONFIRMAR, []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_al_confirmar(session) -> None:
+    session.info.pop(_CLAVE_AL_CONFIRMAR, None)
+
+
+def nueva_sesion() -> Session:
+    """Sesión propia para trabajo fuera de un request (por ejemplo, recargas en segundo plano)"""
+    return Session(engine)
+
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from collections.abc import Hashable
+from typing import Any
+
+# Cola por suscriptor: si un cliente no consume y se llena, se lo desconecta
+EVENTOS_COLA_MAX = 100
+
+
+class Suscripcion:
+    """
+    Cola de eventos de un suscriptor, atada al event loop donde se creó.
+    Se consume con `async for`; termina cuando se cierra (o cuando se desborda).
+    """
+
+    def __init__(self, bus: "BusEventos", canal: Hashable, maxsize: int):
+        self.canal = canal
+        self.desbordada = False
+        self._bus = bus
+        self._loop = asyncio.get_running_loop()
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._cerrada = False
+
+    def _entregar(self, evento: Any) -> None:
+        # Corre en el loop del suscriptor
+        if self._cerrada:
+            return
+        try:
+            self._cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.desbordada = True
+            self.cerrar()
+
+    def cerrar(self) -> None:
+        if self._cerrada:
+            return
+        self._cerrada = True
+        self._bus._quitar(self)
+        # Despierta al consumidor aunque la cola esté llena
+        while not self._cola.empty():
+            self._cola.get_nowait()
+        self._cola.put_nowait(None)
+
+    async def recibir(self, timeout: float | None = None) -> Any | None:
+        """Próximo evento; None si la suscripción se cerró. Lanza TimeoutError si no llega nada."""
+        if self._cerrada and self._cola.empty():
+            return None
+        return await asyncio.wait_for(self._cola.get(), timeout)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        evento = await self.recibir()
+        if evento is None:
+            raise StopAsyncIteration
+        return evento
+
+
+class BusEventos:
+    """
+    Pub/sub en memoria del proceso. `publicar` se puede llamar desde cualquier thread
+    (los endpoints sync corren en el threadpool); cada evento se entrega en el loop
+    del suscriptor. No hay persistencia: con varios workers, cada uno tiene el suyo.
+    """
+
+    def __init__(self):
+        self._suscripciones: dict[Hashable, set[Suscripcion]] = {}
+        self._lock = threading.Lock()
+
+    def suscribir(self, canal: Hashable, maxsize: int = EVENTOS_COLA_MAX) -> Suscripcion:
+        suscripcion = Suscripcion(self, canal, maxsize)
+        with self._lock:
+            self._suscripciones.setdefault(canal, set()).add(suscripcion)
+        return suscripcion
+
+    def _quitar(self, suscripcion: Suscripcion) -> None:
+        with self._lock:
+            suscripciones = self._suscripciones.get(suscripcion.canal)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[suscripcion.canal]
+
+    def publicar(self, canal: Hashable, evento: Any) -> int:
+        """Envía el evento a los suscriptores del canal y devuelve cuántos había"""
+        with self._lock:
+            suscripciones = list(self._suscripciones.get(canal, ()))
+        for suscripcion in suscripciones:
+            try:
+                suscripcion._loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                # El loop del suscriptor ya cerró
+                self._quitar(suscripcion)
+        return len(suscripciones)
+
+    def cantidad_suscriptores(self, canal: Hashable) -> int:
+        with self._lock:
+            return len(self._suscripciones.get(canal, ()))
+
+
+bus_eventos = BusEventos()
@@ -1,20 +1,42 @@
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.api.routes import auth, categorias, negocios, pedidos, productos, public, suscripciones, toppings, stats, promociones
 from app.api.middleware import LoggingMiddleware
-from app.core.database import create_db_and_tables
+from app.api.routes import (
+    auth,
+    categorias,
+    negocios,
+    pedidos,
+    productos,
+    promociones,
+    public,
+    stats,
+    suscripciones,
+    toppings,
+)
 from app.core.config import settings
-from app.core.exceptions import EntityNotFoundError, BusinessLogicError, PermissionDeniedError
+from app.core.database import create_db_and_tables
+from app.core.exceptions import BusinessLogicError, EntityNotFoundError, PermissionDeniedError
+from app.services.cola_pedidos_service import avisar_descartados, vaciar_journal_previo, worker_cola
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    # En producción el esquema lo maneja Alembic (`alembic upgrade head` antes de arrancar)
+    if settings.ENVIRONMENT != "production":
+        create_db_and_tables()
+    if settings.PEDIDOS_MODO == "cola":
+        worker_cola.iniciar()
+    else:
+        # Pedidos aceptados en una corrida anterior en modo cola que todavía no están en la base
+        vaciar_journal_previo()
+    avisar_descartados()
     yield
+    if settings.PEDIDOS_MODO == "cola":
+        worker_cola.detener()
 
 
 app = FastAPI(
@@ -39,6 +61,7 @@ async def permission_denied_exception_handler(request: Request, exc: PermissionD
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+
 from app.core.rate_limit import limiter
 
 app.state.limiter = limiter
@@ -70,4 +93,5 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
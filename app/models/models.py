@@ -1,8 +1,11 @@
-from typing import Any, Optional
 from datetime import datetime, timezone
 from enum import Enum
+from typing import Any, Optional
+
+from sqlalchemy import Index, text
 from sqlmodel import JSON, Column, Field, Relationship, SQLModel
 
+
 class PedidoEstado(str, Enum):
     PENDIENTE = "pendiente"
     ACEPTADO = "aceptado"
@@ -67,6 +70,12 @@ class Negocio(SQLModel, table=True):
     activo: bool = True
     creado_en: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+    # Contadores denormalizados para las insignias públicas (backfill: alembic/versions/0002_contadores_y_version_catalogo.py)
+    total_pedidos: int = 0
+    pedidos_finalizados: int = 0
+    # Se incrementa con cada escritura de productos, categorías, toppings o del negocio
+    catalogo_version: int = 0
+
     usuario: Usuario | None = Relationship(back_populates="negocios")
     productos: list["Producto"] = Relationship(back_populates="negocio")
     pedidos: list["Pedido"] = Relationship(back_populates="negocio")
@@ -77,6 +86,10 @@ class Negocio(SQLModel, table=True):
 
 class Categoria(SQLModel, table=True):
     __tablename__ = "categorias"
+    __table_args__ = (
+        # Parcial en Postgres: las lecturas públicas y del panel solo miran las activas
+        Index("ix_categorias_negocio_id_activo", "negocio_id", "activo", postgresql_where=text("activo")),
+    )
 
     id: int | None = Field(default=None, primary_key=True)
     negocio_id: int = Field(foreign_key="negocios.id")
@@ -91,6 +104,9 @@ class Categoria(SQLModel, table=True):
 
 class Producto(SQLModel, table=True):
     __tablename__ = "productos"
+    __table_args__ = (
+        Index("ix_productos_negocio_id_activo", "negocio_id", "activo", postgresql_where=text("activo")),
+    )
 
     id: int | None = Field(default=None, primary_key=True)
     negocio_id: int = Field(foreign_key="negocios.id")
@@ -121,6 +137,12 @@ class Producto(SQLModel, table=True):
 
 class Pedido(SQLModel, table=True):
     __tablename__ = "pedidos"
+    __table_args__ = (
+        Index("ix_pedidos_negocio_id_creado_en", "negocio_id", "creado_en"),
+        Index("ix_pedidos_negocio_id_estado", "negocio_id", "estado"),
+        Index("ix_pedidos_negocio_id_codigo", "negocio_id", "codigo"),
+        Index("ix_pedidos_ingreso_id", "ingreso_id", unique=True),
+    )
 
     id: int | None = Field(default=None, primary_key=True)
     negocio_id: int = Field(foreign_key="negocios.id")
@@ -137,6 +159,10 @@ class Pedido(SQLModel, table=True):
 
     promocion_id: int | None = Field(default=None, foreign_key="promociones.id")
     descuento_aplicado: int = 0
+    # Líneas del pedido (filas de pedido_items), para listar sin cargar los items
+    cantidad_items: int = 0
+    # Entrada de la cola de ingreso de la que salió el pedido (None si se creó directo)
+    ingreso_id: str | None = None
 
     negocio: Negocio | None = Relationship(back_populates="pedidos")
     items: list["PedidoItem"] = Relationship(back_populates="pedido")
@@ -147,7 +173,7 @@ class PedidoItem(SQLModel, table=True):
     __tablename__ = "pedido_items"
 
     id: int | None = Field(default=None, primary_key=True)
-    pedido_id: int = Field(foreign_key="pedidos.id")
+    pedido_id: int = Field(foreign_key="pedidos.id", index=True)
     producto_id: int | None = Field(default=None)
     nombre_producto: str
     precio_unitario: int
@@ -238,6 +264,7 @@ class PromocionTipo(str, Enum):
 
 class Promocion(SQLModel, table=True):
     __tablename__ = "promociones"
+    __table_args__ = (Index("ix_promociones_negocio_id_codigo", "negocio_id", "codigo"),)
 
     id: int | None = Field(default=None, primary_key=True)
     negocio_id: int = Field(foreign_key="negocios.id")
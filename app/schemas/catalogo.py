@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+from app.schemas.categoria import CategoriaRead
+from app.schemas.negocio import NegocioPublicDetail
+from app.schemas.producto import ProductoRead
+
+
+class CatalogoPublico(BaseModel):
+    """Todo lo que necesita el storefront para el primer render, en un solo documento"""
+    version: int
+    negocio: NegocioPublicDetail
+    categorias: list[CategoriaRead]
+    productos: list[ProductoRead]
+    toppings: dict[int, list[dict]]  # {producto_id: grupos de toppings}
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
 from app.models.models import PedidoEstado
 from app.schemas.topping import ToppingSeleccionado
 
@@ -22,7 +25,7 @@ class PedidoCreate(BaseModel):
 
 
 class PedidoItemRead(BaseModel):
-    id: int
+    id: int | None  # None mientras el pedido está en la cola de ingreso
     producto_id: int | None
     nombre_producto: str
     precio_unitario: int
@@ -32,7 +35,7 @@ class PedidoItemRead(BaseModel):
 
 
 class PedidoRead(BaseModel):
-    id: int
+    id: int | None  # None mientras el pedido está en la cola de ingreso
     codigo: str
     estado: PedidoEstado
     total: int
@@ -43,4 +46,49 @@ class PedidoRead(BaseModel):
     direccion_entrega: str | None = None
     notas: str | None = None
     descuento_aplicado: int = 0
+    cantidad_items: int = 0
     items: list[PedidoItemRead]
+
+
+class PedidoResumen(BaseModel):
+    """Fila del listado de pedidos (`vista=resumen`): sin items"""
+    id: int
+    codigo: str
+    estado: PedidoEstado
+    total: int
+    descuento_aplicado: int = 0
+    metodo_pago: str | None
+    tipo_entrega: str | None
+    nombre_cliente: str | None
+    telefono_cliente: str | None
+    cantidad_items: int
+    creado_en: datetime
+
+
+# Máximo de pedidos por carga en lote (distribuidoras)
+MAX_PEDIDOS_LOTE = 500
+
+
+class PedidoLoteCreate(BaseModel):
+    pedidos: list[PedidoCreate] = Field(min_length=1, max_length=MAX_PEDIDOS_LOTE)
+
+
+class PedidoLoteError(BaseModel):
+    indice: int  # posición del pedido en la lista enviada
+    detalle: str
+
+
+class PedidoLoteResultado(BaseModel):
+    creados: list[PedidoRead]
+    errores: list[PedidoLoteError]
+
+
+class PedidosEstadoUpdate(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_PEDIDOS_LOTE)
+    estado: PedidoEstado
+
+
+class PedidosEstadoResultado(BaseModel):
+    estado: PedidoEstado
+    actualizados: list[int]
+    rechazados: list[int]  # inexistentes, de otro negocio o en un estado desde el que no se llega
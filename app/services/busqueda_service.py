@@ -0,0 +1,166 @@
+import threading
+from bisect import bisect_left, insort
+
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import al_confirmar
+from app.models.models import Producto
+from app.schemas.producto import ProductoRead
+from app.services.catalogo_service import TTL_CATALOGO
+from app.services.negocio_service import NegocioSnapshot
+from app.utils.utils import normalizar_texto, tokenizar
+
+# Un índice por negocio; se valida contra la versión de catálogo en cada búsqueda
+_indices = TTLCache(
+    "indices_busqueda",
+    maxsize=settings.CATALOGO_CACHE_MAX,
+    ttl=TTL_CATALOGO,
+)
+
+
+def _tokens_producto(producto: ProductoRead) -> set[str]:
+    tokens = set()
+    for campo in (producto.nombre, producto.descripcion, producto.categoria, producto.sku):
+        tokens.update(tokenizar(campo))
+    if producto.sku:
+        # El SKU también se indexa completo, sin separadores ("AB-12" → "ab12")
+        tokens.add("".join(tokenizar(producto.sku)))
+    return tokens
+
+
+class IndiceProductos:
+    """
+    Índice invertido en memoria de los productos activos de un negocio.
+    Cada token apunta a los ids de producto que lo contienen; el vocabulario
+    ordenado permite resolver prefijos con búsqueda binaria.
+    """
+
+    def __init__(self, version: int, productos: list[ProductoRead]):
+        self.version = version
+        self._productos: dict[int, ProductoRead] = {}
+        self._tokens_por_producto: dict[int, set[str]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._vocabulario: list[str] = []
+        self._lock = threading.Lock()
+        for producto in productos:
+            self._agregar(producto)
+
+    def _agregar(self, producto: ProductoRead) -> None:
+        tokens = _tokens_producto(producto)
+        self._productos[producto.id] = producto
+        self._tokens_por_producto[producto.id] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                insort(self._vocabulario, token)
+            self._postings[token].add(producto.id)
+
+    def _quitar(self, producto_id: int) -> None:
+        self._productos.pop(producto_id, None)
+        for token in self._tokens_por_producto.pop(producto_id, ()):
+            ids = self._postings[token]
+            ids.discard(producto_id)
+            if not ids:
+                del self._postings[token]
+                self._vocabulario.pop(bisect_left(self._vocabulario, token))
+
+    def aplicar_cambio(self, version: int, producto: ProductoRead, activo: bool) -> bool:
+        """
+        Aplica el cambio de un producto si el índice está exactamente una versión atrás.
+        Devuelve False si el índice quedó desfasado y hay que reconstruirlo.
+        """
+        with self._lock:
+            if self.version != version - 1:
+                return False
+            self._quitar(producto.id)
+            if activo:
+                self._agregar(producto)
+            self.version = version
+            return True
+
+    def _ids_con_prefijo(self, prefijo: str) -> set[int]:
+        ids: set[int] = set()
+        i = bisect_left(self._vocabulario, prefijo)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(prefijo):
+            ids |= self._postings[self._vocabulario[i]]
+            i += 1
+        return ids
+
+    def buscar(self, consulta: str, limit: int = 20) -> list[ProductoRead]:
+        """
+        Todos los términos tienen que aparecer (como palabra o prefijo de palabra).
+        Primero los productos cuyo nombre empieza con la consulta, después por nombre.
+        """
+        terminos = tokenizar(consulta)
+        if not terminos:
+            return []
+
+        with self._lock:
+            ids: set[int] | None = None
+            for termino in terminos:
+                encontrados = self._ids_con_prefijo(termino)
+                ids = encontrados if ids is None else ids & encontrados
+                if not ids:
+                    return []
+
+            productos = [self._productos[i] for i in ids or ()]
+
+        consulta_normalizada = " ".join(terminos)
+        productos.sort(
+            key=lambda p: (
+                not " ".join(tokenizar(p.nombre)).startswith(consulta_normalizada),
+                normalizar_texto(p.nombre),
+            )
+        )
+        return productos[:limit]
+
+
+def _construir_indice(session: Session, negocio: NegocioSnapshot) -> IndiceProductos:
+    productos = session.exec(
+        select(Producto)
+        .where(Producto.negocio_id == negocio.id, Producto.activo)
+        .options(joinedload(Producto.categorias))
+    ).all()
+    return IndiceProductos(
+        negocio.catalogo_version, [ProductoRead.model_validate(p) for p in productos]
+    )
+
+
+def obtener_indice(session: Session, negocio: NegocioSnapshot) -> IndiceProductos:
+    """Índice del negocio para su versión de catálogo; se construye la primera vez que se usa"""
+    indice = _indices.get(negocio.id)
+    if indice is None or indice.version < negocio.catalogo_version:
+        indice = _construir_indice(session, negocio)
+        _indices.set(negocio.id, indice)
+    return indice
+
+
+def buscar_productos(
+    session: Session, negocio: NegocioSnapshot, consulta: str, limit: int = 20
+) -> list[ProductoRead]:
+    return obtener_indice(session, negocio).buscar(consulta, limit)
+
+
+def registrar_cambio_producto(
+    session: Session, negocio_id: int, version: int, producto: Producto
+) -> None:
+    """
+    Actualiza incrementalmente el índice del negocio cuando la transacción haga commit.
+    `version` es la versión de catálogo que deja la escritura (ver incrementar_version_catalogo).
+    """
+    indice = _indices.get(negocio_id)
+    if indice is None:
+        return
+
+    # El documento se arma antes del commit: después los atributos quedan expirados
+    documento = ProductoRead.model_validate(producto)
+    activo = producto.activo
+
+    def aplicar() -> None:
+        if not indice.aplicar_cambio(version, documento, activo):
+            _indices.invalidate(negocio_id)
+
+    al_confirmar(session, aplicar)
@@ -0,0 +1,145 @@
+from pydantic import TypeAdapter
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.models import Categoria, Producto
+from app.schemas.catalogo import CatalogoPublico
+from app.schemas.categoria import CategoriaRead
+from app.schemas.negocio import NegocioPublicDetail
+from app.schemas.producto import ProductoRead
+from app.services.negocio_service import NegocioSnapshot
+from app.services.topping_service import obtener_toppings_por_negocio
+from app.utils.compresion import CuerpoPrecomprimido, precomprimir
+
+# Todo lo cacheado acá está atado a una versión de catálogo, y en modo "swr" un snapshot
+# de negocio vencido puede seguir en uso hasta el TTL duro: tiene que durar al menos eso
+TTL_CATALOGO = (
+    max(settings.CATALOGO_CACHE_TTL, settings.NEGOCIO_CACHE_TTL_DURO)
+    if settings.CACHE_MODO == "swr"
+    else settings.CATALOGO_CACHE_TTL
+)
+
+_catalogos = TTLCache(
+    "catalogos",
+    maxsize=settings.CATALOGO_CACHE_MAX,
+    ttl=TTL_CATALOGO,
+)
+
+# Catálogo serializado a JSON y precomprimido (gzip/brotli), por (negocio, versión, insignias)
+_catalogos_json = TTLCache(
+    "catalogos_json",
+    maxsize=settings.CATALOGO_CACHE_MAX,
+    ttl=TTL_CATALOGO,
+)
+
+# Listados de productos ya serializados a JSON y precomprimidos, por (negocio, versión, página)
+_productos_json = TTLCache(
+    "productos_json",
+    maxsize=settings.CATALOGO_CACHE_MAX,
+    ttl=TTL_CATALOGO,
+)
+
+# Configuración de toppings de todos los productos activos, por (negocio, versión)
+_toppings_por_negocio = TTLCache(
+    "toppings_por_negocio",
+    maxsize=settings.CATALOGO_CACHE_MAX,
+    ttl=TTL_CATALOGO,
+)
+
+_lista_productos = TypeAdapter(list[ProductoRead])
+
+
+# ============ Catálogo público ============
+
+def construir_catalogo(session: Session, negocio: NegocioSnapshot) -> CatalogoPublico:
+    """Arma el documento completo del storefront: negocio, categorías, productos y toppings"""
+    categorias = session.exec(
+        select(Categoria)
+        .where(Categoria.negocio_id == negocio.id, Categoria.activo)
+        .order_by(Categoria.id)
+    ).all()
+
+    productos = session.exec(
+        select(Producto)
+        .where(Producto.negocio_id == negocio.id, Producto.activo)
+        .options(joinedload(Producto.categorias))
+        .order_by(Producto.id)
+    ).all()
+
+    producto_ids = [p.id for p in productos]
+    toppings = obtener_toppings_negocio(session, negocio)
+
+    negocio_dict = negocio.a_dict()
+    negocio_dict["insignias"] = negocio.insignias
+
+    return CatalogoPublico(
+        version=negocio.catalogo_version,
+        negocio=NegocioPublicDetail(**negocio_dict),
+        categorias=[CategoriaRead.model_validate(c) for c in categorias],
+        productos=[ProductoRead.model_validate(p) for p in productos],
+        toppings={producto_id: toppings.get(producto_id, []) for producto_id in producto_ids},
+    )
+
+
+def obtener_toppings_negocio(session: Session, negocio: NegocioSnapshot) -> dict[int, list[dict]]:
+    """Mapa {producto_id: grupos} de todos los productos activos, cacheado por versión"""
+    return _toppings_por_negocio.get_or_set(
+        (negocio.id, negocio.catalogo_version),
+        lambda: obtener_toppings_por_negocio(session, negocio.id),
+    )
+
+
+def _clave_catalogo(negocio: NegocioSnapshot) -> tuple:
+    # El documento incluye las insignias, que cambian con los contadores de pedidos
+    # sin tocar la versión de catálogo
+    return (negocio.id, negocio.catalogo_version, *negocio.insignias)
+
+
+def obtener_catalogo(session: Session, negocio: NegocioSnapshot) -> CatalogoPublico:
+    """Devuelve el catálogo cacheado para la versión actual, construyéndolo si hace falta"""
+    return _catalogos.get_or_set(
+        _clave_catalogo(negocio),
+        lambda: construir_catalogo(session, negocio),
+    )
+
+
+def obtener_catalogo_json(session: Session, negocio: NegocioSnapshot) -> CuerpoPrecomprimido:
+    """Catálogo listo para enviar: JSON en crudo, gzip y brotli, generados una vez por versión"""
+    return _catalogos_json.get_or_set(
+        _clave_catalogo(negocio),
+        lambda: precomprimir(obtener_catalogo(session, negocio).model_dump_json().encode()),
+    )
+
+
+def listar_productos_json(
+    session: Session,
+    negocio: NegocioSnapshot,
+    skip: int,
+    limit: int,
+    despues_de_id: int | None = None,
+) -> tuple[CuerpoPrecomprimido, int | None]:
+    """
+    Devuelve el listado público de productos ya renderizado a JSON (y precomprimido), junto
+    con el id de la última fila si la página vino completa (para armar el cursor de la siguiente).
+    Se serializa una sola vez por versión de catálogo; los hits no validan, serializan ni comprimen.
+    """
+    def renderizar() -> tuple[CuerpoPrecomprimido, int | None]:
+        query = (
+            select(Producto)
+            .where(Producto.negocio_id == negocio.id, Producto.activo)
+            .options(joinedload(Producto.categorias))
+        )
+        if despues_de_id is not None:
+            query = query.where(Producto.id > despues_de_id)
+        else:
+            query = query.offset(skip)
+
+        productos = session.exec(query.order_by(Producto.id).limit(limit)).all()
+        ultimo_id = productos[-1].id if len(productos) == limit else None
+        contenido = _lista_productos.dump_json([ProductoRead.model_validate(p) for p in productos])
+        return precomprimir(contenido), ultimo_id
+
+    clave = (negocio.id, negocio.catalogo_version, skip, limit, despues_de_id)
+    return _productos_json.get_or_set(clave, renderizar)
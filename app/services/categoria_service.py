@@ -1,6 +1,9 @@
-from sqlmodel import Session, select, func
+from sqlmodel import Session, func, select
+
+from app.core.exceptions import BusinessLogicError, EntityNotFoundError
 from app.models.models import Categoria, Producto
-from app.core.exceptions import EntityNotFoundError, BusinessLogicError
+from app.services.negocio_service import incrementar_version_catalogo
+
 
 def obtener_categoria_por_id(session: Session, categoria_id: int, negocio_id: int) -> Categoria:
     categoria = session.get(Categoria, categoria_id)
@@ -29,6 +32,7 @@ def obtener_o_crear_categoria_por_nombre(session: Session, negocio_id: int, nomb
 
     nueva = Categoria(negocio_id=negocio_id, nombre=nombre, activo=True)
     session.add(nueva)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     session.refresh(nueva)
     return nueva
@@ -55,5 +59,6 @@ def desactivar_categoria(session: Session, categoria_id: int, negocio_id: int):
 
     categoria.activo = False
     session.add(categoria)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     return {"message": "Categoría desactivada y productos movidos a 'Otros'"}
@@ -0,0 +1,401 @@
+"""
+Cola de ingreso de pedidos (PEDIDOS_MODO="cola").
+
+El request valida el pedido contra el catálogo cacheado, lo guarda en un journal SQLite
+local (WAL, synchronous=FULL: sobrevive a un corte de luz una vez que se respondió) y
+devuelve el código. Un worker en segundo plano toma los pedidos en orden de llegada y
+los inserta en la base en lotes, con un solo commit por lote.
+
+Semántica at-least-once: un pedido sale de la cola recién después del commit en la base.
+Si el proceso muere entre el commit y el borrado, el lote se vuelve a procesar al
+arrancar; los pedidos cuya entrada (ingreso_id) ya está en la base se saltean, así que
+el reintento no los duplica.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.database import nueva_sesion
+from app.models.models import Pedido, PedidoEstado, PedidoItem
+from app.schemas.pedido import PedidoItemRead, PedidoRead
+from app.services.negocio_service import incrementar_contador_pedidos
+
+logger = logging.getLogger(__name__)
+
+
+class ColaPedidos:
+    """Journal append-only de pedidos pendientes de pasar a la base. Thread-safe."""
+
+    def __init__(self, ruta: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pedidos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                negocio_id INTEGER NOT NULL,
+                codigo TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                intentos INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_pedidos_negocio_id_codigo ON pedidos (negocio_id, codigo)"
+        )
+        # Pedidos que fallaron PEDIDOS_COLA_MAX_INTENTOS veces y también de a uno: se
+        # apartan para no trabar la cola y quedan acá para revisarlos a mano
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS descartados (
+                id INTEGER PRIMARY KEY,
+                negocio_id INTEGER NOT NULL,
+                codigo TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                intentos INTEGER NOT NULL,
+                error TEXT NOT NULL,
+                descartado_en TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+    def encolar(self, negocio_id: int, codigo: str, datos: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pedidos (negocio_id, codigo, datos) VALUES (?, ?, ?)",
+                (negocio_id, codigo, datos),
+            )
+
+    def buscar(self, negocio_id: int, codigo: str) -> str | None:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT datos FROM pedidos WHERE negocio_id = ? AND codigo = ?",
+                (negocio_id, codigo),
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def tomar_lote(self, limite: int) -> list[tuple[int, str, int]]:
+        """Los `limite` pedidos más viejos como (id, datos, intentos), sin sacarlos de la cola"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, datos, intentos FROM pedidos ORDER BY id LIMIT ?", (limite,)
+            ).fetchall()
+
+    def confirmar(self, ids: list[int]) -> None:
+        """Saca de la cola los pedidos que ya están en la base"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM pedidos WHERE id = ?", [(i,) for i in ids])
+
+    def registrar_fallo(self, ids: list[int]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE pedidos SET intentos = intentos + 1 WHERE id = ?", [(i,) for i in ids]
+            )
+
+    def descartar(self, entrada_id: int, error: str) -> None:
+        """Mueve el pedido a descartados"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    """
+                    INSERT INTO descartados (id, negocio_id, codigo, datos, intentos, error)
+                    SELECT id, negocio_id, codigo, datos, intentos, ? FROM pedidos WHERE id = ?
+                    """,
+                    (error, entrada_id),
+                )
+                self._conn.execute("DELETE FROM pedidos WHERE id = ?", (entrada_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def cantidad(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM pedidos").fetchone()[0]
+
+    def cantidad_descartados(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM descartados").fetchone()[0]
+
+    def descartados(self, negocio_id: int) -> list[tuple[str, str]]:
+        """(codigo, descartado_en) de los pedidos apartados del negocio"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT codigo, descartado_en FROM descartados WHERE negocio_id = ? ORDER BY id",
+                (negocio_id,),
+            ).fetchall()
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cola: ColaPedidos | None = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola() -> ColaPedidos:
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaPedidos(settings.PEDIDOS_COLA_PATH)
+        return _cola
+
+
+# ============ Serialización ============
+
+def _serializar(datos: dict) -> str:
+    pedido = {
+        **datos["pedido"],
+        "estado": PedidoEstado(datos["pedido"]["estado"]).value,
+        "creado_en": datos["pedido"]["creado_en"].isoformat(),
+    }
+    return json.dumps({"pedido": pedido, "items": datos["items"]})
+
+
+def _deserializar(crudo: str) -> dict:
+    datos = json.loads(crudo)
+    datos["pedido"]["estado"] = PedidoEstado(datos["pedido"]["estado"])
+    datos["pedido"]["creado_en"] = datetime.fromisoformat(datos["pedido"]["creado_en"])
+    # Pedidos encolados antes de que existiera la columna
+    datos["pedido"].setdefault("cantidad_items", len(datos["items"]))
+    return datos
+
+
+def a_pedido_read(datos: dict) -> PedidoRead:
+    """Respuesta de un pedido que todavía no tiene id en la base"""
+    return PedidoRead(
+        id=None,
+        items=[PedidoItemRead(id=None, **item) for item in datos["items"]],
+        **datos["pedido"],
+    )
+
+
+# ============ Ingreso ============
+
+def encolar(datos: dict) -> None:
+    """Guarda el pedido armado por `pedido_service.armar_pedido_en_cola` (bloquea hasta el fsync)"""
+    # Id propio de la entrada: el código del pedido es corto y puede repetirse, así que
+    # el volcado usa este para no duplicar en un reintento y para asociar los items
+    datos = {**datos, "pedido": {**datos["pedido"], "ingreso_id": uuid4().hex}}
+    obtener_cola().encolar(datos["pedido"]["negocio_id"], datos["pedido"]["codigo"], _serializar(datos))
+
+
+def buscar_en_cola(negocio_id: int, codigo: str) -> PedidoRead | None:
+    crudo = obtener_cola().buscar(negocio_id, codigo)
+    return a_pedido_read(_deserializar(crudo)) if crudo else None
+
+
+# ============ Volcado a la base ============
+
+def volcar_lote(session: Session, lote: list[dict]) -> int:
+    """
+    Inserta los pedidos del lote en una sola transacción: un INSERT multi-fila de pedidos,
+    otro de items y un UPDATE de contador por negocio. Saltea los que ya estaban en la base
+    (reintento de un lote confirmado a medias), reconocidos por `ingreso_id`.
+    Devuelve cuántos insertó.
+    """
+    ingresos = [d["pedido"]["ingreso_id"] for d in lote]
+    existentes = set(
+        session.exec(select(Pedido.ingreso_id).where(col(Pedido.ingreso_id).in_(ingresos))).all()
+    )
+    nuevos = [d for d in lote if d["pedido"]["ingreso_id"] not in existentes]
+    if not nuevos:
+        return 0
+
+    ids = dict(
+        session.execute(
+            insert(Pedido).returning(Pedido.ingreso_id, Pedido.id),
+            [d["pedido"] for d in nuevos],
+        ).all()
+    )
+
+    filas_items = [
+        {"pedido_id": ids[d["pedido"]["ingreso_id"]], **item}
+        for d in nuevos
+        for item in d["items"]
+    ]
+    if filas_items:
+        session.execute(insert(PedidoItem), filas_items)
+
+    for negocio_id, cantidad in Counter(d["pedido"]["negocio_id"] for d in nuevos).items():
+        incrementar_contador_pedidos(session, negocio_id, cantidad=cantidad)
+
+    # El feed del comercio recibe los pedidos recién ahora, ya con id
+    from app.services.pedido_service import notificar_pedidos_nuevos
+    por_negocio = defaultdict(list)
+    for d in nuevos:
+        pedido = a_pedido_read(d).model_copy(update={"id": ids[d["pedido"]["ingreso_id"]]})
+        por_negocio[d["pedido"]["negocio_id"]].append(pedido)
+    for negocio_id, pedidos in por_negocio.items():
+        notificar_pedidos_nuevos(session, negocio_id, pedidos)
+
+    session.commit()
+    return len(nuevos)
+
+
+def procesar_cola(session: Session, limite: int | None = None) -> int:
+    """Pasa a la base el próximo lote de la cola; devuelve cuántos pedidos sacó de la cola"""
+    cola = obtener_cola()
+    entradas = cola.tomar_lote(limite or settings.PEDIDOS_COLA_LOTE)
+    if not entradas:
+        return 0
+
+    ids = [entrada_id for entrada_id, _, _ in entradas]
+    try:
+        volcar_lote(session, [_deserializar(crudo) for _, crudo, _ in entradas])
+    except Exception:
+        session.rollback()
+        cola.registrar_fallo(ids)
+        if max(intentos for _, _, intentos in entradas) + 1 < settings.PEDIDOS_COLA_MAX_INTENTOS:
+            raise
+        logger.exception(
+            "El lote de la cola falló %d veces; se vuelca de a un pedido", settings.PEDIDOS_COLA_MAX_INTENTOS
+        )
+        return _aislar_fallidos(session, entradas)
+
+    # Recién ahora: si el proceso muere antes, el lote se reintenta y no se duplica
+    cola.confirmar(ids)
+    return len(ids)
+
+
+def _aislar_fallidos(session: Session, entradas: list[tuple[int, str, int]]) -> int:
+    """
+    Vuelca el lote de a un pedido: los que fallan solos pasan a descartados para no
+    trabar a los que vienen detrás. Un error de conexión corta el proceso: la base no
+    responde, el pedido no tiene la culpa y se reintenta en la próxima vuelta.
+    """
+    cola = obtener_cola()
+    for entrada_id, crudo, _ in entradas:
+        try:
+            volcar_lote(session, [_deserializar(crudo)])
+        except (OperationalError, InterfaceError):
+            session.rollback()
+            raise
+        except Exception as e:
+            session.rollback()
+            logger.exception("Pedido %s de la cola descartado: falla aunque se vuelque solo", entrada_id)
+            cola.descartar(entrada_id, repr(e))
+            continue
+        cola.confirmar([entrada_id])
+    return len(entradas)
+
+
+def vaciar_cola() -> None:
+    """Pasa a la base todo lo que hay en la cola; un error corta y el resto queda en la cola"""
+    with nueva_sesion() as session:
+        while procesar_cola(session):
+            pass
+
+
+def _hay_journal() -> bool:
+    # En modo directo no se crea el journal solo para mirarlo
+    return _cola is not None or os.path.exists(settings.PEDIDOS_COLA_PATH)
+
+
+def vaciar_journal_previo() -> None:
+    """
+    Con PEDIDOS_MODO="directo" nadie lee ni vacía el journal. Si quedaron pedidos de una
+    corrida anterior en modo cola (ya aceptados, con el código entregado al cliente), se
+    pasan a la base antes de arrancar; si la base no los toma, la app no arranca.
+    """
+    if not _hay_journal():
+        return
+    cola = obtener_cola()
+    pendientes = cola.cantidad()
+    if not pendientes:
+        return
+
+    logger.warning("Quedaron %d pedidos en la cola de ingreso; se pasan a la base", pendientes)
+    # Cada vuelta fallida suma un intento: al llegar al máximo se apartan los que fallan solos
+    for _ in range(settings.PEDIDOS_COLA_MAX_INTENTOS):
+        try:
+            vaciar_cola()
+            break
+        except Exception:
+            logger.exception("Error pasando la cola de ingreso a la base")
+
+    pendientes = cola.cantidad()
+    if pendientes:
+        raise RuntimeError(
+            f"Quedan {pendientes} pedidos en {settings.PEDIDOS_COLA_PATH} sin pasar a la base; "
+            f'arrancar con PEDIDOS_MODO="cola" o revisar la base'
+        )
+
+
+def estado_cola(negocio_id: int) -> dict:
+    """Pendientes y descartados de la cola; los descartados del negocio van con su código"""
+    if not _hay_journal():
+        return {"pendientes": 0, "descartados": 0, "descartados_negocio": []}
+    cola = obtener_cola()
+    return {
+        "pendientes": cola.cantidad(),
+        "descartados": cola.cantidad_descartados(),
+        "descartados_negocio": [
+            {"codigo": codigo, "descartado_en": descartado_en}
+            for codigo, descartado_en in cola.descartados(negocio_id)
+        ],
+    }
+
+
+def avisar_descartados() -> None:
+    """Al arrancar: los descartados tienen código entregado y no están en la base"""
+    if _hay_journal() and (cantidad := obtener_cola().cantidad_descartados()):
+        logger.error(
+            "Hay %d pedidos descartados en %s: no están en la base y hay que revisarlos a mano",
+            cantidad,
+            settings.PEDIDOS_COLA_PATH,
+        )
+
+
+class WorkerCola:
+    """Thread que vacía la cola de ingreso en lotes mientras la app está levantada"""
+
+    def __init__(self):
+        self._detener = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._correr, name="cola-pedidos", daemon=True)
+        self._thread.start()
+
+    def detener(self) -> None:
+        """Frena el worker y pasa a la base lo que quedó en la cola (si la base responde)"""
+        self._detener.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._vaciar()
+
+    def _vaciar(self) -> None:
+        try:
+            vaciar_cola()
+        except Exception:
+            logger.exception("No se pudo vaciar la cola de pedidos; queda para el próximo arranque")
+
+    def _correr(self) -> None:
+        while not self._detener.is_set():
+            procesados = 0
+            try:
+                with nueva_sesion() as session:
+                    procesados = procesar_cola(session)
+            except Exception:
+                logger.exception("Error pasando pedidos de la cola a la base; se reintenta")
+            # Lote completo: probablemente hay más esperando
+            if procesados < settings.PEDIDOS_COLA_LOTE:
+                self._detener.wait(settings.PEDIDOS_COLA_INTERVALO)
+
+
+worker_cola = WorkerCola()
@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.exceptions import BusinessLogicError
+
+# Respuestas ya enviadas (o en curso) por (negocio, Idempotency-Key)
+_reservas = TTLCache(
+    "idempotencia",
+    maxsize=settings.IDEMPOTENCIA_MAX,
+    ttl=settings.IDEMPOTENCIA_TTL,
+)
+_lock = threading.Lock()
+
+
+@dataclass
+class Reserva:
+    """
+    Una key en uso. `futuro` se resuelve con el cuerpo de la respuesta exitosa,
+    o con None si el request falló (y otro intento puede volver a hacer el trabajo).
+    Es un concurrent.futures.Future: se puede esperar desde cualquier event loop.
+    """
+
+    huella: str
+    futuro: Future = field(default_factory=Future)
+
+
+def huella_cuerpo(cuerpo: bytes) -> str:
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+def _reservar(clave: Hashable, huella: str) -> tuple[Reserva, bool]:
+    """Devuelve la reserva de la clave y si la creó este llamado (y le toca hacer el trabajo)"""
+    with _lock:
+        reserva = _reservas.get(clave)
+        fallida = reserva is not None and reserva.futuro.done() and reserva.futuro.result() is None
+        if reserva is None or fallida:
+            reserva = Reserva(huella)
+            _reservas.set(clave, reserva)
+            return reserva, True
+        return reserva, False
+
+
+def _completar(clave: Hashable, reserva: Reserva, contenido: bytes | None) -> None:
+    if contenido is None:
+        # Solo se guardan las respuestas exitosas: el próximo reintento vuelve a intentar
+        with _lock:
+            if _reservas.get(clave) is reserva:
+                _reservas.invalidate(clave)
+    reserva.futuro.set_result(contenido)
+
+
+async def ejecutar_idempotente(
+    clave: Hashable, huella: str, operacion: Callable[[], Awaitable[bytes]]
+) -> tuple[bytes, bool]:
+    """
+    Ejecuta `operacion` una sola vez por clave y devuelve (cuerpo, es_repeticion).
+    Los reintentos reciben los mismos bytes de la primera respuesta exitosa; si llegan
+    mientras la original está en curso, la esperan en lugar de repetir el trabajo.
+    Es por proceso: con varios workers cada uno tiene su propio registro.
+    """
+    while True:
+        reserva, propia = _reservar(clave, huella)
+        if reserva.huella != huella:
+            raise BusinessLogicError("La Idempotency-Key ya se usó con un pedido distinto")
+
+        if not propia:
+            contenido = await asyncio.wrap_future(reserva.futuro)
+            if contenido is not None:
+                return contenido, True
+            # El original falló: este reintento hace el trabajo
+            continue
+
+        contenido = None
+        try:
+            contenido = await operacion()
+            return contenido, False
+        finally:
+            _completar(clave, reserva, contenido)
@@ -1,10 +1,14 @@
+from io import BytesIO
+from typing import Any, BinaryIO
+
 import openpyxl
-from typing import BinaryIO, Any
-from sqlmodel import Session, select
-from app.models.models import Producto, Categoria
 import requests
+from sqlmodel import Session, select
+
+from app.models.models import Categoria, Producto
+from app.services.negocio_service import incrementar_version_catalogo
 from app.utils.cloudinary import subir_imagen
-from io import BytesIO
+
 
 class ImportService:
     def _fetch_image_from_barcode(self, barcode: str) -> str | None:
@@ -227,5 +231,6 @@ class ImportService:
         # I need another chunk to insert the logic inside the loop.
 
         
+        incrementar_version_catalogo(db, negocio_id)
         db.commit()
         return stats
@@ -0,0 +1,173 @@
+from dataclasses import dataclass, fields
+from typing import Any
+
+from sqlalchemy import update
+from sqlmodel import Session, func, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import al_confirmar, nueva_sesion
+from app.models.models import Negocio, Pedido, PedidoEstado
+
+_negocios_por_slug = TTLCache(
+    "negocios_por_slug",
+    maxsize=settings.NEGOCIO_CACHE_MAX,
+    ttl=settings.NEGOCIO_CACHE_TTL_DURO if settings.CACHE_MODO == "swr" else settings.NEGOCIO_CACHE_TTL,
+    ttl_fresco=settings.NEGOCIO_CACHE_TTL,
+)
+_slugs_por_id: dict[int, str] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class NegocioSnapshot:
+    """Copia inmutable y liviana de un Negocio, segura para compartir entre requests"""
+
+    id: int
+    usuario_id: int
+    nombre: str
+    descripcion: str | None
+    slug: str
+    logo_url: str | None
+    banner_url: str | None
+    anuncio_web: str | None
+    color_primario: str | None
+    color_secundario: str | None
+    metodos_pago: tuple[str, ...]
+    tipos_entrega: tuple[str, ...]
+    codigo_pais: str | None
+    telefono: str | None
+    direccion: str | None
+    horario: str | None
+    acepta_pedidos: bool | None
+    pedido_minimo: int
+    tipo_negocio: str
+    activo: bool
+    total_pedidos: int
+    pedidos_finalizados: int
+    catalogo_version: int
+
+    @classmethod
+    def desde_modelo(cls, negocio: Negocio) -> "NegocioSnapshot":
+        data = {f.name: getattr(negocio, f.name) for f in fields(cls)}
+        data["metodos_pago"] = tuple(negocio.metodos_pago or [])
+        data["tipos_entrega"] = tuple(negocio.tipos_entrega or [])
+        return cls(**data)
+
+    @property
+    def insignias(self) -> list[str]:
+        insignias = []
+        if self.total_pedidos > 100:
+            insignias.append("TOP_SELLER_100")
+        if self.pedidos_finalizados > 50:
+            insignias.append("VERIFICADO_50")
+        return insignias
+
+    def a_dict(self) -> dict[str, Any]:
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data["metodos_pago"] = list(self.metodos_pago)
+        data["tipos_entrega"] = list(self.tipos_entrega)
+        return data
+
+
+def _cargar_snapshot(session: Session, slug: str) -> NegocioSnapshot | None:
+    negocio = session.exec(select(Negocio).where(Negocio.slug == slug)).first()
+    if not negocio:
+        return None
+
+    snapshot = NegocioSnapshot.desde_modelo(negocio)
+    _slugs_por_id[snapshot.id] = slug
+    return snapshot
+
+
+def _recargar_snapshot(slug: str) -> NegocioSnapshot | None:
+    with nueva_sesion() as session:
+        return _cargar_snapshot(session, slug)
+
+
+def obtener_negocio_por_slug(session: Session, slug: str) -> NegocioSnapshot | None:
+    """
+    Resuelve un slug a un NegocioSnapshot, usando el cache del proceso.
+    No filtra por `activo`: cada caller decide si un negocio inactivo le sirve.
+    En modo "swr" un snapshot vencido se sigue devolviendo mientras se recarga aparte.
+    """
+    return _negocios_por_slug.get_or_revalidate(
+        slug,
+        lambda: _cargar_snapshot(session, slug),
+        lambda: _recargar_snapshot(slug),
+    )
+
+
+def invalidar_negocio(slug: str) -> None:
+    """Descarta el snapshot cacheado de un negocio (llamar después de modificarlo)"""
+    _negocios_por_slug.invalidate(slug)
+
+
+def invalidar_negocio_por_id(negocio_id: int) -> None:
+    slug = _slugs_por_id.pop(negocio_id, None)
+    if slug is not None:
+        invalidar_negocio(slug)
+
+
+# ============ Versión de catálogo ============
+
+def incrementar_version_catalogo(session: Session, negocio_id: int) -> int:
+    """
+    Incrementa la versión de catálogo del negocio dentro de la transacción actual
+    y devuelve la nueva versión. Todo lo cacheado por versión queda obsoleto
+    cuando la transacción hace commit.
+    """
+    version = session.exec(
+        update(Negocio)
+        .where(Negocio.id == negocio_id)
+        .values(catalogo_version=Negocio.catalogo_version + 1)
+        .returning(Negocio.catalogo_version)
+    ).scalar_one()
+    # El snapshot guarda la versión: se descarta recién cuando la nueva es visible
+    al_confirmar(session, lambda: invalidar_negocio_por_id(negocio_id))
+    return version
+
+
+# ============ Contadores de pedidos ============
+
+def incrementar_contador_pedidos(
+    session: Session, negocio_id: int, finalizados: bool = False, cantidad: int = 1
+) -> None:
+    """
+    Incrementa atómicamente (UPDATE ... SET x = x + n) un contador del negocio.
+    No hace commit: corre dentro de la transacción del pedido.
+    """
+    columna = Negocio.pedidos_finalizados if finalizados else Negocio.total_pedidos
+    session.exec(
+        update(Negocio)
+        .where(Negocio.id == negocio_id)
+        .values({columna: columna + cantidad})
+        # Sin sincronizar la sesión: evaluar `x + 1` en memoria recargaría el Negocio
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recalcular_contadores_pedidos(session: Session) -> int:
+    """Recalcula los contadores de todos los negocios desde la tabla de pedidos"""
+    totales = dict(
+        session.exec(
+            select(Pedido.negocio_id, func.count(Pedido.id)).group_by(Pedido.negocio_id)
+        ).all()
+    )
+    finalizados = dict(
+        session.exec(
+            select(Pedido.negocio_id, func.count(Pedido.id))
+            .where(Pedido.estado == PedidoEstado.FINALIZADO)
+            .group_by(Pedido.negocio_id)
+        ).all()
+    )
+
+    negocios = session.exec(select(Negocio)).all()
+    for negocio in negocios:
+        negocio.total_pedidos = totales.get(negocio.id, 0)
+        negocio.pedidos_finalizados = finalizados.get(negocio.id, 0)
+        session.add(negocio)
+
+    session.commit()
+    for negocio in negocios:
+        invalidar_negocio(negocio.slug)
+    return len(negocios)
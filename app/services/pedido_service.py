@@ -1,21 +1,172 @@
+import asyncio
+from datetime import UTC, datetime
 from uuid import uuid4
-from sqlmodel import Session, select
-from app.models.models import Negocio, Pedido, PedidoItem, Producto, TipoNegocio
-from app.schemas.pedido import PedidoCreate
-from app.core.exceptions import EntityNotFoundError, BusinessLogicError, PermissionDeniedError
-from app.services.topping_service import (
-    obtener_toppings_para_varios_productos,
-    validar_toppings_con_config
+
+from fastapi import HTTPException
+from sqlalchemy import insert, update
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.database import al_confirmar
+from app.core.eventos import bus_eventos
+from app.core.exceptions import BusinessLogicError, EntityNotFoundError, PermissionDeniedError
+from app.models.models import Pedido, PedidoEstado, PedidoItem, TipoNegocio
+from app.schemas.pedido import (
+    PedidoCreate,
+    PedidoItemRead,
+    PedidoLoteError,
+    PedidoLoteResultado,
+    PedidoRead,
+    PedidosEstadoResultado,
+)
+from app.services import cola_pedidos_service, precios_service
+from app.services.negocio_service import (
+    NegocioSnapshot,
+    incrementar_contador_pedidos,
+    obtener_negocio_por_slug,
 )
 
+# Estados desde los que un pedido ya no cambia
+ESTADOS_FINALES = frozenset({PedidoEstado.RECHAZADO, PedidoEstado.FINALIZADO})
+
+
+def canal_pedido(negocio_id: int, codigo: str) -> tuple:
+    """Canal del bus de eventos donde se publican los cambios de estado de un pedido"""
+    return ("pedido", negocio_id, codigo)
+
 
-def crear_nuevo_pedido(session: Session, slug: str, data: PedidoCreate) -> Pedido:
+def canal_negocio(negocio_id: int) -> tuple:
+    """Canal del feed del comercio: pedidos nuevos y cambios de estado de todo el negocio"""
+    return ("negocio", negocio_id)
+
+
+def notificar_cambio_estado(session: Session, pedido: Pedido) -> None:
+    """Publica el nuevo estado del pedido cuando la transacción haga commit"""
+    notificar_cambios_estado(session, pedido.negocio_id, [(pedido.id, pedido.codigo)], pedido.estado)
+
+
+def notificar_cambios_estado(
+    session: Session, negocio_id: int, pedidos: list[tuple[int, str]], estado: PedidoEstado
+) -> None:
+    """
+    Igual que `notificar_cambio_estado` para varios pedidos (id, codigo) que pasaron al
+    mismo estado: un evento por pedido para su seguimiento y uno solo para el feed del negocio
+    """
+    valor = PedidoEstado(estado).value
+
+    def publicar():
+        for _, codigo in pedidos:
+            bus_eventos.publicar(canal_pedido(negocio_id, codigo), {"codigo": codigo, "estado": valor})
+        bus_eventos.publicar(canal_negocio(negocio_id), {
+            "tipo": "estado",
+            "estado": valor,
+            "pedidos": [{"id": pedido_id, "codigo": codigo} for pedido_id, codigo in pedidos],
+        })
 
-    negocio = session.exec(
-        select(Negocio).where(Negocio.slug == slug, Negocio.activo == True)
-    ).first()
+    al_confirmar(session, publicar)
 
-    if not negocio:
+
+def notificar_pedidos_nuevos(session: Session, negocio_id: int, pedidos: list[PedidoRead]) -> None:
+    """Publica en el feed del negocio los pedidos creados, cuando la transacción haga commit"""
+
+    def publicar():
+        # Sin comercios conectados no vale la pena serializar
+        if bus_eventos.cantidad_suscriptores(canal_negocio(negocio_id)):
+            bus_eventos.publicar(canal_negocio(negocio_id), {
+                "tipo": "pedidos_nuevos",
+                "pedidos": [p.model_dump(mode="json") for p in pedidos],
+            })
+
+    al_confirmar(session, publicar)
+
+
+# Estado destino -> estado desde el que se puede llegar
+TRANSICIONES = {
+    PedidoEstado.ACEPTADO: PedidoEstado.PENDIENTE,
+    PedidoEstado.RECHAZADO: PedidoEstado.PENDIENTE,
+    PedidoEstado.EN_PROGRESO: PedidoEstado.ACEPTADO,
+    PedidoEstado.FINALIZADO: PedidoEstado.EN_PROGRESO,
+}
+
+
+# Error cuando el pedido existe pero no está en el estado previo
+MENSAJES_TRANSICION = {
+    PedidoEstado.ACEPTADO: "Solo pedidos pendientes pueden aceptarse",
+    PedidoEstado.RECHAZADO: "Solo pedidos pendientes pueden rechazarse",
+    PedidoEstado.EN_PROGRESO: "Solo pedidos aceptados pueden pasar a progreso",
+    PedidoEstado.FINALIZADO: "Solo pedidos en progreso pueden finalizarse",
+}
+
+
+def _actualizar_estado(
+    session: Session, negocio_id: int, pedido_ids: list[int], estado: PedidoEstado
+) -> set[int]:
+    """
+    Compare-and-set: un UPDATE ... WHERE estado = <previo> RETURNING, acotado al negocio.
+    Dos dispositivos que tocan el mismo pedido a la vez no pueden moverlo los dos.
+    Programa los eventos y el contador de finalizados; no hace commit.
+    Devuelve los ids que cambiaron.
+    """
+    if estado not in TRANSICIONES:
+        raise BusinessLogicError(f"Los pedidos no pueden pasar a '{PedidoEstado(estado).value}'")
+
+    filas = session.exec(
+        update(Pedido)
+        .where(
+            Pedido.negocio_id == negocio_id,
+            col(Pedido.id).in_(pedido_ids),
+            Pedido.estado == TRANSICIONES[estado],
+        )
+        .values(estado=estado)
+        .returning(Pedido.id, Pedido.codigo)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if filas:
+        notificar_cambios_estado(session, negocio_id, filas, estado)
+        if estado == PedidoEstado.FINALIZADO:
+            incrementar_contador_pedidos(session, negocio_id, finalizados=True, cantidad=len(filas))
+    return {pedido_id for pedido_id, _ in filas}
+
+
+def cambiar_estado_pedido(session: Session, negocio_id: int, pedido_id: int, estado: PedidoEstado) -> None:
+    """
+    Transición de un pedido. Si el UPDATE no tocó ninguna fila, una consulta distingue
+    entre pedido inexistente (EntityNotFoundError) y estado incorrecto (BusinessLogicError).
+    """
+    if not _actualizar_estado(session, negocio_id, [pedido_id], estado):
+        existe = session.exec(
+            select(Pedido.id).where(Pedido.id == pedido_id, Pedido.negocio_id == negocio_id)
+        ).first()
+        session.rollback()
+        if existe is None:
+            raise EntityNotFoundError("Pedido no encontrado")
+        raise BusinessLogicError(MENSAJES_TRANSICION[estado])
+    session.commit()
+
+
+def cambiar_estado_pedidos(
+    session: Session, negocio_id: int, pedido_ids: list[int], estado: PedidoEstado
+) -> PedidosEstadoResultado:
+    """
+    Pasa a `estado` los pedidos del negocio que están en el estado previo correspondiente,
+    con un solo UPDATE condicional. Los demás ids (de otro negocio, inexistentes o en otro
+    estado) se devuelven como rechazados sin tocarlos. Los ids repetidos cuentan una vez.
+    """
+    pedido_ids = list(dict.fromkeys(pedido_ids))
+    actualizados = _actualizar_estado(session, negocio_id, pedido_ids, estado)
+    session.commit()
+
+    return PedidosEstadoResultado(
+        estado=estado,
+        actualizados=[i for i in pedido_ids if i in actualizados],
+        rechazados=[i for i in pedido_ids if i not in actualizados],
+    )
+
+
+def _validar_negocio_para_pedido(negocio: NegocioSnapshot | None, data: PedidoCreate) -> NegocioSnapshot:
+    if not negocio or not negocio.activo:
         raise EntityNotFoundError("Negocio no encontrado")
 
     if not negocio.acepta_pedidos:
@@ -27,84 +178,58 @@ def crear_nuevo_pedido(session: Session, slug: str, data: PedidoCreate) -> Pedid
     if data.tipo_entrega not in negocio.tipos_entrega:
         raise BusinessLogicError("El tipo de entrega no está permitido por este negocio")
 
-    items_procesados = []
-    
-    # --- LOGICA DE PROCESAMIENTO DE ITEMS (OPTIMIZADA) ---
-    subtotal_productos = 0
+    return negocio
 
-    # 1. Identificar todos los productos y toppings requeridos
-    producto_ids = {item.producto_id for item in data.items}
-    
-    # 2. Cargar todos los productos en una sola consulta
-    productos = session.exec(select(Producto).where(Producto.id.in_(producto_ids))).all()
-    productos_map = {p.id: p for p in productos}
-    
-    # 3. Validar existencia de todos los productos y pertenencia al negocio
-    for item in data.items:
-        if item.producto_id not in productos_map:
-            raise EntityNotFoundError(f"Producto {item.producto_id} no encontrado")
-        
-        producto = productos_map[item.producto_id]
-        if producto.negocio_id != negocio.id:
-            raise EntityNotFoundError(f"Producto {item.producto_id} no pertenece al negocio")
-            
-        if not producto.stock:
-            raise BusinessLogicError(f"El producto '{producto.nombre}' no tiene stock disponible")
-
-    # 4. Cargar configuraciones de toppings para todos los productos involucrados
-    configs_map = obtener_toppings_para_varios_productos(session, list(producto_ids))
-
-    # 5. Procesar items usando datos en memoria
-    es_distribuidora = negocio.tipo_negocio == TipoNegocio.DISTRIBUIDORA
-    for item in data.items:
-        if item.cantidad <= 0:
-            raise BusinessLogicError("La cantidad de los productos debe ser mayor a 0")
-
-        producto = productos_map[item.producto_id]
-
-        # Validar cantidad mínima por producto (solo distribuidoras)
-        if es_distribuidora and item.cantidad < producto.cantidad_minima:
-            raise BusinessLogicError(
-                f"La cantidad mínima para '{producto.nombre}' es {producto.cantidad_minima} {producto.unidad}(s)"
-            )
-        
-        # Validar y procesar toppings
-        toppings_procesados = []
-        precio_toppings = 0
-        if item.toppings:
-            toppings_dict = [t.model_dump() for t in item.toppings]
-            # Obtener config para este producto (o lista vacía si no tiene)
-            item_configs = configs_map.get(producto.id, [])
-            
-            toppings_procesados, precio_toppings = validar_toppings_con_config(
-                item_configs, toppings_dict
-            )
-
-        # Calcular precio: usar precio mayorista si aplica (solo distribuidoras)
-        precio_base = producto.precio
-        if (
-            es_distribuidora
-            and producto.precio_mayorista is not None
-            and producto.cantidad_mayorista is not None
-            and item.cantidad >= producto.cantidad_mayorista
-        ):
-            precio_base = producto.precio_mayorista
-
-        # Calcular subtotal: (precio_base + precio_toppings) * cantidad
-        precio_unitario_total = precio_base + precio_toppings
-        subtotal = precio_unitario_total * item.cantidad
-        subtotal_productos += subtotal
-
-        # Guardamos datos crudos para luego crear Items
-        items_procesados.append({
-            "producto_id": producto.id,
-            "nombre_producto": producto.nombre,
-            "precio_unitario": precio_unitario_total,
-            "cantidad": item.cantidad,
-            "subtotal": subtotal,
-            "toppings_seleccionados": toppings_procesados,
-            "categoria_id": producto.categoria_id 
-        })
+
+def _validar_pedido_minimo(negocio: NegocioSnapshot, total_final: int) -> None:
+    # Solo distribuidoras
+    if (
+        negocio.tipo_negocio == TipoNegocio.DISTRIBUIDORA
+        and negocio.pedido_minimo > 0
+        and total_final < negocio.pedido_minimo
+    ):
+        raise BusinessLogicError(
+            f"El pedido mínimo para este negocio es ${negocio.pedido_minimo}"
+        )
+
+
+def _valores_pedido(
+    negocio: NegocioSnapshot,
+    data: PedidoCreate,
+    total_final: int,
+    descuento_aplicado: int = 0,
+    promocion_id: int | None = None,
+) -> dict:
+    return {
+        "negocio_id": negocio.id,
+        "codigo": uuid4().hex[:6].upper(),
+        "estado": PedidoEstado.PENDIENTE,
+        "total": total_final,
+        "descuento_aplicado": descuento_aplicado,
+        "promocion_id": promocion_id,
+        "metodo_pago": data.metodo_pago,
+        "tipo_entrega": data.tipo_entrega,
+        "nombre_cliente": data.nombre_cliente,
+        "telefono_cliente": data.telefono_cliente,
+        "direccion_entrega": data.direccion_entrega,
+        "notas": data.notas,
+        "cantidad_items": len(data.items),
+        "creado_en": datetime.now(UTC),
+    }
+
+
+def _armar_pedido(
+    session: Session,
+    negocio: NegocioSnapshot,
+    tabla: precios_service.TablaPrecios,
+    data: PedidoCreate,
+) -> tuple[dict, list[dict]]:
+    """
+    Valida y cotiza un pedido (con cupón, si trae). Devuelve (valores del pedido, filas de
+    items) sin insertar nada; el uso del cupón lo descuenta quien inserta el pedido.
+    """
+    _validar_negocio_para_pedido(negocio, data)
+    items_procesados, subtotal_productos = tabla.procesar_items(data.items)
 
     # --- LÓGICA DE CUPONES ---
     descuento_aplicado = 0
@@ -115,67 +240,174 @@ def crear_nuevo_pedido(session: Session, slug: str, data: PedidoCreate) -> Pedid
         promo_service = PromocionService(session)
         # Validamos el cupón (Lanza excepción si es inválido)
         # Pasamos items procesados para reglas avanzadas si fuera necesario
-        items_para_reglas = [
-            {
-                "categoria_id": i["categoria_id"], 
-                "producto_id": i["producto_id"],
-                "cantidad": i["cantidad"],
-                "precio_unitario": i["precio_unitario"]
-            } for i in items_procesados
-        ]
-        
         resultado = promo_service.validar_cupon(
             codigo=data.codigo_cupon, 
             negocio_id=negocio.id, 
             carrito_total=subtotal_productos,
-            items=items_para_reglas
+            items=tabla.items_para_reglas(items_procesados)
         )
         
         descuento_aplicado = int(resultado["descuento"])
         promocion_id = resultado["promocion"].id
-        
-        # Incrementar uso del cupón
-        promo_service.aplicar_uso(promocion_id)
 
     total_final = max(0, subtotal_productos - descuento_aplicado)
+    _validar_pedido_minimo(negocio, total_final)
 
-    # Validar pedido mínimo (solo distribuidoras)
-    if (
-        negocio.tipo_negocio == TipoNegocio.DISTRIBUIDORA
-        and negocio.pedido_minimo > 0
-        and total_final < negocio.pedido_minimo
-    ):
-        raise BusinessLogicError(
-            f"El pedido mínimo para este negocio es ${negocio.pedido_minimo}"
-        )
+    return _valores_pedido(negocio, data, total_final, descuento_aplicado, promocion_id), items_procesados
+
+
+def _aplicar_uso_cupon(session: Session, valores_pedido: dict) -> bool:
+    """
+    Descuenta el uso del cupón en la misma transacción que el pedido: False si otro
+    pedido agotó el límite desde la validación
+    """
+    if valores_pedido["promocion_id"] is None:
+        return True
+    from app.services.promocion_service import PromocionService
+    return PromocionService(session).aplicar_uso(valores_pedido["promocion_id"])
+
+
+def _insertar_items(session: Session, filas: list[dict]) -> list[int]:
+    """
+    INSERT multi-fila de items; devuelve los ids en el orden de `filas`.
+    En SQLite el rowid sigue el orden de las filas de un mismo INSERT, y
+    sort_by_parameter_order degradaría a un INSERT por fila. Postgres no garantiza que
+    los serial sigan el orden del VALUES: ahí se le pide el orden a SQLAlchemy.
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        return sorted(session.scalars(insert(PedidoItem).returning(PedidoItem.id), filas).all())
+    return session.scalars(
+        insert(PedidoItem).returning(PedidoItem.id, sort_by_parameter_order=True), filas
+    ).all()
 
-    codigo = uuid4().hex[:6].upper()
-    pedido = Pedido(
-        negocio_id=negocio.id,
-        codigo=codigo,
-        estado="pendiente",
-        total=total_final,
-        descuento_aplicado=descuento_aplicado,
-        promocion_id=promocion_id,
-        metodo_pago=data.metodo_pago,
-        tipo_entrega=data.tipo_entrega,
-        nombre_cliente=data.nombre_cliente,
-        telefono_cliente=data.telefono_cliente,
-        direccion_entrega=data.direccion_entrega,
-        notas=data.notas,
+
+def _insertar_pedidos(session: Session, pedidos: list[tuple[dict, list[dict]]]) -> list[PedidoRead]:
+    """
+    Inserta los pedidos armados (sin commit) y devuelve sus respuestas, armadas con lo que
+    ya está en memoria. Cantidad de sentencias constante sin importar cuántos pedidos e
+    items haya: un INSERT ... RETURNING multi-fila de pedidos y otro de items.
+    Los códigos tienen que ser únicos dentro de `pedidos`: los ids se asocian por código.
+    """
+    ids_por_codigo = dict(
+        session.execute(
+            insert(Pedido).returning(Pedido.codigo, Pedido.id), [valores for valores, _ in pedidos]
+        ).all()
     )
+    pedido_ids = [ids_por_codigo[valores["codigo"]] for valores, _ in pedidos]
 
-    session.add(pedido)
-    session.flush()
+    filas_items = [
+        [{"pedido_id": pedido_id, **item} for item in items]
+        for pedido_id, (_, items) in zip(pedido_ids, pedidos, strict=True)
+    ]
+    todas = [fila for filas in filas_items for fila in filas]
+    item_ids = iter(_insertar_items(session, todas) if todas else [])
 
-    for item_data in items_procesados:
-        pedido_item = PedidoItem(
-            pedido_id=pedido.id,
-            **item_data
+    return [
+        PedidoRead(
+            id=pedido_id,
+            items=[PedidoItemRead(id=next(item_ids), **fila) for fila in filas],
+            **valores,
         )
-        session.add(pedido_item)
+        for pedido_id, (valores, _), filas in zip(pedido_ids, pedidos, filas_items, strict=True)
+    ]
+
+
+def crear_nuevo_pedido(session: Session, slug: str, data: PedidoCreate) -> PedidoRead:
+
+    negocio = _validar_negocio_para_pedido(obtener_negocio_por_slug(session, slug), data)
+
+    # Precios desde la tabla compilada del catálogo (cacheada por versión): sin
+    # consultar productos ni toppings. Solo tiene productos activos del negocio.
+    tabla = precios_service.obtener_tabla_precios(session, negocio)
+    valores_pedido, items_procesados = _armar_pedido(session, negocio, tabla, data)
+
+    if not _aplicar_uso_cupon(session, valores_pedido):
+        session.rollback()
+        raise BusinessLogicError("Este cupón ha alcanzado su límite de usos")
 
+    [pedido] = _insertar_pedidos(session, [(valores_pedido, items_procesados)])
+    incrementar_contador_pedidos(session, negocio.id)
+    notificar_pedidos_nuevos(session, negocio.id, [pedido])
     session.commit()
-    session.refresh(pedido)
     return pedido
 
+
+def crear_pedidos_en_lote(session: Session, negocio: NegocioSnapshot, pedidos: list[PedidoCreate]) -> PedidoLoteResultado:
+    """
+    Carga de pedidos en lote (distribuidoras que toman pedidos offline).
+    La tabla de precios se resuelve una sola vez; cada pedido se valida y cotiza por
+    separado y los que fallan se informan por índice sin frenar al resto. Los válidos
+    se insertan juntos, con un solo commit.
+    """
+    if negocio.tipo_negocio != TipoNegocio.DISTRIBUIDORA:
+        raise PermissionDeniedError("La carga de pedidos en lote es solo para distribuidoras")
+
+    tabla = precios_service.obtener_tabla_precios(session, negocio)
+
+    armados = []
+    errores = []
+    codigos = set()
+    for indice, data in enumerate(pedidos):
+        try:
+            valores_pedido, items_procesados = _armar_pedido(session, negocio, tabla, data)
+        except (EntityNotFoundError, BusinessLogicError, PermissionDeniedError) as e:
+            errores.append(PedidoLoteError(indice=indice, detalle=e.message))
+            continue
+        except HTTPException as e:
+            # Cupón inválido (PromocionService)
+            errores.append(PedidoLoteError(indice=indice, detalle=e.detail))
+            continue
+
+        # El UPDATE condicional no toca nada si falla: no hay que deshacer el resto del lote
+        if not _aplicar_uso_cupon(session, valores_pedido):
+            errores.append(PedidoLoteError(indice=indice, detalle="Este cupón ha alcanzado su límite de usos"))
+            continue
+
+        # Dentro del lote los códigos no se repiten
+        while valores_pedido["codigo"] in codigos:
+            valores_pedido["codigo"] = uuid4().hex[:6].upper()
+        codigos.add(valores_pedido["codigo"])
+        armados.append((valores_pedido, items_procesados))
+
+    creados = []
+    if armados:
+        creados = _insertar_pedidos(session, armados)
+        incrementar_contador_pedidos(session, negocio.id, cantidad=len(creados))
+        notificar_pedidos_nuevos(session, negocio.id, creados)
+    session.commit()
+
+    return PedidoLoteResultado(creados=creados, errores=errores)
+
+
+def armar_pedido_en_cola(session: Session, slug: str, data: PedidoCreate) -> dict:
+    """
+    Valida el pedido contra el negocio y la tabla de precios cacheados (sin tocar la base
+    si están en cache) y devuelve lo que se guarda en la cola de ingreso:
+    {"pedido": valores del pedido, "items": filas de items}.
+    """
+    negocio = _validar_negocio_para_pedido(obtener_negocio_por_slug(session, slug), data)
+
+    tabla = precios_service.obtener_tabla_precios(session, negocio)
+    items_procesados, subtotal_productos = tabla.procesar_items(data.items)
+    _validar_pedido_minimo(negocio, subtotal_productos)
+
+    return {"pedido": _valores_pedido(negocio, data, subtotal_productos), "items": items_procesados}
+
+
+async def crear_nuevo_pedido_async(session: AsyncSession, slug: str, data: PedidoCreate) -> PedidoRead:
+    """
+    Versión async de `crear_nuevo_pedido` para el router público.
+    La lógica sync corre en el greenlet de la sesión async (sin ocupar el threadpool).
+
+    Con PEDIDOS_MODO="cola" el pedido se valida contra el catálogo cacheado, se guarda en
+    la cola de ingreso local y se responde enseguida (con id None); el worker lo pasa a la
+    base en lotes. Los pedidos con cupón van siempre directo: el límite de usos se tiene
+    que descontar en la misma transacción que el pedido.
+    """
+    if settings.PEDIDOS_MODO == "cola" and not data.codigo_cupon:
+        datos = await session.run_sync(armar_pedido_en_cola, slug, data)
+        # El fsync del journal no debe bloquear el event loop
+        await asyncio.to_thread(cola_pedidos_service.encolar, datos)
+        return cola_pedidos_service.a_pedido_read(datos)
+
+    return await session.run_sync(crear_nuevo_pedido, slug, data)
@@ -0,0 +1,243 @@
+"""
+Motor de precios por negocio.
+
+Compila el catálogo activo de un negocio en tablas de búsqueda (escalas de precio por
+producto, precio y grupo de cada topping) que quedan cacheadas por versión de catálogo:
+el checkout y la validación de cupones cotizan el carrito en memoria, sin consultar
+productos ni toppings en cada request, y con la misma lógica de precios.
+"""
+from dataclasses import dataclass, field
+
+from sqlmodel import Session, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.exceptions import BusinessLogicError, EntityNotFoundError
+from app.models.models import Producto, TipoNegocio
+from app.schemas.pedido import PedidoItemCreate
+from app.services.catalogo_service import TTL_CATALOGO, obtener_toppings_negocio
+from app.services.negocio_service import NegocioSnapshot
+
+# Tablas compiladas por (negocio, versión de catálogo)
+_tablas = TTLCache(
+    "tablas_precios",
+    maxsize=settings.CATALOGO_CACHE_MAX,
+    ttl=TTL_CATALOGO,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class GrupoToppings:
+    id: int
+    nombre: str
+    min_selecciones: int
+    max_selecciones: int
+
+
+@dataclass(frozen=True, slots=True)
+class ToppingPrecio:
+    id: int
+    nombre: str
+    precio: int
+    disponible: bool
+    grupo_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class ProductoPrecio:
+    id: int
+    nombre: str
+    unidad: str
+    precio: int
+    precio_mayorista: int | None
+    cantidad_mayorista: int | None
+    cantidad_minima: int
+    stock: bool | None
+    categoria_id: int | None
+    grupos: tuple[GrupoToppings, ...] = ()
+    toppings: dict[int, ToppingPrecio] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class TablaPrecios:
+    """Precios de un negocio para una versión de catálogo. Inmutable: se comparte entre requests."""
+
+    negocio_id: int
+    version: int
+    es_distribuidora: bool
+    productos: dict[int, ProductoPrecio]
+
+    def precio_base(self, producto: ProductoPrecio, cantidad: int) -> int:
+        """Precio unitario sin toppings: el mayorista aplica desde `cantidad_mayorista` (solo distribuidoras)"""
+        if (
+            self.es_distribuidora
+            and producto.precio_mayorista is not None
+            and producto.cantidad_mayorista is not None
+            and cantidad >= producto.cantidad_mayorista
+        ):
+            return producto.precio_mayorista
+        return producto.precio
+
+    def _validar_toppings(self, producto: ProductoPrecio, topping_ids: list[int | None]) -> tuple[list[dict], int]:
+        if not producto.grupos and topping_ids:
+            raise BusinessLogicError("Este producto no acepta toppings")
+
+        selecciones_por_grupo: dict[int, int] = {}
+        toppings_procesados = []
+        precio_total = 0
+        for topping_id in topping_ids:
+            topping = producto.toppings.get(topping_id)
+            if topping is None:
+                raise BusinessLogicError(f"Topping {topping_id} no disponible para este producto")
+            if not topping.disponible:
+                raise BusinessLogicError(f"El topping '{topping.nombre}' no está disponible")
+
+            selecciones_por_grupo[topping.grupo_id] = selecciones_por_grupo.get(topping.grupo_id, 0) + 1
+            toppings_procesados.append({"nombre": topping.nombre, "precio": topping.precio})
+            precio_total += topping.precio
+
+        for grupo in producto.grupos:
+            cantidad = selecciones_por_grupo.get(grupo.id, 0)
+            if cantidad < grupo.min_selecciones:
+                raise BusinessLogicError(
+                    f"Debes seleccionar al menos {grupo.min_selecciones} "
+                    f"opción(es) de '{grupo.nombre}'"
+                )
+            if cantidad > grupo.max_selecciones:
+                raise BusinessLogicError(
+                    f"Solo puedes seleccionar hasta {grupo.max_selecciones} "
+                    f"opción(es) de '{grupo.nombre}'"
+                )
+
+        return toppings_procesados, precio_total
+
+    def procesar_items(self, items: list[PedidoItemCreate]) -> tuple[list[dict], int]:
+        """
+        Valida y cotiza las líneas de un pedido. Retorna (items_procesados, subtotal_productos),
+        con cada item listo para insertar en pedido_items (falta solo pedido_id).
+        """
+        for item in items:
+            producto = self.productos.get(item.producto_id)
+            if producto is None:
+                raise EntityNotFoundError(f"Producto {item.producto_id} no encontrado")
+            if not producto.stock:
+                raise BusinessLogicError(f"El producto '{producto.nombre}' no tiene stock disponible")
+
+        items_procesados = []
+        subtotal_productos = 0
+        for item in items:
+            if item.cantidad <= 0:
+                raise BusinessLogicError("La cantidad de los productos debe ser mayor a 0")
+
+            producto = self.productos[item.producto_id]
+
+            # Validar cantidad mínima por producto (solo distribuidoras)
+            if self.es_distribuidora and item.cantidad < producto.cantidad_minima:
+                raise BusinessLogicError(
+                    f"La cantidad mínima para '{producto.nombre}' es {producto.cantidad_minima} {producto.unidad}(s)"
+                )
+
+            toppings_procesados, precio_toppings = [], 0
+            if item.toppings:
+                toppings_procesados, precio_toppings = self._validar_toppings(
+                    producto, [t.topping_id for t in item.toppings]
+                )
+
+            precio_unitario = self.precio_base(producto, item.cantidad) + precio_toppings
+            subtotal = precio_unitario * item.cantidad
+            subtotal_productos += subtotal
+            items_procesados.append({
+                "producto_id": producto.id,
+                "nombre_producto": producto.nombre,
+                "precio_unitario": precio_unitario,
+                "cantidad": item.cantidad,
+                "subtotal": subtotal,
+                "toppings_seleccionados": toppings_procesados,
+            })
+
+        return items_procesados, subtotal_productos
+
+    def items_para_reglas(self, items_procesados: list[dict]) -> list[dict]:
+        """Líneas en el formato que usan las reglas de promociones"""
+        return [
+            {
+                "producto_id": i["producto_id"],
+                "categoria_id": self.productos[i["producto_id"]].categoria_id,
+                "cantidad": i["cantidad"],
+                "precio_unitario": i["precio_unitario"],
+            }
+            for i in items_procesados
+        ]
+
+    def cotizar(self, items: list[PedidoItemCreate]) -> tuple[int, list[dict]]:
+        """
+        Cotización tolerante para la vista previa de cupones: ignora las líneas de productos
+        que no están en el catálogo y los toppings que no corresponden al producto.
+        Retorna (total_carrito, items_para_reglas).
+        """
+        total = 0
+        procesados = []
+        for item in items:
+            producto = self.productos.get(item.producto_id)
+            if producto is None:
+                continue
+            precio_toppings = sum(
+                producto.toppings[t.topping_id].precio
+                for t in item.toppings
+                if t.topping_id in producto.toppings
+            )
+            precio_unitario = self.precio_base(producto, item.cantidad) + precio_toppings
+            total += precio_unitario * item.cantidad
+            procesados.append({
+                "producto_id": producto.id,
+                "cantidad": item.cantidad,
+                "precio_unitario": precio_unitario,
+            })
+        return total, self.items_para_reglas(procesados)
+
+
+def compilar_tabla_precios(session: Session, negocio: NegocioSnapshot) -> TablaPrecios:
+    """Una consulta de productos activos; los toppings salen del cache del catálogo"""
+    filas = session.exec(
+        select(
+            Producto.id,
+            Producto.nombre,
+            Producto.unidad,
+            Producto.precio,
+            Producto.precio_mayorista,
+            Producto.cantidad_mayorista,
+            Producto.cantidad_minima,
+            Producto.stock,
+            Producto.categoria_id,
+        ).where(Producto.negocio_id == negocio.id, Producto.activo)
+    ).all()
+    configs_por_producto = obtener_toppings_negocio(session, negocio)
+
+    productos = {}
+    for fila in filas:
+        configs = configs_por_producto.get(fila.id, [])
+        toppings = {
+            t["id"]: ToppingPrecio(t["id"], t["nombre"], t["precio_extra"], t["disponible"], c["grupo_id"])
+            for c in configs
+            for t in c["toppings"]
+        }
+        grupos = tuple(
+            GrupoToppings(c["grupo_id"], c["grupo_nombre"], c["min_selecciones"], c["max_selecciones"])
+            for c in configs
+        )
+        productos[fila.id] = ProductoPrecio(*fila, grupos=grupos, toppings=toppings)
+
+    return TablaPrecios(
+        negocio_id=negocio.id,
+        version=negocio.catalogo_version,
+        es_distribuidora=negocio.tipo_negocio == TipoNegocio.DISTRIBUIDORA,
+        productos=productos,
+    )
+
+
+def obtener_tabla_precios(session: Session, negocio: NegocioSnapshot) -> TablaPrecios:
+    """Tabla de la versión actual del catálogo, compilándola si hace falta"""
+    return _tablas.get_or_set(
+        (negocio.id, negocio.catalogo_version),
+        lambda: compilar_tabla_precios(session, negocio),
+    )
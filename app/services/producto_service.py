@@ -1,9 +1,13 @@
-from sqlmodel import Session, select, func
+from sqlmodel import Session, func, select
+
+from app.core.exceptions import BusinessLogicError, EntityNotFoundError
 from app.models.models import Producto
 from app.schemas.producto import ProductoCreate, ProductoUpdate
+from app.services.busqueda_service import registrar_cambio_producto
 from app.services.categoria_service import obtener_o_crear_categoria_por_nombre
+from app.services.negocio_service import incrementar_version_catalogo
 from app.utils.cloudinary import validar_imagen_url
-from app.core.exceptions import EntityNotFoundError, BusinessLogicError
+
 
 def crear_nuevo_producto(session: Session, negocio_id: int, data: ProductoCreate) -> Producto:
     cantidad_actual = session.exec(
@@ -33,6 +37,8 @@ def crear_nuevo_producto(session: Session, negocio_id: int, data: ProductoCreate
     )
 
     session.add(nuevo)
+    version = incrementar_version_catalogo(session, negocio_id)
+    registrar_cambio_producto(session, negocio_id, version, nuevo)
     session.commit()
     session.refresh(nuevo)
     return nuevo
@@ -53,6 +59,8 @@ def actualizar_producto_existente(session: Session, producto_id: int, negocio_id
         setattr(producto, campo, valor)
 
     session.add(producto)
+    version = incrementar_version_catalogo(session, negocio_id)
+    registrar_cambio_producto(session, negocio_id, version, producto)
     session.commit()
     session.refresh(producto)
     return producto
@@ -64,5 +72,7 @@ def desactivar_producto(session: Session, producto_id: int, negocio_id: int):
 
     producto.activo = False
     session.add(producto)
+    version = incrementar_version_catalogo(session, negocio_id)
+    registrar_cambio_producto(session, negocio_id, version, producto)
     session.commit()
     return {"message": "Producto desactivado"}
@@ -1,7 +1,11 @@
 from datetime import datetime, timezone
-from sqlmodel import Session, select
-from app.models.models import Promocion, PromocionTipo, Pedido, Negocio
+
 from fastapi import HTTPException
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from app.models.models import Negocio, Pedido, Promocion, PromocionTipo
+
 
 class PromocionService:
     def __init__(self, session: Session):
@@ -89,10 +93,25 @@ class PromocionService:
             "mensaje": f"Cupón {codigo} aplicado con éxito"
         }
 
-    def aplicar_uso(self, promocion_id: int):
-        """Incrementa el contador de uso de una promoción"""
-        promo = self.session.get(Promocion, promocion_id)
-        if promo:
-            promo.usos_actuales += 1
-            self.session.add(promo)
-            self.session.commit()
+    def aplicar_uso(self, promocion_id: int) -> bool:
+        """
+        Suma un uso a la promoción si todavía le quedan (UPDATE condicional atómico).
+        No hace commit: corre dentro de la transacción del pedido.
+        Devuelve False si el cupón llegó al límite, aunque otro pedido lo haya agotado
+        después de `validar_cupon`.
+        """
+        resultado = self.session.exec(
+            update(Promocion)
+            .where(
+                Promocion.id == promocion_id,
+                # Mismo criterio que validar_cupon: sin límite (o límite 0) es ilimitado
+                or_(
+                    Promocion.limite_usos_total.is_(None),
+                    Promocion.limite_usos_total == 0,
+                    Promocion.usos_actuales < Promocion.limite_usos_total,
+                ),
+            )
+            .values(usos_actuales=Promocion.usos_actuales + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return resultado.rowcount == 1
@@ -1,21 +1,21 @@
-from sqlmodel import Session, select
 from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
 
+from app.core.exceptions import BusinessLogicError, EntityNotFoundError
 from app.models.models import (
     GrupoTopping,
-    Topping,
-    ProductoGrupoTopping,
     Producto,
+    ProductoGrupoTopping,
+    Topping,
 )
 from app.schemas.topping import (
     GrupoToppingCreate,
     GrupoToppingUpdate,
+    ProductoGrupoToppingConfig,
     ToppingCreate,
     ToppingUpdate,
-    ProductoGrupoToppingConfig,
 )
-from app.core.exceptions import EntityNotFoundError, BusinessLogicError
-
+from app.services.negocio_service import incrementar_version_catalogo
 
 # ============ Grupos de Toppings ============
 
@@ -39,6 +39,7 @@ def crear_grupo_topping(
         )
         session.add(topping)
 
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     session.refresh(grupo)
     return grupo
@@ -90,6 +91,7 @@ def actualizar_grupo_topping(
             session.add(nuevo_topping)
 
     session.add(grupo)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     session.refresh(grupo)
     return grupo
@@ -100,6 +102,7 @@ def eliminar_grupo_topping(session: Session, grupo_id: int, negocio_id: int) ->
     grupo = obtener_grupo_topping(session, grupo_id, negocio_id)
     grupo.activo = False
     session.add(grupo)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
 
 
@@ -118,6 +121,7 @@ def agregar_topping_a_grupo(
         disponible=data.disponible,
     )
     session.add(topping)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     session.refresh(topping)
     return topping
@@ -143,6 +147,7 @@ def actualizar_topping(
         topping.disponible = data.disponible
 
     session.add(topping)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     session.refresh(topping)
     return topping
@@ -160,6 +165,7 @@ def eliminar_topping(session: Session, topping_id: int, negocio_id: int) -> None
 
     topping.activo = False
     session.add(topping)
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
 
 
@@ -202,6 +208,7 @@ def configurar_toppings_producto(
         )
         session.add(producto_grupo)
 
+    incrementar_version_catalogo(session, negocio_id)
     session.commit()
     session.refresh(producto)
     return producto
@@ -306,20 +313,20 @@ def validar_toppings_seleccionados(
         precio_total += info["precio"]
 
 
-def obtener_toppings_para_varios_productos(
-    session: Session, producto_ids: list[int]
-) -> dict[int, list[dict]]:
-    """Obtiene los grupos de toppings configurados para múltiples productos, retornando un mapa {producto_id: configs}"""
+def obtener_toppings_por_negocio(session: Session, negocio_id: int) -> dict[int, list[dict]]:
+    """Grupos de toppings de todos los productos activos de un negocio, en una sola consulta"""
     statement = (
         select(ProductoGrupoTopping)
-        .where(ProductoGrupoTopping.producto_id.in_(producto_ids))
+        .join(Producto, Producto.id == ProductoGrupoTopping.producto_id)
+        .where(Producto.negocio_id == negocio_id, Producto.activo)
         .options(joinedload(ProductoGrupoTopping.grupo).joinedload(GrupoTopping.toppings))
+        .order_by(ProductoGrupoTopping.producto_id, ProductoGrupoTopping.id)
     )
-    configs = session.exec(statement).unique().all()
-    
-    result = {}
-    # First, group by product_id
-    temp_map = {}
+    return _agrupar_configs_por_producto(session.exec(statement).unique().all())
+
+
+def _agrupar_configs_por_producto(configs) -> dict[int, list[dict]]:
+    temp_map: dict[int, list[dict]] = {}
     for config in configs:
         if config.grupo.activo:
             if config.producto_id not in temp_map:
@@ -338,73 +345,3 @@ def obtener_toppings_para_varios_productos(
             })
             
     return temp_map
-
-
-def validar_toppings_con_config(
-    configs: list[dict],
-    toppings_seleccionados: list[dict],
-) -> tuple[list[dict], int]:
-    """
-    Valida los toppings seleccionados contra una configuración ya cargada en memoria.
-    Retorna (toppings_procesados, precio_total).
-    """
-    if not configs and toppings_seleccionados:
-        raise BusinessLogicError("Este producto no acepta toppings")
-
-    topping_detail_map = {}
-    for config in configs:
-        for topping in config["toppings"]:
-            topping_detail_map[topping["id"]] = {
-                "nombre": topping["nombre"],
-                "precio": topping["precio_extra"],
-                "disponible": topping["disponible"],
-                "grupo_id": config["grupo_id"],
-                "grupo_nombre": config["grupo_nombre"],
-                "min_selecciones": config["min_selecciones"],
-                "max_selecciones": config["max_selecciones"],
-            }
-
-    selecciones_por_grupo: dict[int, list[int]] = {}
-    
-    toppings_procesados = []
-    precio_total = 0
-
-    for sel in toppings_seleccionados:
-        topping_id = sel.get("topping_id") or sel.get("id")
-        
-        if topping_id not in topping_detail_map:
-            raise BusinessLogicError(f"Topping {topping_id} no disponible para este producto")
-        
-        info = topping_detail_map[topping_id]
-        if not info["disponible"]:
-            raise BusinessLogicError(f"El topping '{info['nombre']}' no está disponible")
-
-        grupo_id = info["grupo_id"]
-        if grupo_id not in selecciones_por_grupo:
-            selecciones_por_grupo[grupo_id] = []
-        selecciones_por_grupo[grupo_id].append(topping_id)
-        
-        toppings_procesados.append({
-            "nombre": info["nombre"],
-            "precio": info["precio"],
-        })
-        precio_total += info["precio"]
-
-    # Validar restricciones de cantidad
-    for config in configs:
-        grupo_id = config["grupo_id"]
-        seleccionados = selecciones_por_grupo.get(grupo_id, [])
-        cantidad = len(seleccionados)
-
-        if cantidad < config["min_selecciones"]:
-            raise BusinessLogicError(
-                f"Debes seleccionar al menos {config['min_selecciones']} "
-                f"opción(es) de '{config['grupo_nombre']}'"
-            )
-        if cantidad > config["max_selecciones"]:
-            raise BusinessLogicError(
-                f"Solo puedes seleccionar hasta {config['max_selecciones']} "
-                f"opción(es) de '{config['grupo_nombre']}'"
-            )
-
-    return toppings_procesados, precio_total
\ No newline at end of file
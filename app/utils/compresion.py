@@ -0,0 +1,74 @@
+import gzip
+from dataclasses import dataclass
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él se sirve gzip
+    brotli = None
+
+# Se comprime una sola vez por versión de catálogo: conviene el nivel máximo
+NIVEL_GZIP = 9
+CALIDAD_BROTLI = 11
+
+# Codificaciones que puede generar este proceso, en orden de preferencia
+CODIFICACIONES_SOPORTADAS = ["br", "gzip"] if brotli else ["gzip"]
+
+# Por debajo de este tamaño la compresión no compensa los headers extra
+TAMANO_MINIMO = 512
+
+
+@dataclass(frozen=True, slots=True)
+class CuerpoPrecomprimido:
+    """Un mismo cuerpo de respuesta en crudo y en cada codificación disponible"""
+
+    identidad: bytes
+    gzip: bytes | None = None
+    br: bytes | None = None
+
+    def codificaciones(self) -> list[str]:
+        """Codificaciones disponibles, en orden de preferencia del servidor"""
+        return [c for c in ("br", "gzip") if getattr(self, c) is not None]
+
+    def cuerpo(self, codificacion: str | None) -> bytes:
+        return self.identidad if codificacion is None else getattr(self, codificacion)
+
+
+def precomprimir(contenido: bytes) -> CuerpoPrecomprimido:
+    """Comprime `contenido` en gzip y brotli; descarta las versiones que no achican"""
+    if len(contenido) < TAMANO_MINIMO:
+        return CuerpoPrecomprimido(contenido)
+
+    comprimido_gzip = gzip.compress(contenido, compresslevel=NIVEL_GZIP, mtime=0)
+    comprimido_br = brotli.compress(contenido, quality=CALIDAD_BROTLI) if brotli else None
+    return CuerpoPrecomprimido(
+        identidad=contenido,
+        gzip=comprimido_gzip if len(comprimido_gzip) < len(contenido) else None,
+        br=comprimido_br if comprimido_br and len(comprimido_br) < len(contenido) else None,
+    )
+
+
+def elegir_codificacion(accept_encoding: str | None, disponibles: list[str]) -> str | None:
+    """
+    Elige la codificación a usar según el header Accept-Encoding del cliente.
+    Respeta los q-values (q=0 excluye) y, ante empate, el orden de `disponibles`.
+    Devuelve None para mandar el cuerpo sin comprimir.
+    """
+    if not accept_encoding or not disponibles:
+        return None
+
+    preferencias: dict[str, float] = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        preferencias[nombre.strip().lower()] = q
+
+    comodin = preferencias.get("*", 0.0)
+    candidatas = [(preferencias.get(c, comodin), -i, c) for i, c in enumerate(disponibles)]
+    q, _, codificacion = max(candidatas)
+    return codificacion if q > 0 else None
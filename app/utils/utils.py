@@ -1,14 +1,17 @@
 import re
 import unicodedata
 
-# Esto lo hizo completamente la IA
-def generar_slug(texto: str) -> str:
-    # Normaliza acentos (á → a, ñ → n, etc.)
+
+def normalizar_texto(texto: str) -> str:
+    # Normaliza acentos (á → a, ñ → n, etc.) y pasa a minúsculas
     texto = unicodedata.normalize("NFKD", texto)
     texto = texto.encode("ascii", "ignore").decode("ascii")
+    return texto.lower()
+
 
-    # Pasa a minúsculas
-    texto = texto.lower()
+# Esto lo hizo completamente la IA
+def generar_slug(texto: str) -> str:
+    texto = normalizar_texto(texto)
 
     # Reemplaza cualquier cosa que no sea letra o número por "-"
     texto = re.sub(r"[^a-z0-9]+", "-", texto)
@@ -17,3 +20,10 @@ def generar_slug(texto: str) -> str:
     texto = texto.strip("-")
 
     return texto
+
+
+def tokenizar(texto: str | None) -> list[str]:
+    """Separa un texto en tokens normalizados igual que `generar_slug`"""
+    if not texto:
+        return []
+    return [t for t in re.split(r"[^a-z0-9]+", normalizar_texto(texto)) if t]
@@ -0,0 +1,95 @@
+"""
+Benchmark del listado público de productos: serialización por request vs bytes cacheados.
+
+Uso:
+    python -m scripts.benchmark_listado_productos --productos 100 --iteraciones 2000
+
+Mide tiempo de CPU (time.process_time) por request del handler, sin red ni servidor.
+"""
+import argparse
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, SQLModel, StaticPool, create_engine, select
+
+from app.models.models import Categoria, Negocio, Producto, Usuario
+from app.schemas.producto import ProductoRead
+from app.services import catalogo_service, negocio_service
+
+
+def seed(session: Session, cantidad: int) -> str:
+    usuario = Usuario(nombre="Bench", email="bench@example.com", password_hash="x")
+    session.add(usuario)
+    session.flush()
+
+    negocio = Negocio(usuario_id=usuario.id, nombre="Bench", slug="bench")
+    session.add(negocio)
+    session.flush()
+
+    categorias = [Categoria(negocio_id=negocio.id, nombre=f"Categoria {i}") for i in range(10)]
+    session.add_all(categorias)
+    session.flush()
+
+    for i in range(cantidad):
+        session.add(
+            Producto(
+                negocio_id=negocio.id,
+                nombre=f"Producto {i}",
+                descripcion="Descripción de prueba para el benchmark " * 3,
+                precio=1000 + i,
+                sku=f"SKU-{i}",
+                categoria_id=categorias[i % len(categorias)].id,
+            )
+        )
+    session.commit()
+    return negocio.slug
+
+
+def listado_sin_cache(session: Session, negocio_id: int, limit: int) -> bytes:
+    """Lo que hacía el handler antes: model_validate por fila + validación de response_model"""
+    productos = session.exec(
+        select(Producto)
+        .where(Producto.negocio_id == negocio_id, Producto.activo)
+        .options(joinedload(Producto.categorias))
+        .limit(limit)
+    ).all()
+    result = [ProductoRead.model_validate(p) for p in productos]
+    adapter = TypeAdapter(list[ProductoRead])
+    return adapter.dump_json(adapter.validate_python(result))
+
+
+def medir(fn, iteraciones: int) -> float:
+    inicio = time.process_time()
+    for _ in range(iteraciones):
+        fn()
+    return (time.process_time() - inicio) / iteraciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--productos", type=int, default=100)
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        slug = seed(session, args.productos)
+        negocio = negocio_service.obtener_negocio_por_slug(session, slug)
+
+        antes = medir(lambda: listado_sin_cache(session, negocio.id, 100), args.iteraciones)
+        despues = medir(
+            lambda: catalogo_service.listar_productos_json(session, negocio, 0, 100)[0].identidad,
+            args.iteraciones,
+        )
+
+    print(f"Productos: {args.productos} | Iteraciones: {args.iteraciones}")
+    print(f"Sin cache:         {antes * 1000:.3f} ms CPU/request")
+    print(f"Bytes cacheados:   {despues * 1000:.3f} ms CPU/request")
+    print(f"Ahorro:            {(antes - despues) * 1000:.3f} ms CPU/request ({antes / despues:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Benchmark de creación de pedidos, para distintas formas de carrito:
+    - 1 vs 100 líneas
+    - 0 vs 10 toppings por línea
+    - con y sin cupón
+    - minorista vs distribuidora (con precio mayorista en juego)
+
+Mide dos caminos:
+    servicio   crear_nuevo_pedido() directo sobre una sesión sync
+    http       POST /public/{slug}/pedidos en proceso (httpx.ASGITransport), con
+               validación, serialización y middlewares; sin red ni rate limit
+
+Por escenario reporta latencia (p50/p90/p99/máx en ms), sentencias SQL por pedido y
+memoria asignada por pedido (pico de tracemalloc, medido en una corrida aparte para
+no distorsionar los tiempos).
+
+Uso:
+    python -m scripts.benchmark_pedidos --productos 500 --iteraciones 200
+    python -m scripts.benchmark_pedidos --guardar benchmarks/pedidos.json
+    python -m scripts.benchmark_pedidos --comparar benchmarks/pedidos.json --tolerancia 0.2
+
+Corre contra SQLite en un directorio temporal: los números sirven para comparar dos
+versiones del código en la misma máquina, no como latencias de producción.
+Con --comparar sale con código 1 si algún escenario empeoró más que la tolerancia
+(p50) o hace más sentencias que la baseline.
+
+La baseline versionada está en benchmarks/pedidos.json (con los valores por defecto de
+--productos e --iteraciones); "meta" dice en qué commit y máquina se midió. Las sentencias
+SQL por pedido se pueden comparar en cualquier máquina; las latencias solo contra una
+baseline medida en la misma: si no, regenerarla primero con --guardar sobre el commit base.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.deps import get_async_session, get_session
+from app.core.config import settings
+from app.core.database import url_async
+from app.core.rate_limit import limiter
+from app.main import app
+from app.models.models import (
+    GrupoTopping,
+    Negocio,
+    Producto,
+    ProductoGrupoTopping,
+    Promocion,
+    PromocionTipo,
+    TipoNegocio,
+    Topping,
+    Usuario,
+)
+from app.schemas.pedido import PedidoCreate
+from app.services.pedido_service import crear_nuevo_pedido
+
+CODIGO_CUPON = "BENCH10"
+CANTIDAD_POR_LINEA = 12  # por encima de cantidad_mayorista: la distribuidora usa precio mayorista
+MUESTRAS_MEMORIA = 20
+
+
+@dataclass(frozen=True)
+class Escenario:
+    tipo: str
+    lineas: int
+    toppings: int
+    cupon: bool
+
+    @property
+    def nombre(self) -> str:
+        return (
+            f"{self.tipo}/{self.lineas}-lineas/{self.toppings}-toppings/"
+            f"{'con' if self.cupon else 'sin'}-cupon"
+        )
+
+
+ESCENARIOS = [
+    Escenario(tipo, lineas, toppings, cupon)
+    for tipo, lineas, toppings, cupon in itertools.product(
+        (TipoNegocio.MINORISTA.value, TipoNegocio.DISTRIBUIDORA.value), (1, 100), (0, 10), (False, True)
+    )
+]
+
+
+@dataclass
+class Tienda:
+    slug: str
+    producto_ids: list[int]
+    topping_ids: list[int]
+
+
+def seed(session: Session, tipo: str, cantidad: int) -> Tienda:
+    """Negocio con `cantidad` productos, un grupo de 10 toppings en todos y un cupón del 10%"""
+    usuario = Usuario(nombre="Bench", email=f"bench-{tipo}@example.com", password_hash="x")
+    session.add(usuario)
+    session.flush()
+
+    negocio = Negocio(
+        usuario_id=usuario.id,
+        nombre=f"Bench {tipo}",
+        slug=f"bench-{tipo}",
+        acepta_pedidos=True,
+        tipo_negocio=tipo,
+        metodos_pago=["efectivo"],
+        tipos_entrega=["delivery"],
+    )
+    session.add(negocio)
+    session.flush()
+
+    producto_ids = list(
+        session.scalars(
+            insert(Producto).returning(Producto.id),
+            [
+                {
+                    "negocio_id": negocio.id,
+                    "nombre": f"Producto {i}",
+                    "precio": 1000 + i,
+                    "precio_mayorista": 900 + i,
+                    "cantidad_mayorista": 10,
+                    "unidad": "unidad",
+                    "cantidad_minima": 1,
+                    "stock": True,
+                    "destacado": False,
+                    "activo": True,
+                    "creado_en": datetime.now(UTC),
+                }
+                for i in range(cantidad)
+            ],
+        )
+    )
+
+    grupo = GrupoTopping(negocio_id=negocio.id, nombre="Extras")
+    session.add(grupo)
+    session.flush()
+    toppings = [Topping(grupo_id=grupo.id, nombre=f"Extra {i}", precio_extra=50 + i) for i in range(10)]
+    session.add_all(toppings)
+    session.flush()
+    session.execute(
+        insert(ProductoGrupoTopping),
+        [
+            {"producto_id": producto_id, "grupo_id": grupo.id, "min_selecciones": 0, "max_selecciones": 10}
+            for producto_id in producto_ids
+        ],
+    )
+
+    session.add(
+        Promocion(
+            negocio_id=negocio.id,
+            nombre="Bench 10%",
+            codigo=CODIGO_CUPON,
+            tipo=PromocionTipo.PORCENTAJE,
+            valor=10,
+            limite_usos_total=None,
+        )
+    )
+    session.commit()
+    return Tienda(negocio.slug, producto_ids, [t.id for t in toppings])
+
+
+def cuerpo_pedido(escenario: Escenario, tienda: Tienda) -> dict:
+    return {
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+        "nombre_cliente": "Benchmark",
+        "codigo_cupon": CODIGO_CUPON if escenario.cupon else None,
+        "items": [
+            {
+                "producto_id": producto_id,
+                "cantidad": CANTIDAD_POR_LINEA,
+                "toppings": [{"topping_id": t} for t in tienda.topping_ids[: escenario.toppings]],
+            }
+            for producto_id in tienda.producto_ids[: escenario.lineas]
+        ],
+    }
+
+
+class ContadorSentencias:
+    def __init__(self, engine):
+        self.cantidad = 0
+        event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args) -> None:
+        self.cantidad += 1
+
+
+def percentil(valores: list[float], p: int) -> float:
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1] if len(valores) > 1 else valores[0]
+
+
+def resumir(latencias: list[float], sentencias: int, memoria: list[int]) -> dict:
+    return {
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p90_ms": round(percentil(latencias, 90) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "max_ms": round(max(latencias) * 1000, 3),
+        "sentencias": round(sentencias / len(latencias), 2),
+        "memoria_kib": round(statistics.mean(memoria) / 1024, 1),
+    }
+
+
+def inicio_memoria() -> int:
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def pico_memoria(antes: int) -> int:
+    """Bytes asignados en el pico desde `inicio_memoria`"""
+    return tracemalloc.get_traced_memory()[1] - antes
+
+
+def medir_servicio(session: Session, contador: ContadorSentencias, escenario: Escenario, tienda: Tienda, iteraciones: int) -> dict:
+    data = PedidoCreate(**cuerpo_pedido(escenario, tienda))
+    crear_nuevo_pedido(session, tienda.slug, data)  # calienta caches (negocio, tabla de precios)
+
+    latencias = []
+    contador.cantidad = 0
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        crear_nuevo_pedido(session, tienda.slug, data)
+        latencias.append(time.perf_counter() - inicio)
+    sentencias = contador.cantidad
+
+    tracemalloc.start()
+    memoria = []
+    for _ in range(MUESTRAS_MEMORIA):
+        antes = inicio_memoria()
+        crear_nuevo_pedido(session, tienda.slug, data)
+        memoria.append(pico_memoria(antes))
+    tracemalloc.stop()
+    return resumir(latencias, sentencias, memoria)
+
+
+async def medir_http(http: httpx.AsyncClient, contador: ContadorSentencias, escenario: Escenario, tienda: Tienda, iteraciones: int) -> dict:
+    url = f"/public/{tienda.slug}/pedidos"
+    cuerpo = cuerpo_pedido(escenario, tienda)
+
+    async def enviar():
+        response = await http.post(url, json=cuerpo)
+        if response.status_code != 200:
+            raise RuntimeError(f"{escenario.nombre}: {response.status_code} {response.text}")
+
+    await enviar()
+
+    latencias = []
+    contador.cantidad = 0
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        await enviar()
+        latencias.append(time.perf_counter() - inicio)
+    sentencias = contador.cantidad
+
+    tracemalloc.start()
+    memoria = []
+    for _ in range(MUESTRAS_MEMORIA):
+        antes = inicio_memoria()
+        await enviar()
+        memoria.append(pico_memoria(antes))
+    tracemalloc.stop()
+    return resumir(latencias, sentencias, memoria)
+
+
+async def correr_http(url_db: str, tiendas: dict[str, Tienda], escenarios: list[Escenario], iteraciones: int) -> dict:
+    async_engine = create_async_engine(url_async(url_db))
+    engine = create_engine(url_db, connect_args={"check_same_thread": False})
+
+    async def sesion_async():
+        async with AsyncSession(async_engine) as session:
+            yield session
+
+    def sesion_sync():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = sesion_async
+    app.dependency_overrides[get_session] = sesion_sync
+    contador = ContadorSentencias(async_engine.sync_engine)
+    resultados = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            for escenario in escenarios:
+                print(f"  http/{escenario.nombre}", file=sys.stderr)
+                resultados[f"http/{escenario.nombre}"] = await medir_http(
+                    http, contador, escenario, tiendas[escenario.tipo], iteraciones
+                )
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+        engine.dispose()
+    return resultados
+
+
+def comparar(actual: dict, baseline: dict, tolerancia: float) -> bool:
+    """Imprime la diferencia contra la baseline y devuelve si hubo regresiones"""
+    regresiones = False
+    print(f"\n{'escenario':<58} {'p50 base':>9} {'p50':>9} {'Δ':>7} {'sql base':>8} {'sql':>6}")
+    for nombre, medida in actual.items():
+        base = baseline.get(nombre)
+        if base is None:
+            continue
+        delta = (medida["p50_ms"] - base["p50_ms"]) / base["p50_ms"]
+        peor = delta > tolerancia or medida["sentencias"] > base["sentencias"]
+        regresiones |= peor
+        print(
+            f"{nombre:<58} {base['p50_ms']:>9.3f} {medida['p50_ms']:>9.3f} {delta:>+7.0%} "
+            f"{base['sentencias']:>8} {medida['sentencias']:>6}" + ("  REGRESIÓN" if peor else "")
+        )
+    return regresiones
+
+
+def _commit_actual() -> str | None:
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=500, help="productos por negocio (mínimo 100)")
+    parser.add_argument("--iteraciones", type=int, default=200, help="pedidos medidos por escenario")
+    parser.add_argument("--caminos", nargs="+", choices=["servicio", "http"], default=["servicio", "http"])
+    parser.add_argument("--guardar", type=Path, help="escribe los resultados como baseline JSON")
+    parser.add_argument("--comparar", type=Path, help="baseline JSON contra la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento de p50 tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+    if args.productos < 100:
+        parser.error("--productos tiene que ser al menos 100 (escenarios de 100 líneas)")
+
+    for logger in ("pedilo-api", "httpx"):
+        logging.getLogger(logger).setLevel(logging.WARNING)
+    limiter.enabled = False
+    settings.PEDIDOS_MODO = "directo"
+
+    resultados: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        url_db = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_engine(url_db, connect_args={"check_same_thread": False})
+        SQLModel.metadata.create_all(engine)
+
+        with Session(engine) as session:
+            tiendas = {tipo: seed(session, tipo, args.productos) for tipo in {e.tipo for e in ESCENARIOS}}
+
+            if "servicio" in args.caminos:
+                contador = ContadorSentencias(engine)
+                for escenario in ESCENARIOS:
+                    print(f"  servicio/{escenario.nombre}", file=sys.stderr)
+                    resultados[f"servicio/{escenario.nombre}"] = medir_servicio(
+                        session, contador, escenario, tiendas[escenario.tipo], args.iteraciones
+                    )
+        engine.dispose()
+
+        if "http" in args.caminos:
+            resultados.update(asyncio.run(correr_http(url_db, tiendas, ESCENARIOS, args.iteraciones)))
+
+    print(f"\nProductos: {args.productos} | Iteraciones: {args.iteraciones}")
+    print(f"{'escenario':<58} {'p50':>8} {'p90':>8} {'p99':>8} {'máx':>8} {'sql':>5} {'KiB':>8}")
+    for nombre, medida in resultados.items():
+        print(
+            f"{nombre:<58} {medida['p50_ms']:>8.3f} {medida['p90_ms']:>8.3f} {medida['p99_ms']:>8.3f} "
+            f"{medida['max_ms']:>8.3f} {medida['sentencias']:>5} {medida['memoria_kib']:>8.1f}"
+        )
+
+    if args.guardar:
+        args.guardar.parent.mkdir(parents=True, exist_ok=True)
+        documento = {
+            "meta": {
+                "fecha": datetime.now(UTC).isoformat(timespec="seconds"),
+                "commit": _commit_actual(),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "maquina": platform.machine(),
+                "cpus": os.cpu_count(),
+                "productos": args.productos,
+                "iteraciones": args.iteraciones,
+            },
+            "escenarios": resultados,
+        }
+        args.guardar.write_text(json.dumps(documento, indent=2, ensure_ascii=False))
+        print(f"\nBaseline guardada en {args.guardar}")
+
+    if args.comparar:
+        baseline = json.loads(args.comparar.read_text())["escenarios"]
+        if comparar(resultados, baseline, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
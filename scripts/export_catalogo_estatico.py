@@ -0,0 +1,182 @@
+"""
+Exporta el catálogo público de cada negocio activo a archivos JSON estáticos,
+para servirlos desde un CDN / hosting estático sin pasar por la API.
+
+Uso:
+    python -m scripts.export_catalogo_estatico --destino ./public-catalogos
+    python -m scripts.export_catalogo_estatico --destino ./public-catalogos --forzar
+
+Estructura generada (mismas formas que el router público):
+    <destino>/<slug>/index.json                      NegocioPublicDetail
+    <destino>/<slug>/categorias.json                 list[CategoriaRead]
+    <destino>/<slug>/productos.json                  list[ProductoRead]
+    <destino>/<slug>/toppings.json                   {producto_id: grupos}
+    <destino>/<slug>/productos/<id>/toppings.json    grupos del producto
+    <destino>/<slug>/catalog.json                    CatalogoPublico
+
+Cada <slug> es un symlink a una versión ya escrita completa en .versiones/;
+publicar una versión nueva es reemplazar el symlink (os.replace, atómico), así
+el hosting nunca sirve un catálogo a medio escribir.
+
+Solo se vuelven a renderizar los negocios cuyo catálogo cambió desde la corrida
+anterior: la marca de agua (.watermark.json) guarda la versión de catálogo y las
+insignias exportadas de cada negocio.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models.models import Negocio
+from app.schemas.categoria import CategoriaRead
+from app.schemas.producto import ProductoRead
+from app.services.catalogo_service import construir_catalogo
+from app.services.negocio_service import NegocioSnapshot
+
+WATERMARK = ".watermark.json"
+VERSIONES = ".versiones"
+# Versiones anteriores a la publicada que se conservan (lecturas en curso, rollback)
+VERSIONES_ANTERIORES = 1
+
+_lista_categorias = TypeAdapter(list[CategoriaRead])
+_lista_productos = TypeAdapter(list[ProductoRead])
+
+
+def _escribir_atomico(ruta: Path, contenido: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, prefix=f".{ruta.name}.")
+    with os.fdopen(fd, "wb") as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+
+def leer_watermark(destino: Path) -> dict[str, dict]:
+    ruta = destino / WATERMARK
+    if not ruta.exists():
+        return {}
+    return json.loads(ruta.read_text())
+
+
+def _marca(negocio: NegocioSnapshot) -> dict:
+    return {
+        "negocio_id": negocio.id,
+        "catalogo_version": negocio.catalogo_version,
+        "insignias": negocio.insignias,
+    }
+
+
+def renderizar_negocio(session: Session, negocio: NegocioSnapshot, directorio: Path) -> None:
+    """Escribe todos los archivos del negocio en `directorio` (que no tiene que existir)"""
+    catalogo = construir_catalogo(session, negocio)
+
+    (directorio / "productos").mkdir(parents=True)
+    (directorio / "index.json").write_bytes(catalogo.negocio.model_dump_json().encode())
+    (directorio / "categorias.json").write_bytes(_lista_categorias.dump_json(catalogo.categorias))
+    (directorio / "productos.json").write_bytes(_lista_productos.dump_json(catalogo.productos))
+    (directorio / "toppings.json").write_bytes(json.dumps(catalogo.toppings).encode())
+    (directorio / "catalog.json").write_bytes(catalogo.model_dump_json().encode())
+
+    for producto_id, grupos in catalogo.toppings.items():
+        carpeta = directorio / "productos" / str(producto_id)
+        carpeta.mkdir()
+        (carpeta / "toppings.json").write_bytes(json.dumps(grupos).encode())
+
+
+def publicar(destino: Path, slug: str, version_dir: Path) -> None:
+    """Apunta <destino>/<slug> a `version_dir` reemplazando el symlink de forma atómica"""
+    enlace = destino / slug
+    tmp = destino / f".{slug}.{os.getpid()}.tmp"
+    if tmp.is_symlink() or tmp.exists():
+        tmp.unlink()
+    os.symlink(version_dir.relative_to(destino), tmp)
+    os.replace(tmp, enlace)
+
+
+def _limpiar_versiones(destino: Path, slug: str) -> None:
+    carpeta = destino / VERSIONES / slug
+    if not carpeta.exists():
+        return
+    actual = (destino / slug).resolve() if (destino / slug).is_symlink() else None
+    anteriores = sorted(
+        (d for d in carpeta.iterdir() if d.is_dir() and d.resolve() != actual),
+        key=lambda d: d.name,
+    )
+    for directorio in anteriores[:-VERSIONES_ANTERIORES]:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def _despublicar(destino: Path, slug: str) -> None:
+    enlace = destino / slug
+    if enlace.is_symlink():
+        enlace.unlink()
+    shutil.rmtree(destino / VERSIONES / slug, ignore_errors=True)
+
+
+def exportar(session: Session, destino: Path, forzar: bool = False) -> dict[str, int]:
+    """Exporta los negocios activos que cambiaron; devuelve contadores de la corrida"""
+    destino.mkdir(parents=True, exist_ok=True)
+    watermark = leer_watermark(destino)
+    resultado = {"renderizados": 0, "sin_cambios": 0, "eliminados": 0}
+
+    negocios = session.exec(select(Negocio).where(Negocio.activo).order_by(Negocio.id)).all()
+    snapshots = [NegocioSnapshot.desde_modelo(n) for n in negocios]
+    activos = {n.slug for n in snapshots}
+
+    for negocio in snapshots:
+        marca = _marca(negocio)
+        if not forzar and watermark.get(negocio.slug) == marca and (destino / negocio.slug).is_symlink():
+            resultado["sin_cambios"] += 1
+            continue
+
+        # Se escribe aparte y se mueve entero: el symlink solo ve versiones completas
+        carpeta = destino / VERSIONES / negocio.slug
+        carpeta.mkdir(parents=True, exist_ok=True)
+        nombre = f"v{negocio.catalogo_version:08d}-{time.time_ns()}"
+        tmp = Path(tempfile.mkdtemp(dir=carpeta, prefix=".tmp-"))
+        renderizar_negocio(session, negocio, tmp / "contenido")
+        version_dir = carpeta / nombre
+        os.rename(tmp / "contenido", version_dir)
+        tmp.rmdir()
+
+        publicar(destino, negocio.slug, version_dir)
+        _limpiar_versiones(destino, negocio.slug)
+
+        # La marca se guarda después de cada negocio: si la corrida se corta, no se repite trabajo
+        watermark[negocio.slug] = marca
+        _escribir_atomico(destino / WATERMARK, json.dumps(watermark, indent=2).encode())
+        resultado["renderizados"] += 1
+
+    # Negocios desactivados (o que cambiaron de slug) desde la última corrida
+    for slug in set(watermark) - activos:
+        _despublicar(destino, slug)
+        del watermark[slug]
+        resultado["eliminados"] += 1
+    _escribir_atomico(destino / WATERMARK, json.dumps(watermark, indent=2).encode())
+
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destino", required=True, type=Path, help="directorio servido por el hosting estático")
+    parser.add_argument("--forzar", action="store_true", help="re-renderiza todos los negocios")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        resultado = exportar(session, args.destino, forzar=args.forzar)
+
+    print(
+        f"Renderizados: {resultado['renderizados']} | "
+        f"Sin cambios: {resultado['sin_cambios']} | "
+        f"Eliminados: {resultado['eliminados']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Prueba de carga del router público: requests/seg y latencias con N clientes concurrentes.
+
+Uso (contra un servidor levantado, antes y después del cambio):
+    python -m scripts.load_test_public --url http://localhost:8000 --slug mi-tienda \\
+        --concurrencia 500 --duracion 30
+
+Cada cliente recorre en loop las lecturas de una visita típica al storefront.
+El rate limiter de slowapi es por IP: desactivarlo o levantarlo para la prueba.
+
+Resultados (2026-10-17): un worker de uvicorn, limiter desactivado, SQLite con un negocio
+de 100 productos, 8 categorías y 30 productos con toppings. Servidor y cliente en la misma
+máquina de 1 vCPU, dos corridas de 20s por configuración:
+
+    concurrencia   router sync (f32e89a)   router async (8338cd6)
+    50             134.8 / 110.9 req/s     118.4 / 110.6 req/s
+    200             70.2 /  94.1 req/s      79.0 /  85.7 req/s
+
+Las diferencias están dentro del ruido entre corridas. Con SQLite (aiosqlite también usa un
+thread por conexión) y el CPU compartido con el cliente, el threadpool nunca es el cuello de
+botella. La mejora esperada del router async (no ocupar un thread por request esperando a la
+base) aparece con una base por red como Postgres; hay que repetir la medición ahí antes de
+sacar conclusiones.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+RUTAS = ("", "/catalog", "/categorias", "/productos", "/toppings")
+
+
+async def cliente(http: httpx.AsyncClient, base: str, hasta: float, latencias: list[float], errores: list[int]):
+    while time.perf_counter() < hasta:
+        for ruta in RUTAS:
+            inicio = time.perf_counter()
+            try:
+                response = await http.get(base + ruta)
+                if response.status_code != 200:
+                    errores.append(response.status_code)
+            except httpx.HTTPError:
+                errores.append(0)
+            latencias.append(time.perf_counter() - inicio)
+
+
+def percentil(valores: list[float], p: float) -> float:
+    return statistics.quantiles(valores, n=100)[int(p) - 1] if len(valores) > 1 else valores[0]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--slug", required=True)
+    parser.add_argument("--concurrencia", type=int, default=500)
+    parser.add_argument("--duracion", type=float, default=30.0, help="segundos")
+    args = parser.parse_args()
+
+    base = f"{args.url}/public/{args.slug}"
+    latencias: list[float] = []
+    errores: list[int] = []
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+
+    async with httpx.AsyncClient(limits=limites, timeout=30.0) as http:
+        inicio = time.perf_counter()
+        hasta = inicio + args.duracion
+        await asyncio.gather(
+            *(cliente(http, base, hasta, latencias, errores) for _ in range(args.concurrencia))
+        )
+        transcurrido = time.perf_counter() - inicio
+
+    if not latencias:
+        print("Sin requests completados")
+        return
+
+    print(f"Concurrencia: {args.concurrencia} | Duración: {transcurrido:.1f}s")
+    print(f"Requests: {len(latencias)} | Errores: {len(errores)}")
+    print(f"Requests/seg: {len(latencias) / transcurrido:.1f}")
+    print(
+        "Latencia (ms): "
+        f"p50={percentil(latencias, 50) * 1000:.1f} "
+        f"p95={percentil(latencias, 95) * 1000:.1f} "
+        f"p99={percentil(latencias, 99) * 1000:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
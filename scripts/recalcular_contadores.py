@@ -0,0 +1,21 @@
+"""
+Recalcula total_pedidos y pedidos_finalizados de todos los negocios desde la tabla de pedidos.
+
+La migración 0002 los llena una sola vez; si después se desfasan (pedidos cargados o
+borrados a mano, un bug), este comando se puede correr las veces que haga falta:
+    python -m scripts.recalcular_contadores
+"""
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.services.negocio_service import recalcular_contadores_pedidos
+
+
+def recalcular():
+    with Session(engine) as session:
+        cantidad = recalcular_contadores_pedidos(session)
+    print(f"Contadores recalculados para {cantidad} negocios.")
+
+
+if __name__ == "__main__":
+    recalcular()
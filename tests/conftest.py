@@ -1,37 +1,67 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine, StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.deps import get_async_session, get_session
+from app.core.cache import limpiar_caches
+from app.core.database import url_async
+from app.core.rate_limit import limiter
 from app.main import app
-from app.api.deps import get_session
 
-# Base de datos en memoria para los tests
-DATABASE_URL = "sqlite://"
 
-@pytest.fixture(name="session")
-def session_fixture():
-    # El StaticPool es necesario para usar SQLite en memoria con múltiples hilos/conexiones
+@pytest.fixture(autouse=True)
+def limpiar_caches_fixture():
+    # Los caches son globales al proceso: cada test arranca con una DB nueva
+    limpiar_caches()
+    yield
+    limpiar_caches()
+
+@pytest.fixture(autouse=True)
+def reiniciar_rate_limit():
+    # El limiter cuenta por IP y todos los requests del TestClient salen de la misma
+    limiter.reset()
+    yield
+
+@pytest.fixture(name="engine")
+def engine_fixture(tmp_path):
+    # SQLite en archivo: el router público usa una conexión async (aiosqlite)
+    # que tiene que ver los mismos datos que la sesión sync de los tests
     engine = create_engine(
-        DATABASE_URL,
+        f"sqlite:///{tmp_path / 'test.db'}",
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
     )
     SQLModel.metadata.create_all(engine)
+    yield engine
+    SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.fixture(name="session")
+def session_fixture(engine):
     with Session(engine) as session:
         yield session
-    SQLModel.metadata.drop_all(engine)
 
 @pytest.fixture(name="db_session")
 def db_session_fixture(session):
     return session
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(engine, session: Session):
     # Sobrescribimos la dependencia get_session para que use la DB de prueba
     def get_session_override():
         return session
 
+    # NullPool: las conexiones aiosqlite no se comparten entre event loops
+    async_engine = create_async_engine(url_async(str(engine.url)), poolclass=NullPool)
+
+    async def get_async_session_override():
+        async with AsyncSession(async_engine) as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
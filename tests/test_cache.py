@@ -0,0 +1,79 @@
+import threading
+
+from app.core.cache import TTLCache
+
+
+def _esperar_revalidacion(cache: TTLCache, key) -> None:
+    # La recarga corre en el executor del cache: se espera a que la key salga de vuelo
+    evento = threading.Event()
+    for _ in range(500):
+        with cache._lock:
+            if key not in cache._revalidando:
+                return
+        evento.wait(0.01)
+    raise AssertionError("La revalidación no terminó")
+
+
+def test_stale_while_revalidate():
+    cache = TTLCache("test_swr", ttl=60, ttl_fresco=0)
+    recargas = []
+
+    def recargar():
+        recargas.append(1)
+        return "nuevo"
+
+    assert cache.get_or_revalidate("k", lambda: "viejo", recargar) == "viejo"
+
+    # Vencido el TTL fresco: devuelve el valor anterior sin esperar la recarga
+    assert cache.get_or_revalidate("k", lambda: "sync", recargar) == "viejo"
+    _esperar_revalidacion(cache, "k")
+    assert recargas == [1]
+    assert cache.get("k") == "nuevo"
+    assert cache.stats()["revalidaciones"] == 1
+
+    # Pasado el TTL duro se carga en el request
+    cache.ttl = 0
+    cache.invalidate("k")
+    assert cache.get_or_revalidate("k", lambda: "sync", recargar) == "sync"
+
+
+def test_revalidacion_con_error_mantiene_el_valor():
+    cache = TTLCache("test_swr_error", ttl=60, ttl_fresco=0)
+    cache.set("k", "viejo")
+
+    def recargar():
+        raise RuntimeError("la base no responde")
+
+    assert cache.get_or_revalidate("k", lambda: "sync", recargar) == "viejo"
+    _esperar_revalidacion(cache, "k")
+    assert cache.get("k") == "viejo"
+
+
+def test_invalidacion_gana_a_una_recarga_en_vuelo():
+    cache = TTLCache("test_swr_invalidacion", ttl=60, ttl_fresco=0)
+    cache.set("k", "viejo")
+    puede_terminar = threading.Event()
+
+    def recargar():
+        puede_terminar.wait(5)
+        return "leido antes de la escritura"
+
+    cache.get_or_revalidate("k", lambda: "sync", recargar)
+    cache.invalidate("k")
+    puede_terminar.set()
+    _esperar_revalidacion(cache, "k")
+    assert cache.get("k") is None
+
+
+def test_invalidacion_gana_a_una_carga_sincronica():
+    cache = TTLCache("test_carga_invalidacion", ttl=60)
+
+    def loader():
+        # La escritura confirma e invalida mientras se estaba leyendo el dato
+        cache.invalidate("k")
+        return "leido antes de la escritura"
+
+    assert cache.get_or_revalidate("k", loader, loader) == "leido antes de la escritura"
+    assert cache.get("k") is None
+    assert cache.get_or_set("k", loader) == "leido antes de la escritura"
+    assert cache.get("k") is None
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from app.core.eventos import BusEventos
+
+
+def test_publicar_desde_otro_thread():
+    async def escenario():
+        bus = BusEventos()
+        suscripcion = bus.suscribir("canal")
+        thread = threading.Thread(target=lambda: [bus.publicar("canal", i) for i in range(3)])
+        thread.start()
+        thread.join()
+        recibidos = [await suscripcion.recibir(timeout=1) for _ in range(3)]
+        suscripcion.cerrar()
+        return recibidos, bus.cantidad_suscriptores("canal")
+
+    assert asyncio.run(escenario()) == ([0, 1, 2], 0)
+
+
+def test_suscriptor_lento_se_desconecta():
+    async def escenario():
+        bus = BusEventos()
+        lenta = bus.suscribir("canal", maxsize=2)
+        for i in range(3):
+            bus.publicar("canal", i)
+        await asyncio.sleep(0)
+        return lenta.desbordada, [e async for e in lenta], bus.cantidad_suscriptores("canal")
+
+    assert asyncio.run(escenario()) == (True, [], 0)
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app.models.models import Negocio, Producto, Usuario
+from app.services.negocio_service import incrementar_version_catalogo
+from scripts.export_catalogo_estatico import VERSIONES, exportar
+
+ARCHIVOS = ("index.json", "categorias.json", "productos.json", "toppings.json", "catalog.json")
+
+
+@pytest.fixture
+def negocios(session):
+    usuario = Usuario(nombre="Owner", email="owner@test.com", password_hash="hash")
+    session.add(usuario)
+    session.flush()
+
+    creados = []
+    for slug in ("tienda-a", "tienda-b"):
+        negocio = Negocio(usuario_id=usuario.id, nombre=slug, slug=slug, activo=True)
+        session.add(negocio)
+        session.flush()
+        session.add(Producto(negocio_id=negocio.id, nombre="Pizza", precio=1000, activo=True, stock=True))
+        creados.append(negocio)
+    session.commit()
+    return creados
+
+
+def _publicado(destino, slug):
+    enlace = destino / slug
+    assert enlace.is_symlink()
+    return enlace.resolve()
+
+
+def test_export_incremental(session, negocios, tmp_path):
+    destino = tmp_path / "catalogos"
+    a, b = negocios
+
+    assert exportar(session, destino) == {"renderizados": 2, "sin_cambios": 0, "eliminados": 0}
+    version_a, version_b = _publicado(destino, a.slug), _publicado(destino, b.slug)
+
+    # Sin cambios en el catálogo no se vuelve a renderizar nada
+    assert exportar(session, destino) == {"renderizados": 0, "sin_cambios": 2, "eliminados": 0}
+    assert _publicado(destino, a.slug) == version_a
+
+    # Un cambio de versión re-renderiza solo ese negocio
+    incrementar_version_catalogo(session, a.id)
+    session.commit()
+    assert exportar(session, destino) == {"renderizados": 1, "sin_cambios": 1, "eliminados": 0}
+    assert _publicado(destino, a.slug) != version_a
+    assert _publicado(destino, b.slug) == version_b
+
+    watermark = json.loads((destino / ".watermark.json").read_text())
+    assert watermark[a.slug]["catalogo_version"] == 1
+    assert watermark[b.slug]["catalogo_version"] == 0
+
+
+def test_export_publica_versiones_completas(session, negocios, tmp_path):
+    destino = tmp_path / "catalogos"
+    a, _ = negocios
+
+    exportar(session, destino)
+    incrementar_version_catalogo(session, a.id)
+    session.commit()
+    exportar(session, destino)
+
+    # El symlink apunta a una versión escrita entera, de la versión de catálogo actual
+    publicado = _publicado(destino, a.slug)
+    assert publicado.parent == (destino / VERSIONES / a.slug).resolve()
+    assert all((publicado / archivo).is_file() for archivo in ARCHIVOS)
+    catalogo = json.loads((publicado / "catalog.json").read_text())
+    assert catalogo["version"] == 1
+    assert [p["nombre"] for p in catalogo["productos"]] == ["Pizza"]
+
+    # No quedan directorios temporales ni symlinks a medio reemplazar
+    assert not [d for d in (destino / VERSIONES / a.slug).iterdir() if d.name.startswith(".tmp-")]
+    assert not [e for e in destino.iterdir() if e.name.endswith(".tmp")]
+
+
+def test_export_despublica_negocios_desactivados(session, negocios, tmp_path):
+    destino = tmp_path / "catalogos"
+    _, b = negocios
+
+    exportar(session, destino)
+    b.activo = False
+    session.add(b)
+    session.commit()
+
+    assert exportar(session, destino)["eliminados"] == 1
+    assert not (destino / b.slug).exists()
+    assert not (destino / VERSIONES / b.slug).exists()
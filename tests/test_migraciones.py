@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+from sqlmodel import SQLModel
+
+from alembic import command
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _config(url: str) -> Config:
+    config = Config(str(RAIZ / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url)
+    return config
+
+
+def test_migraciones_coinciden_con_los_modelos(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migraciones.db'}"
+    command.upgrade(_config(url), "head")
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        # Ni tablas, ni columnas ni índices de más o de menos respecto a app/models
+        assert compare_metadata(MigrationContext.configure(conn), SQLModel.metadata) == []
+
+        indices = {i["name"]: i["column_names"] for i in inspect(conn).get_indexes("pedidos")}
+    engine.dispose()
+    assert indices["ix_pedidos_negocio_id_creado_en"] == ["negocio_id", "creado_en"]
+    assert indices["ix_pedidos_negocio_id_codigo"] == ["negocio_id", "codigo"]
+
+
+def test_downgrade_a_base(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migraciones.db'}"
+    config = _config(url)
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
+
+    engine = create_engine(url)
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+    engine.dispose()
+
+
+def test_base_previa_a_alembic_se_marca_con_0001(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migraciones.db'}"
+    config = _config(url)
+    # Tablas como las dejaba create_all, sin alembic_version
+    command.upgrade(config, "0001")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE alembic_version")
+
+    command.upgrade(config, "head")
+
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), SQLModel.metadata) == []
+    engine.dispose()
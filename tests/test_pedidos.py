@@ -1,7 +1,11 @@
+from datetime import UTC
+
 import pytest
-from app.models.models import Negocio, Usuario, Pedido, PedidoEstado, TipoNegocio
 from sqlmodel import select
+
 from app.core.security import hash_password
+from app.models.models import Negocio, Pedido, PedidoEstado, TipoNegocio, Usuario
+
 
 def test_pedidos_pagination_ordering(client, session):
     # 1. Setup: Create User and Business
@@ -298,3 +302,938 @@ def test_direccion_entrega_y_notas(client, session):
     assert data["direccion_entrega"] == "Av. Siempre Viva 742"
     assert data["notas"] == "Dejar en portería"
 
+
+
+def test_contadores_de_pedidos(client, session):
+    """Crear y finalizar pedidos mantiene los contadores del negocio al día."""
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, precio=1000)
+
+    response = client.post(
+        f"/public/{negocio.slug}/pedidos",
+        json={
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+            "items": [{"producto_id": producto.id, "cantidad": 1}],
+        },
+    )
+    assert response.status_code == 200
+    pedido_id = response.json()["id"]
+
+    for accion in ("aceptar", "progreso", "finalizar"):
+        assert client.patch(f"/api/pedidos/{pedido_id}/{accion}", headers=headers).status_code == 200
+
+    session.refresh(negocio)
+    assert negocio.total_pedidos == 1
+    assert negocio.pedidos_finalizados == 1
+
+
+def test_insignias_desde_contadores(client, session):
+    """Las insignias se calculan desde los contadores, recalculables desde los pedidos."""
+    from app.services.negocio_service import recalcular_contadores_pedidos
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    for i in range(101):
+        estado = PedidoEstado.FINALIZADO if i < 51 else PedidoEstado.PENDIENTE
+        session.add(Pedido(negocio_id=negocio.id, codigo=f"B-{i}", estado=estado, total=100))
+    session.commit()
+
+    assert client.get(f"/public/{negocio.slug}").json()["insignias"] == []
+
+    recalcular_contadores_pedidos(session)
+
+    insignias = client.get(f"/public/{negocio.slug}").json()["insignias"]
+    assert insignias == ["TOP_SELLER_100", "VERIFICADO_50"]
+
+
+def test_paginacion_por_cursor_pedidos(client, session):
+    """El cursor recorre todos los pedidos sin repetir ni saltear, del más nuevo al más viejo."""
+    from datetime import datetime, timedelta
+
+    negocio, headers = _setup_user_negocio_token(client, session)
+    base = datetime(2026, 1, 1, tzinfo=UTC)
+    for i in range(7):
+        # Pares de pedidos con el mismo creado_en para probar el desempate por id
+        session.add(Pedido(negocio_id=negocio.id, codigo=f"CUR-{i}", total=100, creado_en=base + timedelta(minutes=i // 2)))
+    session.commit()
+
+    codigos = []
+    url = "/api/pedidos/?limit=3"
+    while True:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        codigos += [p["codigo"] for p in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        url = f"/api/pedidos/?limit=3&cursor={cursor}"
+
+    assert codigos == [f"CUR-{i}" for i in reversed(range(7))]
+
+
+def test_cursor_invalido(client, session):
+    _, headers = _setup_user_negocio_token(client, session)
+    response = client.get("/api/pedidos/?cursor=no-es-un-cursor", headers=headers)
+    assert response.status_code == 400
+
+
+def test_stream_estado_pedido(client, session):
+    import json
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.core.eventos import bus_eventos
+    from app.services.pedido_service import canal_pedido
+
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    response = client.post(
+        f"/public/{negocio.slug}/pedidos",
+        json={
+            "items": [{"producto_id": producto.id, "cantidad": 1}],
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+        },
+    )
+    pedido = response.json()
+    url = f"/public/{negocio.slug}/pedidos/{pedido['codigo']}/stream"
+
+    def estados(response):
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return [
+            json.loads(linea[len("data: "):])["estado"]
+            for linea in response.text.splitlines()
+            if linea.startswith("data: ")
+        ]
+
+    # El TestClient junta todo el cuerpo: el stream corre en otro thread hasta que termina
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futuro = executor.submit(client.get, url)
+        canal = canal_pedido(negocio.id, pedido["codigo"])
+        limite = time.monotonic() + 5
+        while bus_eventos.cantidad_suscriptores(canal) == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+
+        for accion in ("aceptar", "progreso", "finalizar"):
+            assert client.patch(f"/api/pedidos/{pedido['id']}/{accion}", headers=headers).status_code == 200
+
+        # El stream termina solo al llegar a un estado final
+        stream = futuro.result(timeout=5)
+
+    assert estados(stream) == ["pendiente", "aceptado", "en_progreso", "finalizado"]
+    assert bus_eventos.cantidad_suscriptores(canal) == 0
+
+    # Un pedido ya finalizado envía su estado y cierra
+    assert estados(client.get(url)) == ["finalizado"]
+
+    assert client.get(f"/public/{negocio.slug}/pedidos/NOEXISTE/stream").status_code == 404
+
+
+def test_idempotency_key_repite_la_primera_respuesta(client, session):
+    from sqlmodel import func, select
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    url = f"/public/{negocio.slug}/pedidos"
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 2}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+    }
+
+    primera = client.post(url, json=cuerpo, headers={"Idempotency-Key": "checkout-1"})
+    assert primera.status_code == 200
+    assert "idempotent-replayed" not in primera.headers
+
+    reintento = client.post(url, json=cuerpo, headers={"Idempotency-Key": "checkout-1"})
+    assert reintento.status_code == 200
+    assert reintento.headers["idempotent-replayed"] == "true"
+    assert reintento.content == primera.content
+
+    # Misma key con otro pedido: error, no se pisa el original
+    otro = {**cuerpo, "items": [{"producto_id": producto.id, "cantidad": 5}]}
+    assert client.post(url, json=otro, headers={"Idempotency-Key": "checkout-1"}).status_code == 400
+
+    # Otra key es otro pedido
+    nuevo = client.post(url, json=cuerpo, headers={"Idempotency-Key": "checkout-2"})
+    assert nuevo.json()["codigo"] != primera.json()["codigo"]
+
+    cantidad = session.exec(select(func.count(Pedido.id)).where(Pedido.negocio_id == negocio.id)).one()
+    assert cantidad == 2
+
+
+def test_idempotency_key_reintentos_concurrentes(client, session):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlmodel import func, select
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+    }
+
+    def enviar(_):
+        return client.post(
+            f"/public/{negocio.slug}/pedidos", json=cuerpo, headers={"Idempotency-Key": "doble-click"}
+        )
+
+    # Cada request del TestClient corre en su propio event loop: el engine async
+    # tiene que estar inicializado antes de usarlo desde varios a la vez
+    client.get(f"/public/{negocio.slug}")
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        respuestas = list(executor.map(enviar, range(5)))
+
+    assert {r.status_code for r in respuestas} == {200}
+    assert len({r.content for r in respuestas}) == 1
+    assert sum("idempotent-replayed" not in r.headers for r in respuestas) == 1
+
+    cantidad = session.exec(select(func.count(Pedido.id)).where(Pedido.negocio_id == negocio.id)).one()
+    assert cantidad == 1
+
+
+def test_idempotency_key_no_guarda_errores(client, session):
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, stock=False)
+    url = f"/public/{negocio.slug}/pedidos"
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+    }
+
+    assert client.post(url, json=cuerpo, headers={"Idempotency-Key": "sin-stock"}).status_code == 400
+
+    # Repuesto el stock (como lo hace producto_service: con nueva versión de catálogo),
+    # el reintento con la misma key hace el pedido
+    from app.services.negocio_service import incrementar_version_catalogo
+
+    producto.stock = True
+    session.add(producto)
+    incrementar_version_catalogo(session, negocio.id)
+    session.commit()
+    response = client.post(url, json=cuerpo, headers={"Idempotency-Key": "sin-stock"})
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_crear_pedido_cantidad_de_sentencias_constante(client, session):
+    from sqlalchemy import event
+
+    from app.schemas.pedido import PedidoCreate
+    from app.services.negocio_service import obtener_negocio_por_slug
+    from app.services.pedido_service import crear_nuevo_pedido
+    from app.services.precios_service import obtener_tabla_precios
+
+    negocio, _ = _setup_user_negocio_token(client, session, tipo_negocio=TipoNegocio.DISTRIBUIDORA)
+    productos = [_create_producto(session, negocio.id, nombre=f"Producto {i}", precio=100) for i in range(80)]
+    slug = negocio.slug
+    # Snapshot del negocio y tabla de precios ya en cache, como en régimen
+    obtener_tabla_precios(session, obtener_negocio_por_slug(session, slug))
+
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    def crear(cantidad_lineas):
+        data = PedidoCreate(
+            metodo_pago="efectivo",
+            tipo_entrega="delivery",
+            items=[{"producto_id": p.id, "cantidad": 2} for p in productos[:cantidad_lineas]],
+        )
+        sentencias.clear()
+        event.listen(session.get_bind(), "before_cursor_execute", contar)
+        try:
+            return crear_nuevo_pedido(session, slug, data)
+        finally:
+            event.remove(session.get_bind(), "before_cursor_execute", contar)
+
+    # INSERT pedido, INSERT items (RETURNING), contador del negocio: los precios salen de memoria
+    pedido_chico = crear(1)
+    assert len(sentencias) == 3, sentencias
+
+    pedido_grande = crear(80)
+    assert len(sentencias) == 3, sentencias
+
+    assert len(pedido_chico.items) == 1
+    assert len(pedido_grande.items) == 80
+    assert pedido_grande.total == 80 * 2 * 100
+    assert [i.nombre_producto for i in pedido_grande.items] == [p.nombre for p in productos]
+
+    # La respuesta armada en memoria coincide con lo guardado
+    guardado = client.get(f"/public/{slug}/pedidos/{pedido_grande.codigo}").json()
+    assert guardado == pedido_grande.model_dump(mode="json")
+
+
+def test_cupon_con_limite_pedidos_concurrentes(client, session):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlmodel import func, select
+
+    from app.models.models import Promocion, PromocionTipo
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, precio=1000)
+    promo = Promocion(
+        negocio_id=negocio.id,
+        nombre="Flash",
+        codigo="FLASH",
+        tipo=PromocionTipo.MONTO_FIJO,
+        valor=100,
+        limite_usos_total=3,
+    )
+    session.add(promo)
+    session.commit()
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+        "codigo_cupon": "FLASH",
+    }
+
+    def enviar(_):
+        return client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo)
+
+    client.get(f"/public/{negocio.slug}")
+
+    # 10 pedidos a la vez (el máximo por minuto del endpoint) por 3 usos del cupón
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        respuestas = list(executor.map(enviar, range(10)))
+
+    aceptados = [r for r in respuestas if r.status_code == 200]
+    rechazados = [r for r in respuestas if r.status_code != 200]
+    assert len(aceptados) == 3
+    assert {r.status_code for r in rechazados} == {400}
+    assert all(r.json()["total"] == 900 for r in aceptados)
+
+    session.refresh(promo)
+    assert promo.usos_actuales == 3
+    # Los pedidos rechazados no dejaron nada guardado
+    cantidad = session.exec(select(func.count(Pedido.id)).where(Pedido.negocio_id == negocio.id)).one()
+    assert cantidad == 3
+    session.refresh(negocio)
+    assert negocio.total_pedidos == 3
+
+
+@pytest.fixture(name="modo_cola")
+def modo_cola_fixture(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.services import cola_pedidos_service
+
+    cola = cola_pedidos_service.ColaPedidos(str(tmp_path / "cola.db"))
+    monkeypatch.setattr(settings, "PEDIDOS_MODO", "cola")
+    monkeypatch.setattr(cola_pedidos_service, "_cola", cola)
+    yield cola
+    cola.cerrar()
+
+
+def test_pedido_en_cola_se_ve_pendiente_y_se_vuelca(client, session, modo_cola):
+    from app.services.cola_pedidos_service import procesar_cola
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, precio=1500)
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 2}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+        "nombre_cliente": "Ana",
+    }
+
+    response = client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo)
+    assert response.status_code == 200
+    encolado = response.json()
+    assert encolado["id"] is None
+    assert encolado["estado"] == "pendiente"
+    assert encolado["total"] == 3000
+
+    # Todavía no está en la base, pero el seguimiento ya lo muestra
+    assert session.exec(select(Pedido).where(Pedido.negocio_id == negocio.id)).first() is None
+    assert modo_cola.cantidad() == 1
+    url = f"/public/{negocio.slug}/pedidos/{encolado['codigo']}"
+    assert client.get(url).json() == encolado
+
+    assert procesar_cola(session) == 1
+    assert modo_cola.cantidad() == 0
+
+    guardado = client.get(url).json()
+    assert guardado["id"] is not None
+    assert guardado["items"][0]["id"] is not None
+    assert {k: v for k, v in guardado.items() if k not in ("id", "items")} == {
+        k: v for k, v in encolado.items() if k not in ("id", "items")
+    }
+    session.refresh(negocio)
+    assert negocio.total_pedidos == 1
+
+
+def test_cola_valida_contra_el_catalogo(client, session, modo_cola):
+    negocio, _ = _setup_user_negocio_token(client, session)
+    sin_stock = _create_producto(session, negocio.id, stock=False)
+    inactivo = _create_producto(session, negocio.id, activo=False)
+    url = f"/public/{negocio.slug}/pedidos"
+
+    for producto, status in ((sin_stock, 400), (inactivo, 404)):
+        cuerpo = {
+            "items": [{"producto_id": producto.id, "cantidad": 1}],
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+        }
+        assert client.post(url, json=cuerpo).status_code == status
+    assert modo_cola.cantidad() == 0
+
+
+def test_cola_reintento_no_duplica_pedidos(client, session, modo_cola):
+    from sqlmodel import func
+
+    from app.models.models import PedidoItem
+    from app.services.cola_pedidos_service import _deserializar, procesar_cola, volcar_lote
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+    }
+    for _ in range(3):
+        assert client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo).status_code == 200
+
+    # El proceso muere después del commit y antes de sacar el lote de la cola...
+    lote = [_deserializar(crudo) for _, crudo, _ in modo_cola.tomar_lote(2)]
+    assert volcar_lote(session, lote) == 2
+    assert modo_cola.cantidad() == 3
+
+    # ...y al reintentar solo se inserta el que faltaba
+    assert procesar_cola(session) == 3
+    assert modo_cola.cantidad() == 0
+    assert session.exec(select(func.count(Pedido.id)).where(Pedido.negocio_id == negocio.id)).one() == 3
+    assert session.exec(select(func.count(PedidoItem.id))).one() == 3
+    session.refresh(negocio)
+    assert negocio.total_pedidos == 3
+
+
+def test_cola_pedidos_con_cupon_van_directo(client, session, modo_cola):
+    from app.models.models import Promocion, PromocionTipo
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    session.add(
+        Promocion(negocio_id=negocio.id, nombre="Promo", codigo="PROMO", tipo=PromocionTipo.MONTO_FIJO, valor=100)
+    )
+    session.commit()
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+        "codigo_cupon": "PROMO",
+    }
+
+    response = client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo)
+    assert response.status_code == 200
+    assert response.json()["id"] is not None
+    assert response.json()["total"] == 900
+    assert modo_cola.cantidad() == 0
+
+
+def test_checkout_y_cupon_cotizan_igual(client, session):
+    from app.models.models import (
+        GrupoTopping,
+        ProductoGrupoTopping,
+        Promocion,
+        PromocionTipo,
+        Topping,
+    )
+    from app.services import precios_service
+
+    negocio, headers = _setup_user_negocio_token(client, session, tipo_negocio=TipoNegocio.DISTRIBUIDORA)
+    producto = _create_producto(session, negocio.id, precio=100, precio_mayorista=80, cantidad_mayorista=10)
+    grupo = GrupoTopping(negocio_id=negocio.id, nombre="Extras")
+    session.add(grupo)
+    session.flush()
+    topping = Topping(grupo_id=grupo.id, nombre="Queso", precio_extra=15)
+    session.add(topping)
+    session.add(ProductoGrupoTopping(producto_id=producto.id, grupo_id=grupo.id, max_selecciones=1))
+    session.add(Promocion(negocio_id=negocio.id, nombre="10%", codigo="DIEZ", tipo=PromocionTipo.PORCENTAJE, valor=10))
+    session.commit()
+
+    items = [{"producto_id": producto.id, "cantidad": 10, "toppings": [{"topping_id": topping.id}]}]
+
+    def cotizar():
+        cupon = client.post(f"/public/{negocio.slug}/validate-coupon", json={"codigo": "DIEZ", "items": items})
+        pedido = client.post(
+            f"/public/{negocio.slug}/pedidos",
+            json={"items": items, "metodo_pago": "efectivo", "tipo_entrega": "delivery", "codigo_cupon": "DIEZ"},
+        )
+        return cupon.json()["descuento"], pedido.json()
+
+    # Precio mayorista + topping: (80 + 15) * 10
+    descuento, pedido = cotizar()
+    assert pedido["items"][0]["precio_unitario"] == 95
+    assert descuento == pedido["descuento_aplicado"] == 95
+    assert pedido["total"] == 950 - 95
+
+    # Compilada una sola vez para los dos caminos
+    assert precios_service._tablas.stats()["misses"] == 1
+
+    # Una escritura del catálogo invalida la tabla
+    response = client.put(f"/api/productos/{producto.id}", json={"precio_mayorista": 60}, headers=headers)
+    assert response.status_code == 200
+    descuento, pedido = cotizar()
+    assert pedido["items"][0]["precio_unitario"] == 75
+    assert descuento == pedido["descuento_aplicado"] == 75
+
+
+def test_pedidos_en_lote(client, session):
+    from app.models.models import Promocion, PromocionTipo
+
+    negocio, headers = _setup_user_negocio_token(
+        client, session, tipo_negocio=TipoNegocio.DISTRIBUIDORA, pedido_minimo=1500
+    )
+    producto = _create_producto(session, negocio.id, precio=1000, precio_mayorista=800, cantidad_mayorista=10)
+    session.add(Promocion(
+        negocio_id=negocio.id,
+        nombre="Uno solo",
+        codigo="UNO",
+        tipo=PromocionTipo.MONTO_FIJO,
+        valor=100,
+        limite_usos_total=1,
+    ))
+    session.commit()
+
+    def pedido(cantidad, **kwargs):
+        return {
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+            "items": [{"producto_id": producto.id, "cantidad": cantidad}],
+            **kwargs,
+        }
+
+    response = client.post(
+        "/api/pedidos/lote",
+        json={"pedidos": [
+            pedido(2),
+            pedido(1),  # debajo del pedido mínimo
+            pedido(10, codigo_cupon="UNO"),
+            pedido(3, codigo_cupon="UNO"),  # cupón ya agotado por el anterior
+            pedido(2, metodo_pago="bitcoin"),
+            {"items": [{"producto_id": 999999, "cantidad": 5}], "metodo_pago": "efectivo", "tipo_entrega": "delivery"},
+            pedido(5),
+        ]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    data = response.json()
+
+    assert [p["total"] for p in data["creados"]] == [2000, 7900, 5000]
+    assert all(p["id"] is not None and p["items"][0]["id"] is not None for p in data["creados"])
+    assert len({p["codigo"] for p in data["creados"]}) == 3
+    assert [e["indice"] for e in data["errores"]] == [1, 3, 4, 5]
+    assert "límite de usos" in data["errores"][1]["detalle"]
+
+    # Todo quedó guardado y contado
+    listado = client.get("/api/pedidos/", headers=headers).json()
+    assert sorted(p["codigo"] for p in listado) == sorted(p["codigo"] for p in data["creados"])
+    session.refresh(negocio)
+    assert negocio.total_pedidos == 3
+
+
+def test_pedidos_en_lote_solo_distribuidoras(client, session):
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+
+    response = client.post(
+        "/api/pedidos/lote",
+        json={"pedidos": [{
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+            "items": [{"producto_id": producto.id, "cantidad": 1}],
+        }]},
+        headers=headers,
+    )
+    assert response.status_code == 403
+    assert client.post("/api/pedidos/lote", json={"pedidos": []}, headers=headers).status_code == 422
+
+
+def test_cambio_de_estado_en_lote(client, session):
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, precio=1000)
+    ids = [
+        client.post(
+            f"/public/{negocio.slug}/pedidos",
+            json={
+                "metodo_pago": "efectivo",
+                "tipo_entrega": "delivery",
+                "items": [{"producto_id": producto.id, "cantidad": 1}],
+            },
+        ).json()["id"]
+        for _ in range(3)
+    ]
+
+    def cambiar(pedido_ids, estado):
+        response = client.patch("/api/pedidos/estado", json={"ids": pedido_ids, "estado": estado}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    # Inexistentes y pedidos en otro estado se rechazan sin frenar al resto
+    resultado = cambiar([ids[0], ids[1], 999999, ids[0], 999999], "aceptado")
+    # Los repetidos se informan una sola vez
+    assert resultado == {"estado": "aceptado", "actualizados": ids[:2], "rechazados": [999999]}
+    assert cambiar(ids, "finalizado")["actualizados"] == []
+    assert cambiar(ids, "rechazado") == {"estado": "rechazado", "actualizados": [ids[2]], "rechazados": ids[:2]}
+    assert cambiar(ids, "en_progreso")["actualizados"] == ids[:2]
+    assert cambiar(ids, "finalizado")["actualizados"] == ids[:2]
+
+    estados = {p["id"]: p["estado"] for p in client.get("/api/pedidos/", headers=headers).json()}
+    assert estados == {ids[0]: "finalizado", ids[1]: "finalizado", ids[2]: "rechazado"}
+    session.refresh(negocio)
+    assert negocio.pedidos_finalizados == 2
+
+    response = client.patch("/api/pedidos/estado", json={"ids": ids, "estado": "pendiente"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_transiciones_concurrentes_mueven_una_sola_vez(client, session, engine):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlmodel import Session
+
+    from app.core.exceptions import BusinessLogicError
+    from app.services.pedido_service import cambiar_estado_pedido
+
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, precio=1000)
+    pedido_id = client.post(
+        f"/public/{negocio.slug}/pedidos",
+        json={
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+            "items": [{"producto_id": producto.id, "cantidad": 1}],
+        },
+    ).json()["id"]
+    for accion in ("aceptar", "progreso"):
+        assert client.patch(f"/api/pedidos/{pedido_id}/{accion}", headers=headers).status_code == 200
+
+    # Varios dispositivos finalizando el mismo pedido a la vez (cada uno con su sesión):
+    # solo uno lo mueve
+    def finalizar(_):
+        with Session(engine) as otra_sesion:
+            try:
+                cambiar_estado_pedido(otra_sesion, negocio.id, pedido_id, PedidoEstado.FINALIZADO)
+                return "ok"
+            except BusinessLogicError as e:
+                return e.message
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(finalizar, range(8)))
+    assert sorted(resultados) == ["Solo pedidos en progreso pueden finalizarse"] * 7 + ["ok"]
+    session.refresh(negocio)
+    assert negocio.pedidos_finalizados == 1
+
+    assert client.patch("/api/pedidos/999999/aceptar", headers=headers).status_code == 404
+    otro = Pedido(negocio_id=negocio.id + 1000, codigo="AJENO1", estado=PedidoEstado.PENDIENTE, total=0)
+    session.add(otro)
+    session.commit()
+    assert client.patch(f"/api/pedidos/{otro.id}/aceptar", headers=headers).status_code == 404
+
+
+def test_feed_del_comercio(client, session):
+    import time
+
+    from starlette.websockets import WebSocketDisconnect
+
+    from app.core.eventos import bus_eventos
+    from app.services.pedido_service import canal_negocio
+
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id, precio=1000)
+    token = headers["Authorization"].removeprefix("Bearer ")
+    canal = canal_negocio(negocio.id)
+
+    def esperar_suscriptores(cantidad):
+        limite = time.monotonic() + 5
+        while bus_eventos.cantidad_suscriptores(canal) != cantidad and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert bus_eventos.cantidad_suscriptores(canal) == cantidad
+
+    with client.websocket_connect(f"/api/pedidos/feed?token={token}") as ws:
+        esperar_suscriptores(1)
+        pedido = client.post(
+            f"/public/{negocio.slug}/pedidos",
+            json={
+                "metodo_pago": "efectivo",
+                "tipo_entrega": "delivery",
+                "nombre_cliente": "Ana",
+                "items": [{"producto_id": producto.id, "cantidad": 2}],
+            },
+        ).json()
+        evento = ws.receive_json()
+        assert evento == {"tipo": "pedidos_nuevos", "pedidos": [pedido]}
+
+        assert client.patch(f"/api/pedidos/{pedido['id']}/aceptar", headers=headers).status_code == 200
+        assert ws.receive_json() == {
+            "tipo": "estado",
+            "estado": "aceptado",
+            "pedidos": [{"id": pedido["id"], "codigo": pedido["codigo"]}],
+        }
+    esperar_suscriptores(0)
+
+    # Sin token válido no se acepta la conexión
+    with (
+        pytest.raises(WebSocketDisconnect),
+        client.websocket_connect("/api/pedidos/feed?token=invalido") as ws,
+    ):
+        ws.receive_json()
+
+
+def test_feed_del_comercio_corta_consumidores_lentos(client, session, monkeypatch):
+    import time
+
+    from starlette.websockets import WebSocketDisconnect
+
+    from app.core.eventos import bus_eventos
+    from app.services.pedido_service import canal_negocio
+
+    negocio, headers = _setup_user_negocio_token(client, session)
+    token = headers["Authorization"].removeprefix("Bearer ")
+    canal = canal_negocio(negocio.id)
+    suscribir = bus_eventos.suscribir
+    monkeypatch.setattr(bus_eventos, "suscribir", lambda c: suscribir(c, maxsize=2))
+
+    with client.websocket_connect(f"/api/pedidos/feed?token={token}") as ws:
+        limite = time.monotonic() + 5
+        while bus_eventos.cantidad_suscriptores(canal) == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+        # Más eventos juntos que los que entran en la cola de la conexión
+        for i in range(50):
+            bus_eventos.publicar(canal, {"tipo": "estado", "n": i})
+
+        recibidos = []
+        with pytest.raises(WebSocketDisconnect) as cierre:
+            while True:
+                recibidos.append(ws.receive_json())
+    assert cierre.value.code == 1013
+    assert len(recibidos) < 50
+    assert bus_eventos.cantidad_suscriptores(canal) == 0
+
+
+def test_listado_resumido_sin_items(client, session):
+    from sqlalchemy import event
+
+    negocio, headers = _setup_user_negocio_token(client, session)
+    productos = [_create_producto(session, negocio.id, nombre=f"Producto {i}", precio=100) for i in range(3)]
+    creados = [
+        client.post(
+            f"/public/{negocio.slug}/pedidos",
+            json={
+                "metodo_pago": "efectivo",
+                "tipo_entrega": "delivery",
+                "nombre_cliente": f"Cliente {n}",
+                "items": [{"producto_id": p.id, "cantidad": 2} for p in productos[:n]],
+            },
+        ).json()
+        for n in (1, 2, 3)
+    ]
+    assert [p["cantidad_items"] for p in creados] == [1, 2, 3]
+
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", contar)
+    try:
+        response = client.get("/api/pedidos/?vista=resumen&limit=2", headers=headers)
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", contar)
+    assert response.status_code == 200
+    assert not any("pedido_items" in s for s in sentencias), sentencias
+
+    resumen = response.json()
+    assert [p["codigo"] for p in resumen] == [creados[2]["codigo"], creados[1]["codigo"]]
+    assert [p["cantidad_items"] for p in resumen] == [3, 2]
+    assert all("items" not in p for p in resumen)
+    assert resumen[0]["nombre_cliente"] == "Cliente 3"
+    assert resumen[0]["total"] == 600
+
+    # El cursor funciona igual que en la vista completa
+    siguiente = client.get(
+        "/api/pedidos/?vista=resumen&limit=2",
+        params={"cursor": response.headers["X-Next-Cursor"]},
+        headers=headers,
+    ).json()
+    assert [p["codigo"] for p in siguiente] == [creados[0]["codigo"]]
+
+    # Los items se cargan al abrir un pedido
+    detalle = client.get(f"/api/pedidos/{creados[2]['id']}", headers=headers)
+    assert detalle.status_code == 200
+    assert detalle.json() == creados[2]
+    assert client.get("/api/pedidos/999999", headers=headers).status_code == 404
+
+
+def test_pedidos_en_lote_items_de_cada_pedido(client, session):
+    negocio, headers = _setup_user_negocio_token(client, session, tipo_negocio=TipoNegocio.DISTRIBUIDORA)
+    productos = [_create_producto(session, negocio.id, nombre=f"Producto {i}", precio=100 * (i + 1)) for i in range(4)]
+
+    # Cada pedido con una cantidad de líneas distinta: un corrimiento mezclaría items entre clientes
+    pedidos = [
+        {
+            "metodo_pago": "efectivo",
+            "tipo_entrega": "delivery",
+            "nombre_cliente": f"Cliente {n}",
+            "items": [{"producto_id": p.id, "cantidad": n} for p in productos[:n]],
+        }
+        for n in (3, 1, 4, 2)
+    ]
+    creados = client.post("/api/pedidos/lote", json={"pedidos": pedidos}, headers=headers).json()["creados"]
+
+    for creado, enviado in zip(creados, pedidos, strict=True):
+        guardado = client.get(f"/api/pedidos/{creado['id']}", headers=headers).json()
+        assert guardado == creado
+        assert guardado["nombre_cliente"] == enviado["nombre_cliente"]
+        assert [i["producto_id"] for i in guardado["items"]] == [i["producto_id"] for i in enviado["items"]]
+
+
+def test_cola_codigos_repetidos_no_pierden_ni_mezclan_pedidos(client, session, modo_cola):
+    from datetime import datetime
+
+    from app.models.models import PedidoItem
+    from app.services import cola_pedidos_service
+    from app.services.cola_pedidos_service import procesar_cola
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    productos = [_create_producto(session, negocio.id, nombre=f"Producto {i}") for i in range(3)]
+    # Un pedido ya guardado con el mismo código que van a recibir los encolados
+    session.add(Pedido(negocio_id=negocio.id, codigo="AAAAAA", estado=PedidoEstado.FINALIZADO, total=0))
+    session.commit()
+
+    def encolar(producto_ids):
+        datos = {
+            "pedido": {
+                "negocio_id": negocio.id,
+                "codigo": "AAAAAA",
+                "estado": PedidoEstado.PENDIENTE,
+                "total": 1000 * len(producto_ids),
+                "metodo_pago": "efectivo",
+                "tipo_entrega": "delivery",
+                "nombre_cliente": None,
+                "telefono_cliente": None,
+                "direccion_entrega": None,
+                "notas": None,
+                "descuento_aplicado": 0,
+                "promocion_id": None,
+                "cantidad_items": len(producto_ids),
+                "creado_en": datetime.now(UTC),
+            },
+            "items": [
+                {
+                    "producto_id": producto_id,
+                    "nombre_producto": "x",
+                    "precio_unitario": 1000,
+                    "cantidad": 1,
+                    "subtotal": 1000,
+                    "toppings_seleccionados": [],
+                }
+                for producto_id in producto_ids
+            ],
+        }
+        cola_pedidos_service.encolar(datos)
+
+    encolar([productos[0].id])
+    encolar([productos[1].id, productos[2].id])
+
+    assert procesar_cola(session) == 2
+    guardados = session.exec(
+        select(Pedido).where(Pedido.negocio_id == negocio.id, Pedido.estado == PedidoEstado.PENDIENTE).order_by(Pedido.id)
+    ).all()
+    assert len(guardados) == 2
+    items = [
+        session.exec(select(PedidoItem.producto_id).where(PedidoItem.pedido_id == p.id).order_by(PedidoItem.id)).all()
+        for p in guardados
+    ]
+    assert items == [[productos[0].id], [productos[1].id, productos[2].id]]
+
+
+def test_cola_aparta_pedidos_que_fallan_siempre(client, session, modo_cola, monkeypatch):
+    import json
+    from uuid import uuid4
+
+    from sqlalchemy.exc import IntegrityError
+    from sqlmodel import func
+
+    from app.core.config import settings
+    from app.services.cola_pedidos_service import procesar_cola
+
+    monkeypatch.setattr(settings, "PEDIDOS_COLA_MAX_INTENTOS", 2)
+    negocio, headers = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+    }
+    assert client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo).status_code == 200
+
+    # Un pedido que la base rechaza siempre (item sin nombre), entre dos válidos
+    [(_, crudo, _)] = modo_cola.tomar_lote(1)
+    roto = json.loads(crudo)
+    roto["pedido"]["ingreso_id"] = uuid4().hex
+    roto["items"][0]["nombre_producto"] = None
+    modo_cola.encolar(negocio.id, "ROTO01", json.dumps(roto))
+    assert client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo).status_code == 200
+
+    # El lote completo falla hasta llegar al máximo de intentos...
+    with pytest.raises(IntegrityError):
+        procesar_cola(session)
+    assert modo_cola.cantidad() == 3
+
+    # ...y después se vuelca de a uno: los válidos entran y el roto se aparta
+    assert procesar_cola(session) == 3
+    assert modo_cola.cantidad() == 0
+    assert modo_cola.cantidad_descartados() == 1
+    assert session.exec(select(func.count(Pedido.id)).where(Pedido.negocio_id == negocio.id)).one() == 2
+
+    # El comercio ve cuáles se apartaron
+    estado = client.get("/api/stats/cola", headers=headers).json()
+    assert estado["pendientes"] == 0
+    assert estado["descartados"] == 1
+    assert [d["codigo"] for d in estado["descartados_negocio"]] == ["ROTO01"]
+
+
+def test_modo_directo_vacia_la_cola_que_quedo_al_arrancar(client, session, engine, modo_cola, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from sqlmodel import Session
+
+    from app.core.config import settings
+    from app.services import cola_pedidos_service
+
+    negocio, _ = _setup_user_negocio_token(client, session)
+    producto = _create_producto(session, negocio.id)
+    cuerpo = {
+        "items": [{"producto_id": producto.id, "cantidad": 1}],
+        "metodo_pago": "efectivo",
+        "tipo_entrega": "delivery",
+    }
+    codigo = client.post(f"/public/{negocio.slug}/pedidos", json=cuerpo).json()["codigo"]
+
+    # Se vuelve a modo directo con el pedido todavía en el journal
+    monkeypatch.setattr(settings, "PEDIDOS_MODO", "directo")
+    url = f"/public/{negocio.slug}/pedidos/{codigo}"
+    assert client.get(url).status_code == 404
+
+    # Si la base no lo toma, no se arranca
+    def base_caida(session, limite=None):
+        raise OperationalError("INSERT", {}, Exception("sin conexión"))
+
+    with monkeypatch.context() as m:
+        m.setattr(cola_pedidos_service, "procesar_cola", base_caida)
+        with pytest.raises(RuntimeError):
+            cola_pedidos_service.vaciar_journal_previo()
+    assert modo_cola.cantidad() == 1
+
+    monkeypatch.setattr(cola_pedidos_service, "nueva_sesion", lambda: Session(engine))
+    cola_pedidos_service.vaciar_journal_previo()
+    assert modo_cola.cantidad() == 0
+    assert client.get(url).json()["id"] is not None
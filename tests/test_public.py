@@ -1,5 +1,7 @@
 import pytest
-from app.models.models import Negocio, Usuario, Producto, Categoria, Promocion, PromocionTipo
+
+from app.models.models import Categoria, Negocio, Producto, Promocion, PromocionTipo, Usuario
+
 
 @pytest.fixture
 def setup_negocio(session):
@@ -80,3 +82,312 @@ def test_validar_cupon_publico(client, session, setup_negocio):
     data = response.json()
     assert data["descuento"] == 200.0 # 10% de 2000
     assert data["promocion"]["codigo"] == "PROMO10"
+
+
+def test_negocio_por_slug_cacheado(client, setup_negocio):
+    from app.services.negocio_service import _negocios_por_slug
+
+    negocio, _ = setup_negocio
+    client.get(f"/public/{negocio.slug}")
+    client.get(f"/public/{negocio.slug}/productos")
+    client.get(f"/public/{negocio.slug}/categorias")
+
+    stats = _negocios_por_slug.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+
+def test_actualizar_negocio_invalida_cache(client, session, setup_negocio):
+    from app.core.security import create_access_token
+
+    negocio, _ = setup_negocio
+    assert client.get(f"/public/{negocio.slug}").json()["nombre"] == "Test Shop"
+
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': negocio.usuario_id})}"}
+    response = client.put("/api/negocios/me", json={"nombre": "Nuevo Nombre"}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get(f"/public/{negocio.slug}").json()["nombre"] == "Nuevo Nombre"
+
+
+def test_catalogo_publico(client, session, setup_negocio):
+    from app.models.models import GrupoTopping, ProductoGrupoTopping, Topping
+
+    negocio, producto = setup_negocio
+    grupo = GrupoTopping(negocio_id=negocio.id, nombre="Extras")
+    session.add(grupo)
+    session.flush()
+    session.add(Topping(grupo_id=grupo.id, nombre="Queso", precio_extra=200))
+    session.add(ProductoGrupoTopping(producto_id=producto.id, grupo_id=grupo.id))
+    session.commit()
+
+    response = client.get(f"/public/{negocio.slug}/catalog")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["negocio"]["slug"] == negocio.slug
+    assert [c["nombre"] for c in data["categorias"]] == ["Pizza"]
+    assert [p["nombre"] for p in data["productos"]] == ["Pizza Muzza"]
+    assert data["productos"][0]["categoria"] == "Pizza"
+    grupos = data["toppings"][str(producto.id)]
+    assert grupos[0]["grupo_nombre"] == "Extras"
+    assert grupos[0]["toppings"][0]["nombre"] == "Queso"
+
+
+def test_catalogo_se_reconstruye_al_cambiar_version(client, session, setup_negocio):
+    from app.core.security import create_access_token
+
+    negocio, producto = setup_negocio
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': negocio.usuario_id})}"}
+
+    primera = client.get(f"/public/{negocio.slug}/catalog").json()
+    assert client.get(f"/public/{negocio.slug}/catalog").json() == primera
+
+    response = client.put(f"/api/productos/{producto.id}", json={"precio": 1500}, headers=headers)
+    assert response.status_code == 200
+
+    segunda = client.get(f"/public/{negocio.slug}/catalog").json()
+    assert segunda["version"] == primera["version"] + 1
+    assert segunda["productos"][0]["precio"] == 1500
+
+
+def test_etag_y_304(client, session, setup_negocio):
+    from app.core.security import create_access_token
+
+    negocio, producto = setup_negocio
+    url = f"/public/{negocio.slug}/productos"
+
+    response = client.get(url)
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': negocio.usuario_id})}"}
+    client.put(f"/api/productos/{producto.id}", json={"precio": 1500}, headers=headers)
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[0]["precio"] == 1500
+
+
+def test_paginacion_por_cursor_productos(client, session, setup_negocio):
+    negocio, producto = setup_negocio
+    for i in range(4):
+        session.add(Producto(negocio_id=negocio.id, nombre=f"Extra {i}", precio=100))
+    session.commit()
+
+    response = client.get(f"/public/{negocio.slug}/productos?limit=3")
+    primera = [p["nombre"] for p in response.json()]
+    cursor = response.headers["x-next-cursor"]
+
+    response = client.get(f"/public/{negocio.slug}/productos?limit=3&cursor={cursor}")
+    segunda = [p["nombre"] for p in response.json()]
+
+    assert primera == ["Pizza Muzza", "Extra 0", "Extra 1"]
+    assert segunda == ["Extra 2", "Extra 3"]
+    assert "x-next-cursor" not in response.headers
+
+
+def test_toppings_de_todo_el_negocio(client, session, setup_negocio):
+    from app.core.security import create_access_token
+    from app.models.models import GrupoTopping, Topping
+
+    negocio, producto = setup_negocio
+    otro = Producto(negocio_id=negocio.id, nombre="Sin toppings", precio=500)
+    grupo = GrupoTopping(negocio_id=negocio.id, nombre="Salsas")
+    session.add_all([otro, grupo])
+    session.flush()
+    session.add(Topping(grupo_id=grupo.id, nombre="Alioli", precio_extra=100))
+    session.commit()
+
+    assert client.get(f"/public/{negocio.slug}/toppings").json() == {}
+
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': negocio.usuario_id})}"}
+    response = client.put(
+        f"/api/productos/{producto.id}/toppings/",
+        json=[{"grupo_id": grupo.id, "min_selecciones": 0, "max_selecciones": 2}],
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    data = client.get(f"/public/{negocio.slug}/toppings").json()
+    assert list(data) == [str(producto.id)]
+    assert data[str(producto.id)][0]["toppings"][0]["nombre"] == "Alioli"
+    assert data[str(producto.id)][0]["max_selecciones"] == 2
+
+
+def test_busqueda_de_productos(client, session, setup_negocio):
+    negocio, producto = setup_negocio
+    bebidas = Categoria(negocio_id=negocio.id, nombre="Bebidas", activo=True)
+    session.add(bebidas)
+    session.flush()
+    session.add_all([
+        Producto(negocio_id=negocio.id, nombre="Café con leche", precio=900, categoria_id=bebidas.id),
+        Producto(negocio_id=negocio.id, nombre="Empanada", descripcion="De carne cortada a cuchillo", precio=500, sku="EMP-01"),
+        Producto(negocio_id=negocio.id, nombre="Pizza Vieja", precio=500, activo=False),
+    ])
+    session.commit()
+
+    def buscar(q):
+        return [p["nombre"] for p in client.get(f"/public/{negocio.slug}/search", params={"q": q}).json()]
+
+    assert buscar("cafe") == ["Café con leche"]
+    assert buscar("CAFÉ LE") == ["Café con leche"]
+    assert buscar("bebi") == ["Café con leche"]
+    assert buscar("cuchi") == ["Empanada"]
+    assert buscar("emp01") == ["Empanada"]
+    assert buscar("pizza") == ["Pizza Muzza"]
+    assert buscar("sushi") == []
+
+
+def test_busqueda_se_actualiza_con_escrituras(client, session, setup_negocio):
+    from app.core.security import create_access_token
+    from app.services.busqueda_service import _indices
+
+    negocio, producto = setup_negocio
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': negocio.usuario_id})}"}
+    url = f"/public/{negocio.slug}/search"
+
+    assert client.get(url, params={"q": "muzza"}).json()[0]["id"] == producto.id
+    indice = _indices.get(negocio.id)
+
+    client.put(f"/api/productos/{producto.id}", json={"nombre": "Pizza Napolitana"}, headers=headers)
+    response = client.post("/api/productos/", json={"nombre": "Fugazzeta", "precio": 1200, "categoria": "Pizza"}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get(url, params={"q": "muzza"}).json() == []
+    assert [p["nombre"] for p in client.get(url, params={"q": "napo"}).json()] == ["Pizza Napolitana"]
+    assert [p["nombre"] for p in client.get(url, params={"q": "fuga"}).json()] == ["Fugazzeta"]
+
+    # Actualizado en el lugar, sin reconstruirlo
+    assert _indices.get(negocio.id) is indice
+
+    client.delete(f"/api/productos/{producto.id}", headers=headers)
+    assert client.get(url, params={"q": "napo"}).json() == []
+
+
+def test_catalogo_precomprimido(client, session, setup_negocio):
+    import gzip
+
+    import brotli
+
+    negocio, _ = setup_negocio
+    session.add_all(
+        Producto(negocio_id=negocio.id, nombre=f"Producto {i}", descripcion="Muy rico " * 10, precio=100 + i)
+        for i in range(20)
+    )
+    session.commit()
+    url = f"/public/{negocio.slug}/catalog"
+
+    sin_comprimir = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in sin_comprimir.headers
+    assert "Accept-Encoding" in sin_comprimir.headers["vary"]
+
+    con_gzip = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert con_gzip.headers["content-encoding"] == "gzip"
+    assert int(con_gzip.headers["content-length"]) < len(sin_comprimir.content)
+    assert con_gzip.json() == sin_comprimir.json()
+
+    con_br = client.get(url, headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert con_br.headers["content-encoding"] == "br"
+    assert con_br.json() == sin_comprimir.json()
+
+    # Cada representación tiene su propio ETag
+    etags = {r.headers["etag"] for r in (sin_comprimir, con_gzip, con_br)}
+    assert len(etags) == 3
+    no_modificado = client.get(
+        url, headers={"Accept-Encoding": "gzip", "If-None-Match": con_gzip.headers["etag"]}
+    )
+    assert no_modificado.status_code == 304
+
+    # Los bytes se generan una vez por versión
+    from app.services.catalogo_service import obtener_catalogo_json
+    from app.services.negocio_service import obtener_negocio_por_slug
+
+    cuerpo = obtener_catalogo_json(session, obtener_negocio_por_slug(session, negocio.slug))
+    assert gzip.decompress(cuerpo.gzip) == cuerpo.identidad
+    assert brotli.decompress(cuerpo.br) == cuerpo.identidad
+
+
+def test_productos_precomprimidos_respetan_q_values(client, session, setup_negocio):
+    negocio, _ = setup_negocio
+    session.add_all(
+        Producto(negocio_id=negocio.id, nombre=f"Producto {i}", descripcion="Muy rico " * 10, precio=100 + i)
+        for i in range(20)
+    )
+    session.commit()
+    url = f"/public/{negocio.slug}/productos"
+
+    response = client.get(url, headers={"Accept-Encoding": "br;q=0, gzip;q=0.5"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 21
+
+    response = client.get(url, headers={"Accept-Encoding": "*;q=0"})
+    assert "content-encoding" not in response.headers
+
+
+def test_etag_de_pagina_chica_no_nombra_compresion(client, setup_negocio):
+    negocio, _ = setup_negocio
+    url = f"/public/{negocio.slug}/productos"
+
+    # Una sola fila no llega al tamaño mínimo: va sin comprimir aunque se acepte gzip
+    con_gzip = client.get(url, params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+    sin_comprimir = client.get(url, params={"limit": 1}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in con_gzip.headers
+    assert con_gzip.headers["etag"] == sin_comprimir.headers["etag"]
+
+
+def test_modo_swr_sirve_snapshot_vencido(client, session, setup_negocio, engine, monkeypatch):
+    import time
+
+    from app.core import database
+    from app.services import negocio_service
+
+    negocio, _ = setup_negocio
+    cache = negocio_service._negocios_por_slug
+    monkeypatch.setattr(cache, "ttl", 3600)
+    monkeypatch.setattr(cache, "ttl_fresco", 0)
+    # La recarga en segundo plano abre su propia sesión contra la DB de prueba
+    monkeypatch.setattr(database, "engine", engine)
+
+    assert client.get(f"/public/{negocio.slug}").json()["nombre"] == "Test Shop"
+
+    # Cambio hecho por otro proceso: no invalida el cache de este
+    negocio.nombre = "Test Shop Renovado"
+    session.add(negocio)
+    session.commit()
+
+    # Primero se sirve el snapshot anterior, y la recarga lo actualiza por detrás
+    assert client.get(f"/public/{negocio.slug}").json()["nombre"] == "Test Shop"
+    for _ in range(500):
+        with cache._lock:
+            if not cache._revalidando:
+                break
+        time.sleep(0.01)
+    assert client.get(f"/public/{negocio.slug}").json()["nombre"] == "Test Shop Renovado"
+
+
+def test_catalogo_refleja_cambios_de_insignias(client, session, setup_negocio):
+    from app.models.models import Pedido, PedidoEstado
+    from app.services.negocio_service import recalcular_contadores_pedidos
+
+    negocio, _ = setup_negocio
+    url = f"/public/{negocio.slug}/catalog"
+
+    response = client.get(url)
+    etag = response.headers["etag"]
+    assert response.json()["negocio"]["insignias"] == []
+
+    # Los contadores cambian sin tocar la versión de catálogo
+    for i in range(51):
+        session.add(Pedido(negocio_id=negocio.id, codigo=f"I-{i}", estado=PedidoEstado.FINALIZADO, total=100))
+    session.commit()
+    recalcular_contadores_pedidos(session)
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["negocio"]["insignias"] == ["VERIFICADO_50"]